@@ -0,0 +1,314 @@
+"""Process-wide client for the AI advisors.
+
+``AIClient`` holds one backend (and therefore one model object and transport)
+per process; app.py caches it with ``st.cache_resource``. Every call runs on a
+bounded worker pool so the caller waits at most ``timeout`` seconds, transient
+failures are retried with jittered exponential backoff inside that deadline,
+and a circuit breaker fails fast while the backend keeps failing. Only
+timeouts, transient errors and backend-health errors count toward the
+breaker; a rejected request (bad or blocked prompt) is the caller's problem,
+not the backend's. Failures raise ``AIError`` subclasses instead of being
+returned as text.
+
+Backends implement ``generate(prompt, timeout)`` and
+``stream(prompt, timeout)``; add one with ``register_backend``.
+"""
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from fake_model import FakeGenerativeModel
+
+DEFAULT_TIMEOUT = float(os.getenv("AMS_AI_TIMEOUT", "30"))
+DEFAULT_STREAM_TIMEOUT = float(os.getenv("AMS_AI_STREAM_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("AMS_AI_MAX_RETRIES", "2"))
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+BREAKER_THRESHOLD = int(os.getenv("AMS_AI_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("AMS_AI_BREAKER_RESET", "30"))
+MAX_CONCURRENCY = int(os.getenv("AMS_AI_MAX_CONCURRENCY", "16"))
+
+# Exception class names (from google.api_core and the standard library) worth retrying
+RETRYABLE_ERRORS = {"AITimeout", "TimeoutError", "ConnectionError", "DeadlineExceeded",
+                    "ServiceUnavailable", "ResourceExhausted", "TooManyRequests",
+                    "InternalServerError", "GatewayTimeout", "BadGateway"}
+
+# Not worth retrying, but still a sign the backend (or its credentials) is unhealthy
+BACKEND_HEALTH_ERRORS = {"ServerError", "Unauthenticated", "PermissionDenied", "OSError"}
+
+
+class AIError(Exception):
+    """The AI backend could not produce a response"""
+
+
+class AITimeout(AIError):
+    """The call did not finish within its deadline"""
+
+
+class CircuitOpen(AIError):
+    """The backend failed repeatedly; calls fail fast until the breaker resets"""
+
+
+def is_retryable(error):
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def is_backend_failure(error):
+    """Whether an error should count toward the circuit breaker"""
+    return is_retryable(error) or any(cls.__name__ in BACKEND_HEALTH_ERRORS for cls in type(error).__mro__)
+
+
+class GeminiBackend:
+    """google-generativeai model, configured once and reused for every call
+
+    google-generativeai 0.3.2 (the pinned version) takes no per-request
+    timeout, so a call the client gives up on keeps running on its pool
+    worker until the transport returns; ``enforces_timeout`` tells
+    ``AIClient`` to size its pool for those abandoned calls.
+    """
+
+    DEFAULT_MODEL = "gemini-2.0-flash"
+
+    def __init__(self, model_name=DEFAULT_MODEL, api_key=None):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        # Newer SDKs take a transport timeout; older ones rely on the client's deadline only
+        self._request_options = "request_options" in inspect.signature(self.model.generate_content).parameters
+        self.enforces_timeout = self._request_options
+
+    def _options(self, timeout):
+        return {"request_options": {"timeout": timeout}} if self._request_options else {}
+
+    def generate(self, prompt, timeout):
+        return self.model.generate_content(prompt, **self._options(timeout)).text
+
+    def stream(self, prompt, timeout):
+        for chunk in self.model.generate_content(prompt, stream=True, **self._options(timeout)):
+            yield chunk.text
+
+
+class FakeBackend:
+    """Offline backend around ``FakeGenerativeModel``"""
+
+    DEFAULT_MODEL = "fake-model"
+    enforces_timeout = True
+
+    def __init__(self, model_name=DEFAULT_MODEL, **options):
+        self.model_name = model_name
+        self.model = FakeGenerativeModel(model_name, **options)
+
+    def generate(self, prompt, timeout):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt, timeout):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+}
+
+
+def register_backend(name, factory):
+    """Make ``AMS_AI_BACKEND=name`` build its backend with ``factory()``"""
+    BACKENDS[name] = factory
+
+
+def create_backend(name=None):
+    name = name or os.getenv("AMS_AI_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI backend '{name}'; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def default_model_name(name=None):
+    """Model a backend would use, without creating it (e.g. to read cached responses offline)"""
+    name = name or os.getenv("AMS_AI_BACKEND", "gemini")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI backend '{name}'; expected one of {', '.join(BACKENDS)}")
+    return getattr(BACKENDS[name], "DEFAULT_MODEL", name)
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures; one trial call after ``reset_seconds``"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpen(f"AI backend unavailable after {self.failures} consecutive failures; "
+                                  f"retrying in {remaining:.1f}s")
+            if self._trial_running:
+                raise CircuitOpen("AI backend is recovering; a trial request is in flight")
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that says nothing about backend health (e.g. a rejected prompt)"""
+        with self._lock:
+            self._trial_running = False
+
+
+class AIClient:
+    """Deadline-bounded, retrying, circuit-broken access to one backend
+
+    ``max_concurrency`` workers run backend calls. A backend that cannot
+    enforce its timeout (``enforces_timeout = False``) gets twice as many,
+    so workers still busy with calls past their deadline do not starve new
+    ones before enough timeouts open the breaker.
+    """
+
+    def __init__(self, backend, timeout=DEFAULT_TIMEOUT, stream_timeout=DEFAULT_STREAM_TIMEOUT,
+                 max_retries=MAX_RETRIES, breaker=None, max_concurrency=MAX_CONCURRENCY):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        workers = max_concurrency if getattr(backend, "enforces_timeout", True) else max_concurrency * 2
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-client")
+        self._abandoned = 0
+        self._abandoned_lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        # Full jitter keeps retries from concurrent sessions from arriving in lockstep
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt))
+
+    def _call(self, attempt_fn, timeout):
+        """Run attempt_fn(remaining_seconds) with retries inside one overall deadline"""
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            remaining = deadline - time.monotonic()
+            try:
+                result = attempt_fn(remaining)
+            except Exception as e:
+                if not is_backend_failure(e):
+                    self.breaker.release()
+                    if isinstance(e, AIError):
+                        raise
+                    raise AIError(f"{type(e).__name__}: {e}") from e
+                self.breaker.record_failure()
+                delay = self._backoff(attempt)
+                if (attempt >= self.max_retries or not is_retryable(e)
+                        or time.monotonic() + delay >= deadline):
+                    if isinstance(e, AIError):
+                        raise
+                    raise AIError(f"{type(e).__name__}: {e}") from e
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _abandon(self, future):
+        """Count a call that outlived its deadline until its worker is free again"""
+        with self._abandoned_lock:
+            self._abandoned += 1
+
+        def finished(_):
+            with self._abandoned_lock:
+                self._abandoned -= 1
+        future.add_done_callback(finished)
+
+    def generate(self, prompt, timeout=None):
+        """Response text; raises AIError (AITimeout, CircuitOpen) on failure"""
+        def attempt(remaining):
+            future = self._executor.submit(self.backend.generate, prompt, remaining)
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeout:
+                if not future.cancel():
+                    self._abandon(future)
+                raise AITimeout(f"No response from {self.model_name} within {timeout or self.timeout:g}s")
+        return self._call(attempt, timeout or self.timeout)
+
+    def stream(self, prompt, timeout=None):
+        """Yield text chunks; retries happen only before the first chunk arrives"""
+        timeout = timeout or self.stream_timeout
+        deadline = time.monotonic() + timeout
+        done = object()
+        current = {}
+
+        def produce(chunks, remaining):
+            try:
+                for text in self.backend.stream(prompt, remaining):
+                    chunks.put(text)
+            except Exception as e:
+                chunks.put(e)
+            else:
+                chunks.put(done)
+
+        def next_chunk():
+            remaining = deadline - time.monotonic()
+            try:
+                item = current["chunks"].get(timeout=max(remaining, 0))
+            except queue.Empty:
+                raise AITimeout(f"{self.model_name} stream exceeded {timeout:g}s") from None
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        def first(remaining):
+            # A fresh queue per attempt so a timed-out producer cannot leak into the retry
+            current["chunks"] = queue.Queue()
+            self._executor.submit(produce, current["chunks"], remaining)
+            return next_chunk()
+
+        item = self._call(first, timeout)
+        while item is not done:
+            yield item
+            try:
+                item = next_chunk()
+            except Exception as e:
+                if is_backend_failure(e):
+                    self.breaker.record_failure()
+                if isinstance(e, AIError):
+                    raise
+                raise AIError(f"{type(e).__name__}: {e}") from e
+
+    def status(self):
+        return {"backend": type(self.backend).__name__, "model": self.model_name,
+                "breaker": self.breaker.state, "consecutive_failures": self.breaker.failures,
+                "abandoned_calls": self._abandoned}
@@ -0,0 +1,58 @@
+"""Background jobs for the dashboard's comprehensive AI analysis.
+
+Jobs are keyed by a fingerprint of ``athlete_data`` so a dashboard rerun with
+unchanged inputs never starts a second LLM call, and identical athlete data
+from different sessions shares one job.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_TRACKED_JOBS = 256
+
+
+def athlete_fingerprint(athlete_data):
+    """Stable hash of the athlete data sections"""
+    payload = json.dumps(athlete_data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisJobs:
+    """Thread pool running at most one job per fingerprint"""
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fingerprint, fn, *args):
+        """Start fn(*args) for this fingerprint unless a job already exists"""
+        with self._lock:
+            job = self._jobs.get(fingerprint)
+            if job is None:
+                job = self._executor.submit(fn, *args)
+                self._jobs[fingerprint] = job
+                self._trim()
+            else:
+                self._jobs.move_to_end(fingerprint)
+            return job
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self._jobs.get(fingerprint)
+
+    def discard(self, fingerprint):
+        """Drop a finished job so the next submit for this fingerprint starts afresh"""
+        with self._lock:
+            job = self._jobs.get(fingerprint)
+            if job is not None and job.done():
+                del self._jobs[fingerprint]
+
+    def _trim(self):
+        while len(self._jobs) > MAX_TRACKED_JOBS:
+            oldest = next(iter(self._jobs))
+            if not self._jobs[oldest].done():
+                break
+            del self._jobs[oldest]
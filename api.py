@@ -0,0 +1,491 @@
+"""Headless JSON API over the scoring and persistence code.
+
+For clients that cannot drive the Streamlit forms, such as the wearables
+pipeline. Requests are validated with the same rules as the forms and the
+bulk importer (``validation``), scored by ``scoring``, written through ``db``
+and the write-behind queue, and the AI advisors answer through the same
+client and response cache as the app, so a prompt built here hits responses
+the app cached and vice versa.
+
+``app`` is a plain ASGI application with no framework dependency; serve it
+with any ASGI server, e.g.::
+
+    pip install uvicorn
+    uvicorn api:app --port 8000
+
+Endpoints take and return JSON; errors are ``{"error": message}`` with a 4xx
+or 5xx status::
+
+    GET  /health
+    GET  /profiles?sport=&gender=&min_age=&max_age=&name=&after=&limit=
+    POST /profiles                            one profile
+    POST /profiles/batch                      {"items": [profile, ...]}
+    GET  /profiles/{id}
+    GET  /profiles/{id}/assessments/{module}?since=&until=&before=&limit=
+    POST /assessments/{module}                {"profile_id", "recorded_at"?, fields...}
+    POST /assessments/{module}/batch          {"items": [assessment, ...]}
+    POST /scores/{injury|bmi|finance}         the scores the forms and dashboard show
+    POST /scores/{injury|bmi|finance}/batch   {"items": [inputs, ...]}
+    POST /advice/{module|overview}            {"profile_id"} or {"name", "data"}
+    POST /advice/{module|overview}/batch      {"items": [...]}
+
+Lists are keyset-paginated: each page has ``next``, which is passed back as
+``after`` (profiles) or ``before`` (assessments, newest first), and is null on
+the last page. Batches hold up to ``AMS_API_MAX_BATCH`` items (advice:
+``AMS_API_MAX_ADVICE_BATCH``); each item is validated on its own, ``results``
+lines up with ``items`` and holds either the outcome or ``{"error": ...}``,
+and the valid items of a write batch are committed in one transaction.
+A single assessment is acknowledged with 202 once it is journaled by the
+write-behind queue (201 and its id with ``AMS_WRITE_BEHIND=0``).
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import ai_client
+import db
+import metrics
+import prompts
+import scoring
+import write_behind
+from response_cache import ResponseCache
+from validation import ASSESSMENT_RULES, PROFILE_RULES, validate_record
+
+MAX_BATCH = int(os.getenv("AMS_API_MAX_BATCH", "1000"))
+MAX_ADVICE_BATCH = int(os.getenv("AMS_API_MAX_ADVICE_BATCH", "20"))
+MAX_BODY_BYTES = int(os.getenv("AMS_API_MAX_BODY", 8 * 1024 * 1024))
+THREADS = int(os.getenv("AMS_API_THREADS", "8"))
+MAX_PAGE_SIZE = 500
+ASSESSMENT_PAGE_SIZE = 50
+
+ADVISORS = [*prompts.MODULE_PROMPTS, 'overview']
+PROFILE_FIELDS = list(PROFILE_RULES)
+ASSESSMENT_ID_RULES = {'profile_id': {'min': 1, 'integer': True}}
+SCORE_RULES = {
+    'injury': {name: ASSESSMENT_RULES['injury'][name] for name in scoring.RISK_INPUTS},
+    'bmi': {'height': {'min': 0}, 'weight': {'min': 0}},
+    'finance': ASSESSMENT_RULES['finance'],
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, path, query, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+
+    def json(self):
+        """The body as a JSON object; 400 when it is missing, malformed or not an object"""
+        try:
+            document = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON") from None
+        if not isinstance(document, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return document
+
+    def items(self, limit=MAX_BATCH):
+        """The "items" list of a batch body"""
+        items = self.json().get('items')
+        if not isinstance(items, list) or not items:
+            raise HTTPError(400, 'Batch body must be {"items": [...]} with at least one item')
+        if len(items) > limit:
+            raise HTTPError(413, f"At most {limit} items per batch, got {len(items)}")
+        return items
+
+    def int_param(self, name, default=None, minimum=None, maximum=None):
+        value = self.query.get(name)
+        if value is None or value == "":
+            return default
+        try:
+            number = int(value)
+        except ValueError:
+            raise HTTPError(400, f"{name} must be an integer") from None
+        if minimum is not None and number < minimum:
+            raise HTTPError(400, f"{name} must be at least {minimum}")
+        if maximum is not None and number > maximum:
+            raise HTTPError(400, f"{name} must be at most {maximum}")
+        return number
+
+
+# Routing: (method, pattern, handler, name, blocking). Blocking handlers touch the
+# database or the AI backend and run on the thread pool; the rest run on the event loop.
+ROUTES = []
+
+
+def route(method, pattern, blocking=True):
+    def register(handler):
+        ROUTES.append((method, re.compile(f"^{pattern}$"), handler, handler.__name__, blocking))
+        return handler
+    return register
+
+
+def _match(method, path):
+    allowed = False
+    for route_method, pattern, handler, name, blocking in ROUTES:
+        match = pattern.match(path)
+        if match:
+            if route_method == method:
+                return handler, name, blocking, match.groupdict()
+            allowed = True
+    if allowed:
+        raise HTTPError(405, f"{method} not allowed on {path}")
+    raise HTTPError(404, f"No route for {path}")
+
+
+def _object(item):
+    if not isinstance(item, dict):
+        raise HTTPError(400, "Expected a JSON object")
+    return item
+
+
+def _checked(item, rules):
+    """validate_record, raising 422 with every broken rule"""
+    values, reasons = validate_record(_object(item), rules)
+    if reasons:
+        raise HTTPError(422, "; ".join(reasons))
+    return values
+
+
+def _outcome(handle, item):
+    """handle(item) for one batch item, or {"error": ...} when the item is rejected"""
+    try:
+        return handle(item)
+    except HTTPError as e:
+        return {'error': e.message}
+
+
+def _choice(value, choices, kind="module"):
+    if value not in choices:
+        raise HTTPError(404, f"Unknown {kind} '{value}'; expected one of {', '.join(choices)}")
+    return value
+
+
+def _profile(profile_id):
+    profile = db.get_profile(int(profile_id))
+    if profile is None:
+        raise HTTPError(404, f"Profile {profile_id} does not exist")
+    return profile
+
+
+# Health
+
+@route("GET", "/health", blocking=False)
+def health(request):
+    healthy, error = write_behind.writer_health()
+    if not healthy:
+        raise HTTPError(503, f"Write-behind writer unhealthy: {error}")
+    return {'status': 'ok'}
+
+
+# Profiles
+
+@route("GET", "/profiles")
+def list_profiles(request):
+    rows, next_after = db.search_profiles(
+        sport=request.query.get('sport'), gender=request.query.get('gender'),
+        min_age=request.int_param('min_age'), max_age=request.int_param('max_age'),
+        name_prefix=request.query.get('name'), after_id=request.int_param('after', 0, minimum=0),
+        limit=request.int_param('limit', db.ROSTER_PAGE_SIZE, 1, MAX_PAGE_SIZE))
+    return {'items': rows, 'next': next_after}
+
+
+@route("GET", r"/profiles/(?P<profile_id>\d+)")
+def get_profile(request, profile_id):
+    return _profile(profile_id)
+
+
+@route("POST", "/profiles")
+def create_profile(request):
+    values = _checked(request.json(), PROFILE_RULES)
+    fields = [values[name] for name in PROFILE_FIELDS]
+    if write_behind.ENABLED:
+        # The id is the response, so wait for the batch holding this write
+        profile_id = write_behind.get_writer().save_profile(*fields).result()
+    else:
+        profile_id = db.insert_profile(*fields)
+    return 201, {'id': profile_id, **values}
+
+
+@route("POST", "/profiles/batch")
+def create_profiles(request):
+    items = request.items()
+    results = [_outcome(lambda one: _checked(one, PROFILE_RULES), item) for item in items]
+    with db.transaction() as conn:
+        for index, result in enumerate(results):
+            if 'error' not in result:
+                results[index] = {'id': db.add_profile(conn, *(result[name] for name in PROFILE_FIELDS)), **result}
+    return {'inserted': sum('id' in result for result in results), 'results': results}
+
+
+# Assessments
+
+def _recorded_at(item):
+    recorded_at = item.get('recorded_at')
+    if recorded_at is None:
+        return None
+    try:
+        datetime.strptime(recorded_at, db.TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        raise HTTPError(422, "recorded_at must look like 2024-03-01 09:30:00") from None
+    return recorded_at
+
+
+def _assessment(module, item):
+    """(profile_id, stored fields including the derived ones, recorded_at) for one item"""
+    values = _checked(item, {**ASSESSMENT_ID_RULES, **ASSESSMENT_RULES[module]})
+    recorded_at = _recorded_at(item)
+    profile_id = values.pop('profile_id')
+    return profile_id, {**values, **scoring.derived_fields(module, values)}, recorded_at
+
+
+@route("GET", r"/profiles/(?P<profile_id>\d+)/assessments/(?P<module>\w+)")
+def list_assessments(request, profile_id, module):
+    _choice(module, db.ASSESSMENT_COLUMNS)
+    _profile(profile_id)
+    limit = request.int_param('limit', ASSESSMENT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    rows = db.assessment_history(module, int(profile_id), since=request.query.get('since'),
+                                 until=request.query.get('until'), limit=limit + 1,
+                                 before_id=request.int_param('before', minimum=1))
+    return {'items': rows[:limit], 'next': rows[limit - 1]['id'] if len(rows) > limit else None}
+
+
+@route("POST", r"/assessments/(?P<module>\w+)")
+def create_assessment(request, module):
+    _choice(module, db.ASSESSMENT_COLUMNS)
+    profile_id, data, recorded_at = _assessment(module, request.json())
+    _profile(profile_id)
+    derived = {name: data[name] for name in scoring.derived_fields(module, data)}
+    if write_behind.ENABLED:
+        # Durable once journaled; the writer thread commits it with the next batch
+        write_behind.get_writer().record_assessment(module, profile_id, data, recorded_at)
+        return 202, {'profile_id': profile_id, 'status': 'queued', **derived}
+    assessment_id = db.record_assessment(module, profile_id, data, recorded_at)
+    return 201, {'id': assessment_id, 'profile_id': profile_id, **derived}
+
+
+@route("POST", r"/assessments/(?P<module>\w+)/batch")
+def create_assessments(request, module):
+    _choice(module, db.ASSESSMENT_COLUMNS)
+    items = request.items()
+    parsed = [_outcome(lambda one: {'entry': _assessment(module, one)}, item) for item in items]
+    with db.transaction() as conn:
+        known = db.existing_profile_ids(conn, {p['entry'][0] for p in parsed if 'entry' in p})
+        entries = []
+        results = []
+        for result in parsed:
+            if 'error' in result:
+                results.append(result)
+            elif result['entry'][0] not in known:
+                results.append({'error': f"Profile {result['entry'][0]} does not exist"})
+            else:
+                profile_id, data, recorded_at = result['entry']
+                entries.append(result['entry'])
+                results.append({'profile_id': profile_id, **scoring.derived_fields(module, data)})
+        if entries:
+            db.insert_assessments(conn, module, entries)
+    return {'inserted': len(entries), 'results': results}
+
+
+# Scores
+
+def _injury_score(values):
+    risk, recovery = scoring.injury_scores(values)
+    return {'risk_score': risk, 'risk_level': scoring.risk_level(risk), 'recovery_score': recovery}
+
+
+def _bmi(values):
+    bmi = scoring.calculate_bmi(values['height'], values['weight'])
+    return {'bmi': None if bmi == "--" else bmi}
+
+
+def _finance(values):
+    total_income, total_expenses, savings_rate = scoring.finance_totals(values)
+    return {'total_income': total_income, 'total_expenses': total_expenses,
+            'savings': total_income - total_expenses, 'savings_rate': savings_rate,
+            'financial_health': scoring.financial_health(savings_rate)}
+
+
+SCORERS = {'injury': _injury_score, 'bmi': _bmi, 'finance': _finance}
+
+
+def _score(kind, item):
+    item = _object(item)
+    if kind == 'finance':
+        # Line items left out count as 0, as on the dashboard
+        item = {**dict.fromkeys(SCORE_RULES['finance'], 0), **item}
+    return SCORERS[kind](_checked(item, SCORE_RULES[kind]))
+
+
+@route("POST", r"/scores/(?P<kind>\w+)", blocking=False)
+def score(request, kind):
+    return _score(_choice(kind, SCORERS, "score"), request.json())
+
+
+@route("POST", r"/scores/(?P<kind>\w+)/batch", blocking=False)
+def score_batch(request, kind):
+    _choice(kind, SCORERS, "score")
+    return {'results': [_outcome(lambda one: _score(kind, one), item) for item in request.items()]}
+
+
+# AI advisors
+
+_ai = None
+_ai_lock = threading.Lock()
+
+
+def get_ai():
+    """(AIClient, ResponseCache) shared by every request in the process"""
+    global _ai
+    with _ai_lock:
+        if _ai is None:
+            _ai = (ai_client.AIClient(ai_client.create_backend()), ResponseCache())
+        return _ai
+
+
+def _stored_data(module, profile_id):
+    latest = db.latest_assessment(module, profile_id)
+    if latest is None:
+        return None
+    return {name: latest[name] for name, _ in db.ASSESSMENT_COLUMNS[module]}
+
+
+def _advice_prompt(module, item):
+    item = _object(item)
+    if 'profile_id' in item:
+        profile = _profile(_checked(item, ASSESSMENT_ID_RULES)['profile_id'])
+        if module == 'overview':
+            athlete_data = {name: _stored_data(name, profile['id']) or {} for name in db.ASSESSMENT_COLUMNS}
+            if not any(athlete_data.values()):
+                raise HTTPError(409, f"Profile {profile['id']} has no stored assessments")
+            return prompts.dashboard_prompt(athlete_data)
+        data = _stored_data(module, profile['id'])
+        if data is None:
+            raise HTTPError(409, f"Profile {profile['id']} has no stored {module} assessment")
+        return prompts.module_prompt(module, profile['name'], data)
+    if module == 'overview':
+        raise HTTPError(422, "overview advice needs a profile_id")
+    if not isinstance(item.get('data'), dict):
+        raise HTTPError(422, 'Advice needs {"profile_id": ...} or {"name": ..., "data": {...}}')
+    data = _checked(item['data'], ASSESSMENT_RULES[module])
+    return prompts.module_prompt(module, str(item.get('name') or "the athlete"),
+                                 {**data, **scoring.derived_fields(module, data)})
+
+
+def _advice(module, item):
+    prompt = _advice_prompt(module, item)
+    client, cache = get_ai()
+    text = cache.get(client.model_name, prompt)
+    cached = text is not None
+    if not cached:
+        prompts.record_sent(prompt)
+        try:
+            text = client.generate(prompt)
+        except ai_client.AIError as e:
+            raise HTTPError(503, f"AI analysis unavailable: {e}") from None
+        cache.set(client.model_name, prompt, text)
+    return {'model': client.model_name, 'cached': cached, 'text': text}
+
+
+@route("POST", r"/advice/(?P<module>\w+)")
+def advice(request, module):
+    return _advice(_choice(module, ADVISORS, "advisor"), request.json())
+
+
+@route("POST", r"/advice/(?P<module>\w+)/batch")
+def advice_batch(request, module):
+    _choice(module, ADVISORS, "advisor")
+    items = request.items(MAX_ADVICE_BATCH)
+    # Items wait on the model concurrently; the AI client bounds calls in flight
+    with ThreadPoolExecutor(max_workers=len(items), thread_name_prefix="api-advice") as pool:
+        results = list(pool.map(lambda item: _outcome(lambda one: _advice(module, one), item), items))
+    return {'results': results}
+
+
+# ASGI
+
+_executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="api")
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise HTTPError(400, "Client disconnected")
+        chunk = message.get('body', b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body over {MAX_BODY_BYTES:,} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b"".join(chunks)
+
+
+async def _respond(scope, receive):
+    """(status, payload) for one HTTP request"""
+    handler, name, blocking, args = _match(scope['method'], scope['path'])
+    body = await _read_body(receive) if scope['method'] in ("POST", "PUT", "PATCH") else b""
+    query = dict(parse_qsl(scope.get('query_string', b"").decode("latin-1")))
+    request = Request(scope['method'], scope['path'], query, body)
+    start = time.perf_counter()
+    try:
+        if blocking:
+            result = await asyncio.get_running_loop().run_in_executor(
+                _executor, lambda: handler(request, **args))
+        else:
+            result = handler(request, **args)
+    finally:
+        metrics.observe(f"api.{name}", time.perf_counter() - start)
+    return result if isinstance(result, tuple) else (200, result)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.get_running_loop().run_in_executor(_executor, write_behind.flush_if_started)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    try:
+        status, payload = await _respond(scope, receive)
+    except HTTPError as e:
+        status, payload = e.status, {'error': e.message}
+    except Exception:
+        traceback.print_exc()
+        status, payload = 500, {'error': "Internal server error"}
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode("ascii"))]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+db.init_db()
@@ -1,56 +1,157 @@
 import streamlit as st
-import sqlite3
-from datetime import datetime
-import google.generativeai as genai
 import os
-import pandas as pd
-import plotly.express as px
-from streamlit_option_menu import option_menu
-from streamlit_extras.metric_cards import style_metric_cards
-from streamlit_extras.stylable_container import stylable_container
+from response_cache import ResponseCache
+from metrics import StageTimer, timed
+import metrics
+from analysis_jobs import AnalysisJobs, athlete_fingerprint
 import time
+import db
+import trends
+import cohort
+import write_behind
+import scoring
+from validation import PROFILE_RULES, GENDERS, ASSESSMENT_RULES
+import batch_reports
+import prompts
+import styles
+import profiler
+import figures
+import dossier
+import session_store
+import projection
+import ai_client
+
+# Heavy packages (Gemini SDK, pandas, Plotly, option menu) are imported in the
+# functions that use them, so cold starts and the profile page don't load them
 
 # Initialize environment
 gemini_api_key = os.getenv("GEMINI_API_KEY")
+ai_backend = os.getenv("AMS_AI_BACKEND", "gemini")
 
-# Configure Gemini API
+# Gemini needs an API key; other backends (e.g. AMS_AI_BACKEND=fake) run offline
 def configure_genai():
-    if gemini_api_key:
-        genai.configure(api_key=gemini_api_key)
+    if ai_backend != "gemini" or gemini_api_key:
         return True
+    st.error("API Key not found. Please set GEMINI_API_KEY in your environment.")
+    return False
+
+# One client per process: the model, transport, worker pool and circuit breaker
+# are shared by every session instead of being rebuilt on each call
+@st.cache_resource
+def get_ai_client():
+    return ai_client.AIClient(ai_client.create_backend(ai_backend))
+
+# Shared across sessions so repeated prompts skip the API round-trip
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# Cross-page state saved outside the process (AMS_SESSION_STORE) so any replica can resume it
+@st.cache_resource
+def get_session_store():
+    return session_store.create_store()
+
+def restore_session():
+    """On a session's first run, load the state saved under the URL's ?sid= (or start a new id)"""
+    if '_session_id' in st.session_state:
+        return
+    session_id = st.query_params.get('sid')
+    payload = get_session_store().load(session_id) if session_store.valid_session_id(session_id) else None
+    if payload is None:
+        session_id = session_id if session_store.valid_session_id(session_id) else session_store.new_session_id()
+        st.query_params['sid'] = session_id
     else:
-        st.error("API Key not found. Please set GEMINI_API_KEY in your environment.")
-        return False
+        for key, value in session_store.deserialize(payload).items():
+            st.session_state[key] = value
+    st.session_state._session_id = session_id
+    st.session_state._session_saved = payload
+
+def persist_session():
+    """Save the persisted keys when this run changed them"""
+    session_id = st.session_state.get('_session_id')
+    if session_id is None:
+        return
+    payload = session_store.serialize(st.session_state)
+    if payload != st.session_state.get('_session_saved'):
+        with timed("session.save"):
+            get_session_store().save(session_id, payload)
+        st.session_state._session_saved = payload
 
 # Function to get AI response using Gemini 2.0 Flash
-def get_ai_response(prompt):
+@profiler.profiled()
+def get_ai_response(prompt, stream=False, cache=None, client=None):
+    """Return the response text, or a generator of text chunks when stream=True.
+
+    Raises ai_client.AIError when the backend fails or misses its deadline.
+    """
+    client = client or get_ai_client()
+    if stream:
+        return _stream_ai_response(prompt, client)
+    cache = cache or get_response_cache()
+    cached = cache.get(client.model_name, prompt)
+    if cached is not None:
+        return cached
+    prompts.record_sent(prompt)
+    text = client.generate(prompt)
+    cache.set(client.model_name, prompt, text)
+    return text
+
+def _stream_ai_response(prompt, client):
+    cache = get_response_cache()
+    cached = cache.get(client.model_name, prompt)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    prompts.record_sent(prompt)
+    for chunk in client.stream(prompt):
+        parts.append(chunk)
+        yield chunk
+    cache.set(client.model_name, prompt, "".join(parts))
+
+@profiler.profiled()
+def show_ai_response(prompt):
+    """Render the AI response incrementally as chunks arrive"""
+    placeholder = st.empty()
+    text = ""
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error: {e}"
+        for chunk in get_ai_response(prompt, stream=True):
+            text += chunk
+            placeholder.success(text)
+    except ai_client.AIError as e:
+        # Keep whatever arrived before the failure, flagged as incomplete
+        if text:
+            placeholder.warning(text)
+        st.error(f"AI analysis unavailable: {e}")
+        return None
+    return text
 
-# Initialize SQLite database
-def init_db():
-    conn = sqlite3.connect('athlete_profiles.db')
-    c = conn.cursor()
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS profiles
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT,
-                  sport TEXT,
-                  age INTEGER,
-                  height REAL,
-                  weight REAL,
-                  gender TEXT,
-                  join_date TEXT,
-                  last_updated TEXT)''')
-    
-    conn.commit()
-    conn.close()
+ANALYSIS_POLL_SECONDS = 1.0
+
+# One pool per process; jobs are shared by every session
+@st.cache_resource
+def get_analysis_jobs():
+    return AnalysisJobs()
 
-init_db()
+def run_dashboard_analysis(prompt, cache, client):
+    """Background job body; the cache and client are resolved on the script thread"""
+    with timed("dashboard.llm"):
+        return get_ai_response(prompt, cache=cache, client=client)
+
+def show_cache_stats():
+    """Sidebar summary of AI response cache activity"""
+    stats = get_response_cache().stats()
+    with st.expander("AI Response Cache"):
+        col1, col2 = st.columns(2)
+        col1.metric("Hits", stats['hits'])
+        col2.metric("Misses", stats['misses'])
+        st.caption(f"{stats['entries']} cached responses · {stats['hit_rate']:.0%} hit rate")
+        status = get_ai_client().status()
+        st.caption(f"{status['model']} · circuit {status['breaker']}"
+                   + (f" · {status['abandoned_calls']} calls past deadline" if status['abandoned_calls'] else ""))
+
+# Initialize SQLite database
+db.init_db()
 
 # Professional athlete icons
 def show_athlete_icon(gender=None):
@@ -88,25 +189,41 @@ def show_athlete_icon(gender=None):
         """, unsafe_allow_html=True)
 
 # Profile Management
+@profiler.profiled()
 def save_profile(name, sport, age, height, weight, gender):
-    conn = sqlite3.connect('athlete_profiles.db')
-    c = conn.cursor()
-    
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
     try:
-        c.execute('''INSERT INTO profiles 
-                    (name, sport, age, height, weight, gender, join_date, last_updated)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                 (name, sport, age, height, weight, gender, current_time, current_time))
-        
-        conn.commit()
-        return c.lastrowid
+        if not write_behind.ENABLED:
+            return db.insert_profile(name, sport, age, height, weight, gender)
+        # The new id is needed right away, so wait for the batch holding this write
+        return write_behind.get_writer().save_profile(name, sport, age, height, weight, gender).result()
     except Exception as e:
         st.error(f"Error saving profile: {str(e)}")
         return None
-    finally:
-        conn.close()
+
+def save_assessment(module, data):
+    """Append a module submission to the current profile's history (queued unless AMS_WRITE_BEHIND=0)"""
+    try:
+        if not write_behind.ENABLED:
+            return db.record_assessment(module, st.session_state.current_profile, data)
+        write = write_behind.get_writer().record_assessment(module, st.session_state.current_profile, data)
+        st.session_state.setdefault('pending_writes', []).append(write)
+        return write
+    except Exception as e:
+        st.error(f"Error saving assessment: {str(e)}")
+        return None
+
+def settle_writes():
+    """Wait for this session's queued assessments before a page reads history back"""
+    pending = []
+    for write in st.session_state.get('pending_writes', []):
+        if not write.wait():
+            pending.append(write)
+        elif write.error() is not None:
+            st.error(f"Error saving {write.payload['module']} assessment: {write.error()}")
+    st.session_state.pending_writes = pending
+    if pending:
+        st.warning("Still saving recent assessments; figures below may not include them yet.")
+@profiler.profiled()
 def show_dashboard():
     """Professional Athlete Dashboard with premium profile header"""
     
@@ -114,109 +231,6 @@ def show_dashboard():
     if 'current_profile' in st.session_state and st.session_state.current_profile:
         profile_info = st.session_state.athlete_data['personal_info']
         
-        # Premium CSS Styling
-        st.markdown("""
-        <style>
-            .athlete-profile {
-                background: white;
-                border-radius: 12px;
-                padding: 2rem;
-                margin-bottom: 2.5rem;
-                box-shadow: 0 4px 20px rgba(0,0,0,0.08);
-                border: 1px solid rgba(0,0,0,0.05);
-                font-family: 'Inter', sans-serif;
-            }
-            .profile-header {
-                display: flex;
-                align-items: center;
-                gap: 2.5rem;
-            }
-            .profile-avatar {
-                width: 120px;
-                height: 120px;
-                border-radius: 50%;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                color: white;
-                font-size: 3rem;
-                font-weight: 600;
-                flex-shrink: 0;
-            }
-            .profile-details {
-                flex-grow: 1;
-            }
-            .profile-name {
-                font-size: 1.8rem;
-                font-weight: 700;
-                margin-bottom: 0.25rem;
-                color: #1a1a1a;
-            }
-            .profile-title {
-                font-size: 1rem;
-                color: #6b7280;
-                margin-bottom: 1.25rem;
-                display: flex;
-                align-items: center;
-                gap: 0.5rem;
-            }
-            .profile-stats {
-                display: flex;
-                gap: 2rem;
-            }
-            .stat-item {
-                display: flex;
-                flex-direction: column;
-            }
-            .stat-label {
-                font-size: 0.75rem;
-                color: #6b7280;
-                text-transform: uppercase;
-                letter-spacing: 0.05em;
-                margin-bottom: 0.25rem;
-            }
-            .stat-value {
-                font-size: 1.25rem;
-                font-weight: 600;
-                color: #111827;
-            }
-            .profile-actions {
-                display: flex;
-                gap: 1rem;
-                margin-top: 1.5rem;
-            }
-            .action-btn {
-                padding: 0.5rem 1.25rem;
-                border-radius: 8px;
-                font-weight: 500;
-                font-size: 0.875rem;
-                cursor: pointer;
-                transition: all 0.2s;
-                border: none;
-            }
-            .primary-btn {
-                background: #4f46e5;
-                color: white;
-            }
-            .secondary-btn {
-                background: white;
-                color: #4f46e5;
-                border: 1px solid #d1d5db;
-            }
-            .badge {
-                display: inline-flex;
-                align-items: center;
-                padding: 0.35rem 0.75rem;
-                border-radius: 50px;
-                font-size: 0.75rem;
-                font-weight: 500;
-                background: #e0e7ff;
-                color: #4f46e5;
-            }
-        </style>
-        """, unsafe_allow_html=True)
-        
         # Get initials for avatar
         initials = ''.join([name[0].upper() for name in profile_info.get('name', 'A').split()[:2]])
         
@@ -253,7 +267,7 @@ def show_dashboard():
                             <div class="stat-item">
                                 <span class="stat-label">BMI</span>
                                 <span class="stat-value">
-                                    {calculate_bmi(profile_info.get('height', 0), profile_info.get('weight', 0)) if profile_info.get('height') and profile_info.get('weight') else '--'}
+                                    {scoring.calculate_bmi(profile_info.get('height', 0), profile_info.get('weight', 0)) if profile_info.get('height') and profile_info.get('weight') else '--'}
                                 </span>
                             </div>
                         </div>
@@ -268,6 +282,7 @@ def show_dashboard():
     
     # Always show module status
     st.header("Performance Dashboard")
+    settle_writes()
     show_module_status()
     
     # Only show detailed analytics if all modules are completed
@@ -276,20 +291,34 @@ def show_dashboard():
         with st.container():
             st.markdown("### Performance Metrics Summary")
             perf_data = st.session_state.athlete_data['performance']
+            perf_trends = trends.get_trends(st.session_state.current_profile, 'performance')
+            percentiles = cohort.cohort_percentiles(
+                db.get_profile(st.session_state.current_profile) or {}, 'performance',
+                {key: perf_data.get(key) for key in ('speed', 'strength', 'reaction_time', 'stamina')})
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Speed (km/h)", f"{perf_data.get('speed', 0)}", 
-                         delta=f"{(perf_data.get('speed', 0)-22.5):.1f} vs avg")
+                         delta=trend_delta(perf_trends.get('speed'), 1))
+                percentile_caption(percentiles.get('speed'))
             with col2:
                 st.metric("Strength (kg)", f"{perf_data.get('strength', 0)}", 
-                         delta=f"{(perf_data.get('strength', 0)-120):.1f} vs avg")
+                         delta=trend_delta(perf_trends.get('strength'), 1))
+                percentile_caption(percentiles.get('strength'))
             with col3:
                 st.metric("Reaction Time (s)", f"{perf_data.get('reaction_time', 0):.2f}", 
-                         delta=f"{(0.5 - perf_data.get('reaction_time', 0)):.2f} improvement")
+                         delta=trend_delta(perf_trends.get('reaction_time'), 2), delta_color="inverse")
+                percentile_caption(percentiles.get('reaction_time'), lower_is_better=True)
             with col4:
                 st.metric("Stamina (min)", f"{perf_data.get('stamina', 0)}", 
-                         delta=f"{(perf_data.get('stamina', 0)-75):.1f} vs avg")
+                         delta=trend_delta(perf_trends.get('stamina'), 1))
+                percentile_caption(percentiles.get('stamina'))
+            if percentiles:
+                stats = next(iter(percentiles.values()))
+                st.caption(f"Percentiles versus {stats['cohort']} · {stats['size']:,} stored assessments")
+            else:
+                st.caption(f"Cohort percentiles appear once {cohort.MIN_COHORT_SIZE} comparable "
+                           "assessments are stored.")
 
         # Health Risk Analysis
         st.markdown("---")
@@ -297,23 +326,14 @@ def show_dashboard():
             st.markdown("### Health & Injury Risk Assessment")
             injury_data = st.session_state.athlete_data['injury']
             
-            risk_score = (
-                injury_data.get('training_intensity', 0) * 0.4 + 
-                injury_data.get('past_injuries', 0) * 0.3 - 
-                injury_data.get('sleep_hours', 0) * 0.2 - 
-                injury_data.get('nutrition_score', 0) * 0.1
-            )
-            
-            recovery_score = (
-                injury_data.get('sleep_hours', 0)/8 * 40 + 
-                injury_data.get('nutrition_score', 0)/10 * 60
-            )
+            risk_score, recovery_score = dashboard_section(
+                'injury', injury_data, lambda: scoring.injury_scores(injury_data), "dashboard.score")
             
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown("*Injury Risk Factors*")
                 st.progress(min(100, int(risk_score*10)))
-                st.caption(f"Risk Score: {risk_score:.1f}/10 - {'High' if risk_score > 6 else 'Medium' if risk_score > 3 else 'Low'} Risk")
+                st.caption(f"Risk Score: {risk_score:.1f}/10 - {scoring.risk_level(risk_score)} Risk")
                 
                 st.markdown("*Key Indicators:*")
                 st.write(f"- Training Intensity: {injury_data.get('training_intensity', 0)}/10")
@@ -342,26 +362,29 @@ def show_dashboard():
             st.markdown("### Performance Trend Analysis")
             perf_data = st.session_state.athlete_data['performance']
             
-            metrics = ['Speed', 'Strength', 'Stamina', 'Reaction Time']
-            current = [
-                perf_data.get('speed', 0),
-                perf_data.get('strength', 0),
-                perf_data.get('stamina', 0),
-                10 - perf_data.get('reaction_time', 0)*10
-            ]
-            previous = [x*0.9 for x in current]
-            
-            df = pd.DataFrame({
-                'Metric': metrics,
-                'Current': current,
-                'Previous': previous
-            })
-            
-            fig = px.bar(df, x='Metric', y=['Previous', 'Current'],
-                        barmode='group', title="Performance Comparison",
-                        color_discrete_sequence=['#a3a3a3', '#3b82f6'])
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            with profiler.section("chart.performance_comparison"):
+                inputs = {'data': perf_data, 'trends': perf_trends}
+                fig = dashboard_section(
+                    'performance', inputs,
+                    lambda: figures.cached_figure('performance_comparison', inputs,
+                                                  lambda: performance_comparison_chart(perf_trends, perf_data)),
+                    "dashboard.chart")
+                st.plotly_chart(fig, use_container_width=True)
+            assessments = perf_trends.get('speed', {}).get('count', 0)
+            if assessments < 2:
+                st.caption("Submit another performance assessment to see changes over time.")
+            else:
+                with profiler.section("chart.performance_history"):
+                    # The trends change with every new assessment, so they stand in for the history
+                    profile_id = st.session_state.current_profile
+                    inputs = {'profile': profile_id, 'trends': perf_trends}
+                    fig = dashboard_section(
+                        'performance.history', inputs,
+                        lambda: figures.cached_figure('performance_history', inputs,
+                                                      lambda: performance_history_chart(profile_id)),
+                        "dashboard.chart")
+                    st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"Based on {assessments} assessments · change is versus the previous assessment")
 
         # Financial Health Dashboard
         st.markdown("---")
@@ -369,19 +392,8 @@ def show_dashboard():
             st.markdown("### Financial Health Overview")
             finance_data = st.session_state.athlete_data['finance']
             
-            total_income = (finance_data.get('salary', 0) + 
-                          finance_data.get('endorsements', 0) + 
-                          finance_data.get('appearances', 0) + 
-                          finance_data.get('other_income', 0))
-            
-            total_expenses = sum([finance_data.get(k, 0) for k in [
-                'coaching', 'equipment', 'physio', 'travel', 
-                'nutrition', 'housing', 'insurance', 'transport', 
-                'other_expenses'
-            ]])
-            
-            savings_rate = ((total_income - total_expenses) / total_income * 100 
-                          if total_income > 0 else 0)
+            total_income, total_expenses, savings_rate = dashboard_section(
+                'finance', finance_data, lambda: scoring.finance_totals(finance_data), "dashboard.score")
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -392,38 +404,54 @@ def show_dashboard():
                 st.metric("Savings Rate", f"{savings_rate:.1f}%")
             
             st.markdown("*Expense Allocation*")
-            expense_categories = ['Coaching', 'Equipment', 'Physio', 'Travel', 
-                                'Nutrition', 'Housing', 'Insurance', 'Transport']
-            expense_values = [finance_data.get(k.lower(), 0) for k in expense_categories]
-            
-            fig = px.pie(names=expense_categories, values=expense_values,
-                        hole=0.4, color_discrete_sequence=px.colors.sequential.Blues_r)
-            st.plotly_chart(fig, use_container_width=True)
+            with profiler.section("chart.expense_breakdown"):
+                fig = dashboard_section(
+                    'finance.chart', finance_data,
+                    lambda: figures.cached_figure('expense_breakdown', finance_data,
+                                                  lambda: expense_chart(finance_data)),
+                    "dashboard.chart")
+                st.plotly_chart(fig, use_container_width=True)
 
         # AI-Powered Insights
         st.markdown("---")
         with st.container():
             st.markdown("### Performance Insights")
-            analysis_prompt = f"""
-            Analyze this athlete's complete profile:
-            
-            Performance Data: {st.session_state.athlete_data.get('performance', {})}
-            Injury Risk Factors: {st.session_state.athlete_data.get('injury', {})}
-            Career Status: {st.session_state.athlete_data.get('career', {})}
-            Nutrition Profile: {st.session_state.athlete_data.get('nutrition', {})}
-            Financial Health: {st.session_state.athlete_data.get('finance', {})}
+            analysis_prompt = prompts.dashboard_prompt(st.session_state.athlete_data)
             
-            Provide:
-            1. Three key strengths
-            2. Three areas for improvement
-            3. Recommended training adjustments
-            4. Nutrition and recovery suggestions
-            5. Financial optimization strategies
-            """
+            # Run the LLM call off the script thread so the page renders immediately
+            fingerprint = athlete_fingerprint(st.session_state.athlete_data)
+            jobs = get_analysis_jobs()
+            job = jobs.submit(fingerprint, run_dashboard_analysis,
+                              analysis_prompt, get_response_cache(), get_ai_client())
+            failure = job.exception() if job.done() else None
+            if failure is not None:
+                # Forget the failed job so the next visit retries instead of replaying the error
+                jobs.discard(fingerprint)
+            elif job.done():
+                st.session_state.last_analysis = {'fingerprint': fingerprint, 'text': job.result()}
             
-            analysis = get_ai_response(analysis_prompt)
             st.markdown("#### Comprehensive Performance Analysis")
-            st.write(analysis)
+            last_analysis = st.session_state.get('last_analysis')
+            if last_analysis:
+                st.write(last_analysis['text'])
+            if failure is not None:
+                st.error(f"AI analysis unavailable: {failure}")
+            if not job.done():
+                if last_analysis:
+                    st.caption("Updating analysis for the latest data...")
+                else:
+                    st.info("Generating analysis in the background...")
+
+        # Dossier Export
+        st.markdown("---")
+        with st.container():
+            st.markdown("### Export Dossier")
+            show_dossier_export(fingerprint)
+
+        if not job.done():
+            # Poll only while a job for the current data is still running
+            time.sleep(ANALYSIS_POLL_SECONDS)
+            st.rerun()
     else:
         st.info(" Complete all modules to unlock detailed performance analytics and insights")
         # Show progress tracker
@@ -440,13 +468,161 @@ def show_dashboard():
             st.metric("Modules Completed", 
                      f"{sum(completion_status.values())}/5",
                      delta=f"{5 - sum(completion_status.values())} remaining")
-def calculate_bmi(height_cm, weight_kg):
-    """Helper function to calculate BMI"""
-    if height_cm <= 0 or weight_kg <= 0:
-        return "--"
-    height_m = height_cm / 100
-    bmi = round(weight_kg / (height_m ** 2), 1)
-    return bmi
+def show_dossier_export(fingerprint):
+    """HTML/PDF dossier of this dashboard, rendered on request and kept until the data changes"""
+    export = st.session_state.get('dossier_export')
+    if export is not None and export['fingerprint'] != fingerprint:
+        export = None
+    if export is None:
+        st.caption("Profile, performance, injury and finance sections with charts and the AI analyses "
+                   "already generated, for offline sharing.")
+        if not st.button("Prepare Dossier", key="dossier_prepare"):
+            return
+        with st.spinner("Rendering dossier..."), timed("dashboard.dossier"):
+            export = st.session_state.dossier_export = render_dossier(fingerprint)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download HTML", export['html'], file_name=f"{export['file_name']}.html",
+                           mime="text/html", use_container_width=True)
+    with col2:
+        if export['pdf'] is not None:
+            st.download_button("Download PDF", export['pdf'], file_name=f"{export['file_name']}.pdf",
+                               mime="application/pdf", use_container_width=True)
+        else:
+            st.caption(f"PDF unavailable: {export['pdf_error']}")
+
+def render_dossier(fingerprint):
+    """Dossier of the session's athlete as HTML and (with matplotlib) PDF"""
+    athlete_data = st.session_state.athlete_data
+    profile_id = st.session_state.current_profile
+    profile = (db.get_profile(profile_id) if profile_id else None) or dict(athlete_data['personal_info'])
+    # Module prompts use the name typed on the module pages, so look responses up by it
+    analyses = dossier.stored_analyses(profile_id, athlete_data['personal_info'].get('name'), athlete_data,
+                                       get_ai_client().model_name, get_response_cache())
+    report = dossier.build_dossier(profile, athlete_data, analyses)
+    export = {'fingerprint': fingerprint, 'html': dossier.render_html(report), 'pdf': None, 'pdf_error': None,
+              'file_name': f"{profile.get('name') or 'athlete'} dossier"}
+    try:
+        export['pdf'] = dossier.render_pdf(report)
+    except ImportError:
+        export['pdf_error'] = "install matplotlib to export PDF"
+    return export
+
+# Chart builders (also driven directly by benchmarks/suite.py)
+def dashboard_section(name, inputs, compute, stage):
+    """This session's last result for a dashboard section, recomputed only when its inputs change.
+
+    Inputs are hashed like the analysis job fingerprint. Only the first render
+    and renders after a change pay for compute() (timed under stage); other
+    reruns reuse the stored metrics or figure object.
+    """
+    memo = st.session_state.setdefault('dashboard_sections', {})
+    fingerprint = athlete_fingerprint(inputs)
+    entry = memo.get(name)
+    if entry is None or entry[0] != fingerprint:
+        with timed(stage):
+            entry = memo[name] = (fingerprint, compute())
+    return entry[1]
+
+def performance_comparison_chart(perf_trends, perf_data):
+    """Previous vs current vs rolling-average bars for the headline metrics"""
+    import pandas as pd
+    import plotly.express as px
+    # Reaction time is inverted so that taller bars are always better
+    trend_metrics = {
+        'Speed': ('speed', lambda x: x),
+        'Strength': ('strength', lambda x: x),
+        'Stamina': ('stamina', lambda x: x),
+        'Reaction Time': ('reaction_time', lambda x: 10 - x*10)
+    }
+    rows = []
+    for label, (key, scale) in trend_metrics.items():
+        trend = perf_trends.get(key, {})
+        current = trend.get('current', perf_data.get(key, 0))
+        previous = trend.get('previous')
+        rolling_mean = trend.get('rolling_mean')
+        rows.append({
+            'Metric': label,
+            'Previous': scale(previous) if previous is not None else None,
+            'Current': scale(current),
+            f'Last {trends.ROLLING_WINDOW} avg': scale(rolling_mean) if rolling_mean is not None else None
+        })
+    
+    series = ['Previous', 'Current', f'Last {trends.ROLLING_WINDOW} avg']
+    df = pd.DataFrame(rows).astype({name: float for name in series})
+    return px.bar(df, x='Metric', y=series,
+                  barmode='group', title="Performance Comparison",
+                  color_discrete_sequence=['#a3a3a3', '#3b82f6', '#93c5fd'])
+
+def expense_chart(finance_data):
+    import plotly.express as px
+    expense_categories = ['Coaching', 'Equipment', 'Physio', 'Travel', 
+                          'Nutrition', 'Housing', 'Insurance', 'Transport']
+    expense_values = [finance_data.get(k.lower(), 0) for k in expense_categories]
+    return px.pie(names=expense_categories, values=expense_values,
+                  hole=0.4, color_discrete_sequence=px.colors.sequential.Blues_r)
+
+def projection_fan_chart(result):
+    """Net worth percentile bands by age from a projection.Projection"""
+    import plotly.graph_objects as go
+    ages = [round(float(a), 2) for a in result.ages]
+    fig = go.Figure()
+    # Outer band first so the inner one draws on top; fill='tonexty' shades down to the previous trace
+    for low, high, colour in [(5, 95, 'rgba(59,130,246,0.15)'), (25, 75, 'rgba(59,130,246,0.35)')]:
+        fig.add_trace(go.Scatter(x=ages, y=result.bands[low], line=dict(width=0),
+                                 hoverinfo='skip', showlegend=False))
+        fig.add_trace(go.Scatter(x=ages, y=result.bands[high], line=dict(width=0), fill='tonexty',
+                                 fillcolor=colour, name=f"P{low}-P{high}"))
+    fig.add_trace(go.Scatter(x=ages, y=result.bands[50], line=dict(color='#1d4ed8', width=2), name="Median"))
+    fig.add_hline(y=0, line_dash='dot', line_color='#ef4444')
+    fig.update_layout(title=f"Projected Net Worth ({result.paths:,} simulations)",
+                      xaxis_title="Age", yaxis_title="Net worth (₹)", hovermode='x unified')
+    return fig
+
+def performance_metrics_chart(performance_data, athlete_name):
+    import pandas as pd
+    import plotly.express as px
+    df = pd.DataFrame([{"Metric": metric, "Value": value} for metric, value in performance_data.items()])
+    # One trace with a colour per bar: the same picture as color="Metric" without 16 traces
+    # (and a legend repeating the axis labels) in the payload
+    palette = px.colors.qualitative.Plotly
+    fig = px.bar(
+        df,
+        x="Metric",
+        y="Value",
+        title=f"Performance Metrics for {athlete_name}"
+    )
+    fig.update_traces(marker_color=[palette[i % len(palette)] for i in range(len(df))])
+    return fig
+
+def performance_history_chart(profile_id):
+    """Headline performance metrics over the latest stored assessments, oldest first"""
+    import pandas as pd
+    import plotly.express as px
+    columns = ['recorded_at', 'speed', 'strength', 'stamina']
+    history = db.assessment_history('performance', profile_id, columns=columns, limit=figures.HISTORY_ROWS)
+    df = pd.DataFrame(history, columns=columns)
+    df['recorded_at'] = pd.to_datetime(df['recorded_at'])
+    return px.line(df.iloc[::-1], x='recorded_at', y=['speed', 'strength', 'stamina'],
+                   title="Performance History", labels={'recorded_at': '', 'value': '', 'variable': ''})
+
+def percentile_caption(stats, lower_is_better=False):
+    """'Better than N% of cohort' under a dashboard metric"""
+    if not stats:
+        return
+    better_than = 100 - stats['percentile'] if lower_is_better else stats['percentile']
+    st.caption(f"Better than {better_than:.0f}% of cohort")
+
+def trend_delta(trend, precision):
+    """Metric delta text versus the previous assessment, or None without history"""
+    if not trend or trend.get('delta') is None:
+        return None
+    return f"{trend['delta']:+.{precision}f} vs last"
+
+def format_median(value, template):
+    return template.format(value) if value is not None else "--"
+
 def all_modules_completed():
     """Check if all modules have data"""
     required_modules = ['performance', 'injury', 'career', 'nutrition', 'finance']
@@ -454,39 +630,6 @@ def all_modules_completed():
 
 def show_module_status():
     """Professional module cards with fully clickable area"""
-    
-    # Load Inter font
-    st.markdown("""
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap" rel="stylesheet">
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-            
-            .dashboard-card-container {
-                position: relative;
-            }
-            .dashboard-card {
-                border: 1px solid rgba(226, 232, 240, 0.8);
-                border-radius: 14px;
-                padding: 28px;
-                margin: 12px 0;
-                background: linear-gradient(145deg, #ffffff, #f9fafb);
-                box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.02), 0 2px 4px -1px rgba(0, 0, 0, 0.02);
-                height: 160px;
-                display: flex;
-                flex-direction: column;
-                justify-content: space-between;
-                transition: all 0.25s cubic-bezier(0.4, 0, 0.2, 1);
-                font-family: 'Inter', sans-serif;
-            }
-            .dashboard-card:hover {
-                box-shadow: 0 10px 15px -3px rgba(59, 130, 246, 0.08), 0 4px 6px -4px rgba(59, 130, 246, 0.08);
-                transform: translateY(-2px);
-                border-color: rgba(165, 180, 252, 0.6);
-                cursor: pointer;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
     modules = {
         "Performance Analytics": "performance",
         "Injury Prevention": "injury", 
@@ -520,26 +663,6 @@ def show_module_status():
                            help=f"Go to {module_name}"):
                     st.session_state.current_module = module_key
                     st.rerun()
-                
-                # Style the button to cover the card
-                st.markdown(f"""
-                <style>
-                    div[data-testid="stVerticalBlock"] > div[data-testid="stVerticalBlockBorderWrapper"] > div[data-testid="stButton"] > button[key="card_btn_{module_key}"] {{
-                        position: absolute;
-                        top: 0;
-                        left: 0;
-                        width: 100%;
-                        height: 100%;
-                        opacity: 0;
-                        z-index: 1;
-                        padding: 0;
-                        margin: 0;
-                    }}
-                    div[data-testid="stHorizontalBlock"] > div:nth-child({i%3+1}) {{
-                        position: relative;
-                    }}
-                </style>
-                """, unsafe_allow_html=True)
 
 def add_back_button():
     if st.button("← Back to Dashboard", key="back_button"):
@@ -547,6 +670,7 @@ def add_back_button():
             del st.session_state.current_module
         st.rerun()
 
+@profiler.profiled()
 def analyze_performance():
     st.markdown("<h2>Performance Tracking</h2>", unsafe_allow_html=True)
     
@@ -554,50 +678,21 @@ def analyze_performance():
     
     with st.container():
         col1, col2, col3 = st.columns(3)
+        # Squad medians from the cohort sketches instead of fixed example values
+        medians = {metric: sketch.quantile(0.5)
+                   for metric, sketch in cohort.cohort_sketches('performance').items()}
         with col1:
-            with stylable_container(
-                key="perf_metric_speed",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #3b82f6;
-                }
-                """
-            ):
-                st.metric(label="Avg Speed", value="22.5 km/h", delta="+1.2 km/h")
+            with styles.metric_card("blue"):
+                st.metric(label="Squad Median Speed", value=format_median(medians.get('speed'), "{:.1f} km/h"))
         
         with col2:
-            with stylable_container(
-                key="perf_metric_reaction",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #10b981;
-                }
-                """
-            ):
-                st.metric(label="Reaction Time", value="0.42s", delta="-0.08s")
+            with styles.metric_card("green"):
+                st.metric(label="Squad Median Reaction Time",
+                          value=format_median(medians.get('reaction_time'), "{:.2f}s"))
         
         with col3:
-            with stylable_container(
-                key="perf_metric_strength",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #f59e0b;
-                }
-                """
-            ):
-                st.metric(label="Strength Index", value="87/100", delta="+5 points")
+            with styles.metric_card("amber"):
+                st.metric(label="Squad Median Strength", value=format_median(medians.get('strength'), "{:.0f} kg"))
 
     with st.expander("Detailed Performance Analysis", expanded=True):
         with st.form("performance_form"):
@@ -640,7 +735,7 @@ def analyze_performance():
             
             if submit_button:
                 with st.spinner("Crunching numbers..."):
-                    time.sleep(1)
+                    timer = StageTimer("performance")
                     performance_data = {
                         "speed": speed,
                         "stamina": stamina,
@@ -659,30 +754,27 @@ def analyze_performance():
                         "motivation": motivation,
                         "composure": composure
                     }
+                    timer.lap("prepare")
+                    save_assessment('performance', performance_data)
+                    timer.lap("db_write")
                     
                     # Store in session state
                     st.session_state.athlete_data['performance'] = performance_data
                     st.session_state.athlete_data['personal_info']['name'] = athlete_name
                     
-                    # Create a combined dataframe for visualization
-                    combined_data = []
-                    for metric, value in performance_data.items():
-                        combined_data.append({"Metric": metric, "Value": value})
-                    
-                    df = pd.DataFrame(combined_data)
-                    
-                    fig = px.bar(
-                        df,
-                        x="Metric",
-                        y="Value",
-                        title=f"Performance Metrics for {athlete_name}",
-                        color="Metric"
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    with profiler.section("chart.performance_metrics"):
+                        fig = figures.cached_figure(
+                            'performance_metrics', {'data': performance_data, 'name': athlete_name},
+                            lambda: performance_metrics_chart(performance_data, athlete_name))
+                        st.plotly_chart(fig, use_container_width=True)
+                    timer.lap("chart")
                     
-                    prompt = f"Analyze this athlete's performance: {performance_data}"
-                    st.success(get_ai_response(prompt))
+                    prompt = prompts.performance_prompt(athlete_name, performance_data)
+                    show_ai_response(prompt)
+                    timer.lap("llm")
+                    st.caption(timer.summary())
 
+@profiler.profiled()
 def injury_prediction():
     st.markdown("<h2>Injury Prediction</h2>", unsafe_allow_html=True)
     add_back_button()
@@ -690,48 +782,15 @@ def injury_prediction():
     with st.container():
         col1, col2, col3 = st.columns(3)
         with col1:
-            with stylable_container(
-                key="injury_metric_risk",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #ef4444;
-                }
-                """
-            ):
+            with styles.metric_card("red"):
                 st.metric(label="High Risk Athletes", value="3", delta="+1 this week")
         
         with col2:
-            with stylable_container(
-                key="injury_metric_recovery",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #f59e0b;
-                }
-                """
-            ):
+            with styles.metric_card("amber"):
                 st.metric(label="Recovery Progress", value="68%", delta="+12%")
         
         with col3:
-            with stylable_container(
-                key="injury_metric_days",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #10b981;
-                }
-                """
-            ):
+            with styles.metric_card("green"):
                 st.metric(label="Injury-Free Days", value="27", delta="+5 streak")
 
     with st.expander("Injury Risk Assessment", expanded=True):
@@ -752,8 +811,9 @@ def injury_prediction():
             
             if submit_button:
                 with st.spinner("Analyzing..."):
-                    time.sleep(1)
-                    risk_score = (training_intensity * 0.4) + (past_injuries * 0.3) - (sleep_hours * 0.2) - (nutrition_score * 0.1)
+                    timer = StageTimer("injury")
+                    risk_score = scoring.injury_risk_score(training_intensity, past_injuries, sleep_hours, nutrition_score)
+                    timer.lap("score")
                     st.write(f"Injury Risk Score: {risk_score:.2f}")
                     
                     # Store in session state
@@ -768,9 +828,15 @@ def injury_prediction():
                     }
                     st.session_state.athlete_data['personal_info']['name'] = athlete_name
                     
-                    prompt = f"Injury risk analysis for {athlete_name}: Intensity={training_intensity}, Injuries={past_injuries}, Sleep={sleep_hours}, Nutrition={nutrition_score}, Stress={stress_level}"
-                    st.success(get_ai_response(prompt))
+                    prompt = prompts.injury_prompt(athlete_name, st.session_state.athlete_data['injury'])
+                    timer.lap("prepare")
+                    save_assessment('injury', st.session_state.athlete_data['injury'])
+                    timer.lap("db_write")
+                    show_ai_response(prompt)
+                    timer.lap("llm")
+                    st.caption(timer.summary())
 
+@profiler.profiled()
 def career_planning():
     st.markdown("<h2>Career Planning</h2>", unsafe_allow_html=True)
     add_back_button()
@@ -778,48 +844,15 @@ def career_planning():
     with st.container():
         col1, col2, col3 = st.columns(3)
         with col1:
-            with stylable_container(
-                key="career_metric_potential",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #3b82f6;
-                }
-                """
-            ):
+            with styles.metric_card("blue"):
                 st.metric(label="Career Potential", value="High", delta="Improving")
         
         with col2:
-            with stylable_container(
-                key="career_metric_years",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #f59e0b;
-                }
-                """
-            ):
+            with styles.metric_card("amber"):
                 st.metric(label="Peak Years Left", value="5-7", delta="Optimal")
         
         with col3:
-            with stylable_container(
-                key="career_metric_transition",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #10b981;
-                }
-                """
-            ):
+            with styles.metric_card("green"):
                 st.metric(label="Transition Readiness", value="68%", delta="+8%")
 
     with st.expander("Career Pathway Analysis", expanded=True):
@@ -837,7 +870,7 @@ def career_planning():
             
             if submit_button:
                 with st.spinner("Developing pathway..."):
-                    time.sleep(1)
+                    timer = StageTimer("career")
                     # Store in session state
                     st.session_state.athlete_data['career'] = {
                         "age": age,
@@ -851,9 +884,15 @@ def career_planning():
                         "age": age
                     }
                     
-                    prompt = f"Career plan for {athlete_name}, {age}y/o {sport} athlete with {experience} years experience. Strengths: {strengths}"
-                    st.success(get_ai_response(prompt))
+                    prompt = prompts.career_prompt(athlete_name, st.session_state.athlete_data['career'])
+                    timer.lap("prepare")
+                    save_assessment('career', st.session_state.athlete_data['career'])
+                    timer.lap("db_write")
+                    show_ai_response(prompt)
+                    timer.lap("llm")
+                    st.caption(timer.summary())
 
+@profiler.profiled()
 def nutrition_planner():
     st.markdown("<h2>Nutrition Planner</h2>", unsafe_allow_html=True)
     add_back_button()
@@ -861,48 +900,15 @@ def nutrition_planner():
     with st.container():
         col1, col2, col3 = st.columns(3)
         with col1:
-            with stylable_container(
-                key="nutrition_metric_calories",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #3b82f6;
-                }
-                """
-            ):
+            with styles.metric_card("blue"):
                 st.metric(label="Daily Calories", value="2,800", delta="+200")
         
         with col2:
-            with stylable_container(
-                key="nutrition_metric_protein",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #10b981;
-                }
-                """
-            ):
+            with styles.metric_card("green"):
                 st.metric(label="Protein (g)", value="180g", delta="+15g")
         
         with col3:
-            with stylable_container(
-                key="nutrition_metric_hydration",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #f59e0b;
-                }
-                """
-            ):
+            with styles.metric_card("amber"):
                 st.metric(label="Hydration (L)", value="3.2L", delta="+0.5L")
 
     with st.expander("Personalized Meal Plan", expanded=True):
@@ -927,8 +933,9 @@ def nutrition_planner():
             
             if submit_button:
                 with st.spinner("Creating personalized nutrition plan..."):
-                    time.sleep(1)
-                    bmi = weight / ((height/100) ** 2)
+                    timer = StageTimer("nutrition")
+                    bmi = scoring.bmi(height, weight)
+                    timer.lap("score")
                     st.write(f"Calculated BMI: {bmi:.1f}")
                     
                     # Store in session state
@@ -948,23 +955,15 @@ def nutrition_planner():
                         "height": height
                     }
                     
-                    prompt = f"""
-                    Create a personalized meal plan for {athlete_name}:
-                    - Weight: {weight}kg
-                    - Height: {height}cm
-                    - Age: {age}
-                    - Activity Level: {activity_level}
-                    - Dietary Preference: {dietary_pref}
-                    - Allergies: {allergies}
-                    
-                    Include:
-                    1. Daily macronutrient breakdown
-                    2. Sample meal plan for 3 days
-                    3. Hydration recommendations
-                    4. Pre/post-workout nutrition
-                    """
-                    st.success(get_ai_response(prompt))
+                    prompt = prompts.nutrition_prompt(athlete_name, st.session_state.athlete_data['nutrition'])
+                    timer.lap("prepare")
+                    save_assessment('nutrition', st.session_state.athlete_data['nutrition'])
+                    timer.lap("db_write")
+                    show_ai_response(prompt)
+                    timer.lap("llm")
+                    st.caption(timer.summary())
 
+@profiler.profiled()
 def financial_planner():
     st.markdown("<h2>Financial Planner</h2>", unsafe_allow_html=True)
     add_back_button()
@@ -972,48 +971,15 @@ def financial_planner():
     with st.container():
         col1, col2, col3 = st.columns(3)
         with col1:
-            with stylable_container(
-                key="finance_metric_income",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #3b82f6;
-                }
-                """
-            ):
+            with styles.metric_card("blue"):
                 st.metric(label="Monthly Income", value="₹7,00,000", delta="+₹40,000")
         
         with col2:
-            with stylable_container(
-                key="finance_metric_expenses",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #ef4444;
-                }
-                """
-            ):
+            with styles.metric_card("red"):
                 st.metric(label="Monthly Expenses", value="₹3,50,000", delta="+₹15,000")
         
         with col3:
-            with stylable_container(
-                key="finance_metric_savings",
-                css_styles="""
-                {
-                    background: white;
-                    border-radius: 10px;
-                    padding: 1rem;
-                    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                    border-left: 4px solid #10b981;
-                }
-                """
-            ):
+            with styles.metric_card("green"):
                 st.metric(label="Savings Rate", value="32%", delta="+2%")
 
     with st.expander("Financial Health Analysis", expanded=True):
@@ -1055,26 +1021,21 @@ def financial_planner():
             
             if submit_button:
                 with st.spinner("Analyzing financial health..."):
-                    time.sleep(1)
-                    total_income = salary + endorsements + appearances + other_income
-                    total_expenses = (coaching + equipment + physio + travel + 
-                                    nutrition + housing + insurance + transport + 
-                                    other_expenses)
+                    timer = StageTimer("finance")
+                    total_income, total_expenses, savings_rate = scoring.finance_totals({
+                        "salary": salary, "endorsements": endorsements, "appearances": appearances,
+                        "other_income": other_income, "coaching": coaching, "equipment": equipment,
+                        "physio": physio, "travel": travel, "nutrition": nutrition, "housing": housing,
+                        "insurance": insurance, "transport": transport, "other_expenses": other_expenses
+                    })
                     savings = total_income - total_expenses
-                    savings_rate = (savings / total_income) * 100 if total_income > 0 else 0
+                    timer.lap("score")
                     
                     st.write(f"*Monthly Savings:* ₹{savings:,.2f} ({savings_rate:.1f}% of income)")
                     
                     # Financial health indicator
-                    if savings_rate > 30:
-                        financial_health = "Excellent"
-                        health_color = "green"
-                    elif savings_rate > 15:
-                        financial_health = "Good"
-                        health_color = "blue"
-                    else:
-                        financial_health = "Needs Improvement"
-                        health_color = "red"
+                    financial_health = scoring.financial_health(savings_rate)
+                    health_color = {"Excellent": "green", "Good": "blue"}.get(financial_health, "red")
                     
                     st.markdown(f"*Financial Health:* <span style='color:{health_color}'>{financial_health}</span>", unsafe_allow_html=True)
                     
@@ -1101,22 +1062,55 @@ def financial_planner():
                     st.session_state.athlete_data['personal_info']['name'] = athlete_name
                     
                     # Generate recommendations
-                    prompt = f"""
-                    Create a financial management plan for professional athlete {athlete_name}:
-                    - Total Monthly Income: ₹{total_income:,.2f}
-                    - Total Monthly Expenses: ₹{total_expenses:,.2f}
-                    - Monthly Savings: ₹{savings:,.2f} ({savings_rate:.1f}%)
-                    
-                    Focus specifically on:
-                    1. Optimizing athlete-specific expenses (training, equipment, coaching)
-                    2. Sponsorship and endorsement management strategies
-                    3. Savings and investment strategies for athletes
-                    4. Budgeting for competition seasons vs off-seasons
-                    5. Retirement planning for athletes
-                    
-                    Provide concrete, actionable recommendations.
-                    """
-                    st.success(get_ai_response(prompt))
+                    prompt = prompts.finance_prompt(athlete_name, st.session_state.athlete_data['finance'])
+                    timer.lap("prepare")
+                    save_assessment('finance', st.session_state.athlete_data['finance'])
+                    timer.lap("db_write")
+                    show_ai_response(prompt)
+                    timer.lap("llm")
+                    st.caption(timer.summary())
+
+    if st.session_state.athlete_data.get('finance'):
+        show_finance_projection(st.session_state.athlete_data['finance'])
+
+def show_finance_projection(finance_data):
+    """Monte Carlo fan chart of net worth; the sliders re-run it (well under a second)"""
+    with st.expander("Long-term Projection", expanded=True):
+        profile_age = st.session_state.athlete_data['personal_info'].get('age') or projection.DEFAULTS['age']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            years = st.slider("Years", 10, 20, projection.DEFAULTS['years'], key="projection_years")
+        with col2:
+            retirement_age = st.slider("Retirement Age", int(profile_age), int(profile_age) + 20,
+                                       max(int(profile_age), projection.DEFAULTS['retirement_age']),
+                                       key="projection_retirement")
+        with col3:
+            inflation = st.slider("Inflation %", 0.0, 12.0, projection.DEFAULTS['inflation'] * 100, 0.5,
+                                  key="projection_inflation")
+        with col4:
+            investment_return = st.slider("Investment Return %", 0.0, 15.0,
+                                          projection.DEFAULTS['investment_return'] * 100, 0.5,
+                                          key="projection_return")
+        assumptions = {'years': years, 'age': profile_age, 'retirement_age': retirement_age,
+                       'inflation': inflation / 100, 'investment_return': investment_return / 100}
+        # A fixed seed keeps the bands steady across reruns with the same inputs
+        result = dashboard_section(
+            'finance.projection', {'finance': finance_data, 'assumptions': assumptions},
+            lambda: projection.project(finance_data, seed=0, **assumptions), "finance.projection")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            at_retirement = result.retirement_wealth or result.final_wealth
+            st.metric("Median at Retirement", f"₹{at_retirement[50]:,.0f}")
+        with col2:
+            st.metric(f"Median at {profile_age + years}", f"₹{result.final_wealth[50]:,.0f}")
+        with col3:
+            st.metric("Chance of Running Out", f"{result.ruin_probability:.0%}")
+        fig = figures.cached_figure('projection_fan', {'finance': finance_data, 'assumptions': assumptions},
+                                    lambda: projection_fan_chart(result))
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{result.paths:,} simulated careers in {result.elapsed * 1000:.0f} ms · "
+                   "bands show the 5th-95th and 25th-75th percentiles")
 
 def show_profile_creation():
     st.header("Create Athlete Profile")
@@ -1126,7 +1120,7 @@ def show_profile_creation():
         
         with col1:
             st.subheader("Profile Details")
-            gender = st.radio("Gender", ["Male", "Female"], horizontal=True)
+            gender = st.radio("Gender", GENDERS, horizontal=True)
             show_athlete_icon(gender)
         
         with col2:
@@ -1137,14 +1131,20 @@ def show_profile_creation():
             
             col3, col4 = st.columns(2)
             with col3:
-                age = st.number_input("Age*", min_value=12, max_value=60, value=25)
-                weight = st.number_input("Weight (kg)*", min_value=40, max_value=150, value=75)
+                age = st.number_input("Age*", min_value=PROFILE_RULES['age']['min'],
+                                      max_value=PROFILE_RULES['age']['max'], value=25)
+                weight = st.number_input("Weight (kg)*", min_value=PROFILE_RULES['weight']['min'],
+                                         max_value=PROFILE_RULES['weight']['max'], value=75)
             with col4:
-                height = st.number_input("Height (cm)*", min_value=140, max_value=220, value=180)
+                height = st.number_input("Height (cm)*", min_value=PROFILE_RULES['height']['min'],
+                                         max_value=PROFILE_RULES['height']['max'], value=180)
         
         if st.form_submit_button("Create Profile", use_container_width=True):
+            timer = StageTimer("profile")
             if name:
+                timer.lap("validation")
                 profile_id = save_profile(name, sport, age, height, weight, gender)
+                timer.lap("db_write")
                 if profile_id:
                     st.session_state.current_profile = profile_id
                     st.session_state.athlete_data['personal_info'] = {
@@ -1159,6 +1159,311 @@ def show_profile_creation():
                     st.rerun()
             else:
                 st.error("Please enter at least a name")
+    
+    with st.expander("Or open an existing athlete"):
+        show_roster()
+def load_athlete(profile):
+    """Make a stored profile current and restore its latest module data"""
+    athlete_data = {
+        'personal_info': {k: profile[k] for k in ('name', 'sport', 'age', 'height', 'weight', 'gender')}
+    }
+    for module in db.ASSESSMENT_COLUMNS:
+        latest = db.latest_assessment(module, profile['id'])
+        athlete_data[module] = ({k: v for k, v in latest.items() if k not in ('id', 'profile_id', 'recorded_at')}
+                                if latest else {})
+    st.session_state.current_profile = profile['id']
+    st.session_state.athlete_data = athlete_data
+    st.session_state.pop('current_module', None)
+    st.session_state.pop('last_analysis', None)
+
+@profiler.profiled()
+def show_roster():
+    """Paginated, filterable list of stored athlete profiles"""
+    import pandas as pd
+    st.header("Athlete Roster")
+    
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
+    with col1:
+        name_prefix = st.text_input("Search by name", key="roster_name", placeholder="Start typing a name")
+    with col2:
+        sport = st.selectbox("Sport", ["All"] + db.profile_sports(), key="roster_sport")
+    with col3:
+        gender = st.selectbox("Gender", ["All", "Male", "Female"], key="roster_gender")
+    with col4:
+        min_age, max_age = st.slider("Age range", 12, 60, (12, 60), key="roster_age")
+    
+    # Keyset pagination: one cursor (last id of the previous page) per visited page
+    filters = (name_prefix.strip(), sport, gender, min_age, max_age)
+    if st.session_state.get('roster_filters') != filters:
+        st.session_state.roster_filters = filters
+        st.session_state.roster_cursors = [0]
+    cursors = st.session_state.roster_cursors
+    
+    rows, next_after_id = db.search_profiles(
+        sport=None if sport == "All" else sport,
+        gender=None if gender == "All" else gender,
+        min_age=min_age,
+        max_age=max_age,
+        name_prefix=name_prefix,
+        after_id=cursors[-1]
+    )
+    
+    if rows:
+        df = pd.DataFrame(rows)[['id', 'name', 'sport', 'gender', 'age', 'height', 'weight', 'join_date']]
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            by_label = {f"{row['name']} · {row['sport']} · #{row['id']}": row for row in rows}
+            choice = st.selectbox("Select athlete", list(by_label), key="roster_choice")
+        with col2:
+            st.write("")
+            if st.button("Open Profile", key="roster_open", use_container_width=True):
+                load_athlete(by_label[choice])
+                st.rerun()
+    else:
+        st.info("No athletes match these filters")
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("← Previous", key="roster_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if st.button("Next →", key="roster_next", disabled=next_after_id is None):
+            cursors.append(next_after_id)
+            st.rerun()
+
+@profiler.profiled()
+def show_risk_board():
+    """Every athlete ranked by injury risk from their latest injury assessment"""
+    import pandas as pd
+    st.header("Team Risk Board")
+    settle_writes()
+    
+    sport = st.selectbox("Sport", ["All"] + db.profile_sports(), key="risk_board_sport")
+    columns, rows = db.latest_assessments('injury', sport=None if sport == "All" else sport)
+    if not rows:
+        st.info("No injury assessments recorded yet. Submit the Injury module to populate the board.")
+        return
+    
+    with timed("risk_board.score"):
+        board = scoring.score_roster(pd.DataFrame.from_records(rows, columns=columns))
+    
+    counts = board['risk_level'].value_counts()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("High Risk", int(counts.get('High', 0)))
+    with col2:
+        st.metric("Medium Risk", int(counts.get('Medium', 0)))
+    with col3:
+        st.metric("Low Risk", int(counts.get('Low', 0)))
+    
+    top_n = st.slider("Athletes shown", 10, 500, 50, step=10, key="risk_board_top")
+    st.dataframe(
+        board.head(top_n)[['name', 'sport', 'gender', 'age', 'risk_score', 'risk_level',
+                           'recovery_score', 'training_intensity', 'past_injuries',
+                           'sleep_hours', 'nutrition_score', 'recorded_at']].round(2),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def show_admin():
+    st.header("Admin")
+    latency_tab, profiler_tab, tokens_tab, import_tab, reports_tab = st.tabs(
+        ["Stage Latency", "Profiler", "Prompt Tokens", "Bulk Import", "Batch Reports"])
+    with latency_tab:
+        show_stage_latency()
+    with profiler_tab:
+        show_profiler()
+    with tokens_tab:
+        show_prompt_tokens()
+    with import_tab:
+        show_bulk_import()
+    with reports_tab:
+        show_batch_reports()
+
+def show_stage_latency():
+    """Per-stage latency histograms collected since the process started"""
+    import pandas as pd
+    import plotly.express as px
+    gauges = metrics.gauges()
+    if gauges:
+        cols = st.columns(len(gauges))
+        for col, (name, gauge) in zip(cols, gauges.items()):
+            col.metric(name, gauge['value'], help=f"Peak {gauge['max']}")
+    figure_stats = figures.cache_stats()
+    if figure_stats['hits'] or figure_stats['misses']:
+        st.caption(f"Figure cache: {figure_stats['entries']} figures · {figure_stats['hits']} hits, "
+                   f"{figure_stats['misses']} builds")
+    snapshot = metrics.snapshot()
+    if not snapshot:
+        st.info("No timings recorded yet. Submit a module form to collect stage latencies.")
+        return
+    
+    df = pd.DataFrame([
+        {
+            "Stage": name,
+            "Count": stats['count'],
+            "Mean (ms)": round(stats['mean_ms'], 1),
+            "p50 (ms)": round(stats['p50_ms'], 1),
+            "p95 (ms)": round(stats['p95_ms'], 1),
+            "Max (ms)": round(stats['max_ms'], 1)
+        }
+        for name, stats in snapshot.items()
+    ])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    stage = st.selectbox("Histogram for stage", list(snapshot))
+    fig = px.bar(x=metrics.bucket_labels(), y=snapshot[stage]['buckets'],
+                 labels={'x': 'Latency', 'y': 'Samples'}, title=f"{stage} latency distribution")
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if st.button("Reset timings"):
+        metrics.reset()
+        st.rerun()
+
+def show_prompt_tokens():
+    """Estimated prompt sizes per advisor, against the raw dict reprs they replace"""
+    import pandas as pd
+    stats = prompts.token_stats()
+    if not stats:
+        st.info("No prompts sent yet. Submit a module form or open the dashboard.")
+        return
+    
+    df = pd.DataFrame([
+        {
+            "Prompt": kind,
+            "Count": entry['prompts'],
+            "Mean tokens": round(entry['mean_tokens']),
+            "Data tokens": round(entry['mean_data_tokens']),
+            "Raw data tokens": round(entry['mean_raw_data_tokens']),
+            "Data saved": f"{1 - entry['mean_data_tokens'] / entry['mean_raw_data_tokens']:.0%}"
+                          if entry['mean_raw_data_tokens'] else "–"
+        }
+        for kind, entry in stats.items()
+    ])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.caption(f"Token counts are estimates; each data section is capped at "
+               f"{prompts.SECTION_TOKEN_BUDGET} tokens (AMS_PROMPT_SECTION_TOKENS).")
+
+def show_rerun_profile():
+    """Sidebar breakdown of this session's previous rerun"""
+    run = st.session_state.get('profiler_last_rerun')
+    with st.expander("Last Rerun Profile"):
+        if run is None:
+            st.caption("No rerun recorded yet.")
+            return
+        st.caption(f"{run.elapsed * 1000:.0f} ms · {run.outcome}")
+        st.text("\n".join(f"{'  ' * depth}{name} {ms:.1f} ms" for name, depth, ms in run.summary()))
+
+def show_profiler():
+    """Per-function latency percentiles and cProfile reports of the slowest reruns"""
+    import pandas as pd
+    if not profiler.ENABLED:
+        st.info("Profiling is off. Start the app with AMS_PROFILE=1 to time reruns, "
+                "and AMS_PROFILE_SLOWEST=N to keep cProfile reports of the N slowest.")
+        return
+    stats = profiler.function_stats()
+    if not stats:
+        st.info("No profiled calls yet.")
+        return
+    
+    df = pd.DataFrame([
+        {
+            "Function": name,
+            "Calls": stat['count'],
+            "p50 (ms)": round(stat['p50_ms'], 1),
+            "p95 (ms)": round(stat['p95_ms'], 1),
+            "p99 (ms)": round(stat['p99_ms'], 1),
+            "Max (ms)": round(stat['max_ms'], 1)
+        }
+        for name, stat in sorted(stats.items(), key=lambda item: -item[1]['p95_ms'])
+    ])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    recent = profiler.recent_reruns()
+    st.subheader("Recent Reruns")
+    st.bar_chart(pd.DataFrame({"Rerun (ms)": [run.elapsed * 1000 for run in recent]}))
+    
+    st.subheader("Slowest Reruns")
+    for run in profiler.slowest_reruns():
+        started = time.strftime('%H:%M:%S', time.localtime(run.started_at))
+        with st.expander(f"{run.elapsed * 1000:.0f} ms at {started} ({run.outcome})"):
+            st.text("\n".join(f"{'  ' * depth}{name} {ms:.1f} ms" for name, depth, ms in run.summary()))
+            if run.report:
+                st.code(run.report, language=None)
+    
+    if st.button("Reset profiler"):
+        profiler.reset()
+        st.rerun()
+
+def show_bulk_import():
+    """Upload a CSV/Parquet file of athletes or assessments"""
+    import pandas as pd
+    import bulk_import
+    kind = st.radio("Import", ["Profiles", "Assessments"], horizontal=True, key="import_kind")
+    module = None
+    if kind == "Assessments":
+        module = st.selectbox("Module", list(ASSESSMENT_RULES), key="import_module")
+        st.caption("Needs a profile_id column plus the module's form fields; recorded_at is optional.")
+    else:
+        st.caption(f"Columns: {', '.join(PROFILE_RULES)}")
+    upload = st.file_uploader("CSV or Parquet file", type=["csv", "parquet"], key="import_file")
+    
+    if upload is not None and st.button("Run Import", key="import_run"):
+        status = st.empty()
+        progress = lambda report: status.caption(
+            f"{report.rows_read:,} rows read · {report.rows_per_second:,.0f} rows/s")
+        try:
+            if module:
+                report = bulk_import.import_assessments(upload, module, progress=progress)
+            else:
+                report = bulk_import.import_profiles(upload, progress=progress)
+        except Exception as e:
+            st.error(f"Import failed: {str(e)}")
+            return
+        st.success(report.summary())
+        if report.rejections:
+            st.markdown("*Rejected rows*")
+            st.dataframe(pd.DataFrame(report.rejections, columns=["Row", "Reason"]),
+                         use_container_width=True, hide_index=True)
+
+def show_batch_reports():
+    """Generate AI reports for every athlete with a stored assessment"""
+    import pandas as pd
+    modules = st.multiselect("Modules", list(prompts.MODULE_PROMPTS), default=["nutrition", "injury"],
+                             key="batch_modules")
+    sport = st.selectbox("Sport", ["All sports"] + db.profile_sports(), key="batch_sport")
+    col1, col2 = st.columns(2)
+    with col1:
+        workers = st.number_input("Workers", 1, 32, batch_reports.DEFAULT_WORKERS, key="batch_workers")
+    with col2:
+        rate = st.number_input("Max requests / second", 0.5, 100.0, batch_reports.DEFAULT_RATE,
+                               step=0.5, key="batch_rate")
+    
+    if modules and st.button("Generate Reports", key="batch_run"):
+        bar = st.progress(0.0)
+        status = st.empty()
+        
+        def progress(result):
+            bar.progress(result.completed / result.total)
+            status.caption(f"{result.completed:,}/{result.total:,} · {result.throughput:.2f} reports/s")
+        
+        result = batch_reports.run_batch(
+            modules, sport=None if sport == "All sports" else sport, workers=int(workers), rate=rate,
+            client=get_ai_client(), cache=get_response_cache(), progress=progress)
+        if not result.total:
+            st.info("No stored assessments for the selected modules.")
+        elif result.failed or result.skipped:
+            st.warning(result.summary())
+            st.dataframe(pd.DataFrame(result.errors, columns=["Profile", "Module", "Error"]),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.success(result.summary())
+
 def main():
     st.set_page_config(
         page_title="Athlete Management System",
@@ -1166,12 +1471,14 @@ def main():
         layout="wide",
         initial_sidebar_state="expanded"
     )
+    styles.inject()
     
     # Configure Gemini AI
     if not configure_genai():
         return
     
     # Initialize session state
+    restore_session()
     if 'athlete_data' not in st.session_state:
         st.session_state.athlete_data = {
             'performance': {},
@@ -1188,6 +1495,7 @@ def main():
     # Profile creation/selection logic
     if not st.session_state.current_profile:
         show_profile_creation()
+        persist_session()
         st.stop()
     
     # Handle card clicks first
@@ -1208,18 +1516,26 @@ def main():
         return
     
     # Main application with sidebar
+    from streamlit_option_menu import option_menu
     with st.sidebar:
         selected = option_menu(
             menu_title="Main Menu",
-            options=["Dashboard", "Performance", "Injury", "Career", "Nutrition", "Finance"],
-            icons=["speedometer", "speedometer2", "bandaid", "graph-up", "nut", "cash-stack"],
+            options=["Dashboard", "Roster", "Risk Board", "Performance", "Injury", "Career", "Nutrition", "Finance", "Admin"],
+            icons=["speedometer", "people", "exclamation-triangle", "speedometer2", "bandaid", "graph-up", "nut", "cash-stack", "gear"],
             menu_icon="app-indicator",
             default_index=0
         )
+        show_cache_stats()
+        if profiler.ENABLED:
+            show_rerun_profile()
     
     # Handle sidebar navigation
     if selected == "Dashboard":
         show_dashboard()
+    elif selected == "Roster":
+        show_roster()
+    elif selected == "Risk Board":
+        show_risk_board()
     elif selected == "Performance":
         analyze_performance()
     elif selected == "Injury":
@@ -1230,5 +1546,11 @@ def main():
         nutrition_planner()
     elif selected == "Finance":
         financial_planner()
+    elif selected == "Admin":
+        show_admin()
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profiler.rerun(st.session_state):
+        main()
+        # Runs ended by st.rerun() are saved by the run they start; Streamlit raises again on
+        # any session state access once a stop or rerun is requested
+        persist_session()
\ No newline at end of file
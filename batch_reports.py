@@ -0,0 +1,183 @@
+"""Batch generation of advisor reports for a whole squad.
+
+Builds the same prompts as the module pages from each athlete's latest stored
+assessment, fans them out over a bounded thread pool behind a shared rate
+limiter, and stores the results in ``ai_reports`` (and the response cache, so
+the module pages get an instant hit afterwards). Calls go through an
+``ai_client.AIClient``, so each one is bounded by its deadline and retried
+only when ``ai_client.is_retryable`` says so. Once the client's circuit
+breaker opens, the jobs not yet sent are skipped instead of each failing in
+turn.
+
+    python batch_reports.py --modules nutrition injury --workers 8 --rate 5
+    AMS_AI_BACKEND=fake python batch_reports.py --modules injury
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+import ai_client
+import db
+import prompts
+from response_cache import ResponseCache
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0
+WRITE_BATCH_SIZE = 50
+
+
+class RateLimiter:
+    """Token bucket shared by every worker thread"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def generate_report(client, prompt, limiter):
+    limiter.acquire()
+    prompts.record_sent(prompt)
+    return client.generate(prompt)
+
+
+def collect_jobs(modules, sport=None, profile_ids=None):
+    """(profile_id, module, prompt) for every athlete with a stored assessment"""
+    wanted = set(profile_ids) if profile_ids else None
+    jobs = []
+    for module in modules:
+        fields = [name for name, _ in db.ASSESSMENT_COLUMNS[module]]
+        columns, rows = db.latest_assessments(module, sport=sport)
+        for row in rows:
+            record = dict(zip(columns, row))
+            if wanted is not None and record['profile_id'] not in wanted:
+                continue
+            data = {name: record[name] for name in fields}
+            jobs.append((record['profile_id'], module, prompts.module_prompt(module, record['name'], data)))
+    return jobs
+
+
+class BatchResult:
+    """Progress and throughput of one batch run"""
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.stop_reason = None
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def completed(self):
+        return self.succeeded + self.failed + self.skipped
+
+    @property
+    def throughput(self):
+        attempted = self.succeeded + self.failed
+        return attempted / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        text = (f"{self.succeeded:,} reports generated, {self.failed:,} failed of {self.total:,} "
+                f"in {self.elapsed:.1f}s ({self.throughput:.2f} reports/s)")
+        if self.skipped:
+            text += f"; {self.skipped:,} skipped: {self.stop_reason}"
+        return text
+
+
+def run_batch(modules, sport=None, profile_ids=None, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+              backend=None, cache=None, progress=None, client=None):
+    """Generate and store reports through an ai_client.AIClient; returns a BatchResult
+
+    Pass ``client`` to share one (and its circuit breaker) with the caller;
+    otherwise one is built around ``backend`` (default: AMS_AI_BACKEND).
+    """
+    client = client or ai_client.AIClient(backend or ai_client.create_backend())
+    model_name = client.model_name
+    jobs = collect_jobs(modules, sport=sport, profile_ids=profile_ids)
+    result = BatchResult(len(jobs))
+    limiter = RateLimiter(rate)
+    pending = []
+    start = time.perf_counter()
+
+    def flush():
+        if pending:
+            db.save_ai_reports(pending)
+            if cache is not None:
+                for _, _, name, prompt, report in pending:
+                    cache.set(name, prompt, report)
+            pending.clear()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-report") as pool:
+        futures = {pool.submit(generate_report, client, prompt, limiter): (profile_id, module, prompt)
+                   for profile_id, module, prompt in jobs}
+        for future in as_completed(futures):
+            profile_id, module, prompt = futures[future]
+            try:
+                pending.append((profile_id, module, model_name, prompt, future.result()))
+                result.succeeded += 1
+            except CancelledError:
+                result.skipped += 1
+            except ai_client.CircuitOpen as e:
+                # The backend is down: stop sending rather than fail every remaining job
+                result.skipped += 1
+                if result.stop_reason is None:
+                    result.stop_reason = str(e)
+                    for other in futures:
+                        other.cancel()
+            except Exception as e:
+                result.failed += 1
+                result.errors.append((profile_id, module, str(e)))
+            if len(pending) >= WRITE_BATCH_SIZE:
+                flush()
+            result.elapsed = time.perf_counter() - start
+            if progress:
+                progress(result)
+    flush()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate AI reports for every athlete")
+    parser.add_argument("--modules", nargs="+", choices=list(prompts.MODULE_PROMPTS),
+                        default=["nutrition", "injury"])
+    parser.add_argument("--sport", help="only athletes of this sport")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="max requests per second")
+    parser.add_argument("--backend", choices=list(ai_client.BACKENDS), help="defaults to AMS_AI_BACKEND")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    db.init_db()
+    backend = ai_client.create_backend(args.backend)
+    progress = lambda result: print(f"\r{result.completed}/{result.total} "
+                                    f"({result.throughput:.2f}/s)", end="", flush=True)
+    result = run_batch(args.modules, sport=args.sport, workers=args.workers, rate=args.rate,
+                       backend=backend, cache=ResponseCache(), progress=progress)
+    print()
+    print(result.summary())
+    for profile_id, module, error in result.errors[:20]:
+        print(f"  profile {profile_id} {module}: {error}")
+    return 0 if result.failed == 0 and result.skipped == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,327 @@
+"""Load test for the JSON API (api.py).
+
+Seeds a throwaway database, then runs each scenario for ``--duration``
+seconds with ``--concurrency`` clients issuing requests back to back, and
+prints requests/s, items/s (for batches) and latency percentiles.
+
+By default the ASGI app is driven in-process, with this process pinned to one
+CPU core: that measures the API itself (routing, validation, scoring, SQLite,
+JSON) on a single core, without a server or sockets in the way. With
+``--url`` the same scenarios go over HTTP/1.1 keep-alive connections to a
+running server instead, e.g. one uvicorn worker pinned to a core:
+
+    python benchmarks/api_load.py
+    python benchmarks/api_load.py --only assessment assessment_batch --concurrency 32
+    AMS_DB_PATH=/tmp/load.db taskset -c 0 uvicorn api:app --port 8000 &
+    AMS_DB_PATH=/tmp/load.db python benchmarks/api_load.py --url http://127.0.0.1:8000
+
+With ``--url``, point the server and this script at the same AMS_DB_PATH so
+the seeded profiles exist on both sides.
+
+In-process runs then check that every assessment the API accepted also
+reached the derived tables its hooks maintain: the per-profile trend
+aggregates and the cohort sketches must count exactly the stored rows, and a
+posted athlete must get cohort percentiles. Exits 1 on request errors or a
+mismatch.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BATCH_SIZE = 100
+SCENARIOS = ["health", "score", "score_batch", "assessment", "assessment_batch", "profiles_page",
+             "history_page", "advice_cached"]
+
+INJURY = {"training_intensity": 7, "past_injuries": 2, "fatigue_level": 5, "sleep_hours": 7,
+          "nutrition_score": 8, "stress_level": 4}
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def percentile(ordered, q):
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(profiles, assessments_per_profile):
+    """Profiles with injury history; returns the profile ids"""
+    import db
+    import scoring
+    db.init_db()
+    rng = random.Random(0)
+    with db.transaction() as conn:
+        ids = [db.add_profile(conn, f"Load Athlete {i}", rng.choice(["Football", "Tennis", "Athletics"]),
+                              rng.randint(18, 35), 175, 70, rng.choice(["Male", "Female"]))
+               for i in range(profiles)]
+        entries = []
+        for profile_id in ids:
+            for day in range(assessments_per_profile):
+                data = {**INJURY, "sleep_hours": rng.randint(5, 9)}
+                data.update(scoring.derived_fields("injury", data))
+                entries.append((profile_id, data, f"2024-01-{day % 28 + 1:02d} 0{day % 10}:00:00"))
+        db.insert_assessments(conn, "injury", entries)
+    return ids
+
+
+def check_derived_tables(client):
+    """Problems with the trend aggregates and cohort sketches after the run's POSTs"""
+    import cohort
+    import db
+    import trends
+    import write_behind
+
+    async def post_one():
+        await client.open()
+        status = await client.request("POST", "/assessments/injury",
+                                      json.dumps({"profile_id": 1, **INJURY}).encode())
+        await client.close()
+        return status
+
+    problems = []
+    if asyncio.run(post_one()) >= 400:
+        problems.append("POST /assessments/injury failed")
+    if write_behind.ENABLED:
+        write_behind.get_writer().flush()
+    with db.connection() as conn:
+        stored = dict(conn.execute(f"SELECT profile_id, COUNT(*) FROM {db.assessment_table('injury')} "
+                                   "GROUP BY profile_id").fetchall())
+        aggregated = dict(conn.execute("SELECT profile_id, count FROM assessment_aggregates "
+                                       "WHERE module = 'injury' AND metric = 'risk_score'").fetchall())
+    missed = sum(1 for profile_id, count in stored.items() if aggregated.get(profile_id) != count)
+    if missed:
+        problems.append(f"trend aggregates disagree with stored injury rows for {missed:,} profiles")
+    sketched = cohort.cohort_sketches("injury").get("risk_score")
+    if sketched is None or sketched.count != sum(stored.values()):
+        problems.append(f"cohort sketches count {sketched.count if sketched else 0:,} injury assessments, "
+                        f"{sum(stored.values()):,} stored")
+    if trends.get_trends(1, "injury").get("risk_score", {}).get("count") != stored.get(1):
+        problems.append("trend aggregates for the posted profile missed the POST")
+    if "risk_score" not in cohort.cohort_percentiles(db.get_profile(1), "injury",
+                                                     {"risk_score": 1.0}):
+        problems.append("no cohort percentile for the posted profile")
+    return problems
+
+
+def build_scenarios(profile_ids):
+    """name -> make(rng) returning (method, path, body bytes, items in the request)"""
+    def body(document):
+        return json.dumps(document).encode("utf-8")
+
+    score = body(INJURY)
+    score_batch = body({"items": [{**INJURY, "sleep_hours": i % 12} for i in range(BATCH_SIZE)]})
+
+    def assessment(rng):
+        return "POST", "/assessments/injury", body({"profile_id": rng.choice(profile_ids), **INJURY}), 1
+
+    def assessment_batch(rng):
+        items = [{"profile_id": rng.choice(profile_ids), **INJURY, "sleep_hours": rng.randint(0, 12)}
+                 for _ in range(BATCH_SIZE)]
+        return "POST", "/assessments/injury/batch", body({"items": items}), BATCH_SIZE
+
+    def profiles_page(rng):
+        return "GET", f"/profiles?limit=25&after={rng.choice(profile_ids) - 1}", b"", 1
+
+    def history_page(rng):
+        return "GET", f"/profiles/{rng.choice(profile_ids)}/assessments/injury?limit=50", b"", 1
+
+    advised = profile_ids[:20]
+
+    def advice_cached(rng):
+        return "POST", "/advice/injury", body({"profile_id": rng.choice(advised)}), 1
+
+    return {
+        "health": lambda rng: ("GET", "/health", b"", 1),
+        "score": lambda rng: ("POST", "/scores/injury", score, 1),
+        "score_batch": lambda rng: ("POST", "/scores/injury/batch", score_batch, BATCH_SIZE),
+        "assessment": assessment,
+        "assessment_batch": assessment_batch,
+        "profiles_page": profiles_page,
+        "history_page": history_page,
+        "advice_cached": advice_cached,
+    }
+
+
+class InProcessClient:
+    """Calls the ASGI app directly"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def request(self, method, target, body):
+        path, _, query = target.partition("?")
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        status = []
+
+        async def receive():
+            return messages.pop() if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await self.app({"type": "http", "method": method, "path": path, "query_string": query.encode(),
+                        "headers": []}, receive, send)
+        return status[0]
+
+
+class HTTPClient:
+    """One HTTP/1.1 keep-alive connection"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        self.writer.close()
+
+    async def request(self, method, target, body):
+        self.writer.write((f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode()
+                          + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+
+async def run_scenario(make, client_factory, concurrency, duration):
+    latencies = []
+    items = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(seed_value):
+        nonlocal items, errors
+        rng = random.Random(seed_value)
+        client = client_factory()
+        await client.open()
+        try:
+            while time.perf_counter() < deadline:
+                method, target, body, count = make(rng)
+                start = time.perf_counter()
+                status = await client.request(method, target, body)
+                latencies.append(time.perf_counter() - start)
+                if status < 400:
+                    items += count
+                else:
+                    errors += 1
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "requests_per_s": round(len(ordered) / elapsed, 1),
+        "items_per_s": round(items / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+    }
+
+
+def pin_to_one_core():
+    """Restrict this process (and its threads) to one CPU; returns the core or None"""
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    core = min(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {core})
+    return core
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requests/s of the JSON API")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients issuing requests back to back")
+    parser.add_argument("--profiles", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=20, help="injury assessments seeded per profile")
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("AMS_DB_PATH"):
+        workdir = tempfile.mkdtemp(prefix="ams-api-load-")
+        os.environ["AMS_DB_PATH"] = os.path.join(workdir, "athlete_profiles.db")
+        os.environ["AMS_AI_CACHE_PATH"] = os.path.join(workdir, "ai_response_cache.db")
+    os.environ.setdefault("AMS_AI_BACKEND", "fake")
+    os.environ.setdefault("AMS_FAKE_LATENCY", "0")
+    sys.path.insert(0, ROOT)
+
+    log(f"seeding {args.profiles:,} profiles × {args.history} assessments...")
+    profile_ids = seed(args.profiles, args.history)
+    scenarios = build_scenarios(profile_ids)
+
+    if args.url:
+        target = args.url
+        client_factory = lambda: HTTPClient(args.url)
+    else:
+        core = pin_to_one_core()
+        target = f"in-process, core {core}" if core is not None else "in-process"
+        import api
+        client_factory = lambda: InProcessClient(api.app)
+
+    async def run_all():
+        results = {}
+        for name in args.only:
+            if name == "advice_cached":
+                # Fill the response cache right before: the steady state is cache hits, and the
+                # assessment scenarios change the latest data (and so the prompt) of these profiles
+                warm = client_factory()
+                await warm.open()
+                for profile_id in profile_ids[:20]:
+                    await warm.request("POST", "/advice/injury", json.dumps({"profile_id": profile_id}).encode())
+                await warm.close()
+            log(f"running {name}...")
+            results[name] = await run_scenario(scenarios[name], client_factory, args.concurrency,
+                                               args.duration)
+        return results
+
+    results = asyncio.run(run_all())
+
+    print(f"API load ({target}, {args.concurrency} clients, {args.duration:g}s per scenario)")
+    print(f"{'scenario':18} {'req/s':>9} {'items/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:18} {result['requests_per_s']:>9,.1f} {result['items_per_s']:>10,.1f} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"target": target, "concurrency": args.concurrency, "duration_s": args.duration,
+                       "results": results}, f, indent=2)
+    problems = [] if args.url else check_derived_tables(client_factory())
+    for problem in problems:
+        print(f"  {problem}")
+    return 1 if problems or any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+"""Cold-start import budget for app.py.
+
+Imports ``app`` in fresh interpreters under ``python -X importtime`` and fails
+(exit code 1) when either
+
+* the median time ``app`` adds on top of ``import streamlit`` exceeds the
+  budget, or
+* one of the lazily imported heavy packages is loaded at startup.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 9 --budget-ms 120
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.getenv("AMS_IMPORT_BUDGET_MS", "150"))
+RUNS = 5
+
+# Only the pages that need these may import them
+LAZY_MODULES = ['pandas', 'numpy', 'plotly.express', 'google.generativeai',
+                'streamlit_option_menu']
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+PROBE = ("import sys, json, app; "
+         "print(json.dumps([m for m in %r if m in sys.modules]))" % LAZY_MODULES)
+
+
+def measure_once(workdir):
+    """(app us, streamlit us, eagerly loaded lazy modules, importtime rows) for one cold import"""
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               AMS_DB_PATH=os.path.join(workdir, "athlete_profiles.db"),
+               AMS_AI_CACHE_PATH=os.path.join(workdir, "ai_response_cache.db"))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=workdir, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import app failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent)))
+    cumulative = {name: total for name, _, total, _ in rows}
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return cumulative.get("app", 0), cumulative.get("streamlit", 0), loaded, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if app.py cold start regresses")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS,
+                        help="max median ms that app adds on top of importing streamlit")
+    args = parser.parse_args(argv)
+
+    totals, overheads, eager = [], [], set()
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.runs):
+            app_us, streamlit_us, loaded, rows = measure_once(workdir)
+            totals.append(app_us / 1000)
+            overheads.append((app_us - streamlit_us) / 1000)
+            eager.update(loaded)
+
+    total_ms = statistics.median(totals)
+    overhead_ms = statistics.median(overheads)
+    print(f"import app: {total_ms:.0f} ms total, {overhead_ms:.0f} ms on top of streamlit "
+          f"(median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+
+    # importtime lists children before their parent, one indent level deeper
+    app_index = next(index for index, row in enumerate(rows) if row[0] == "app")
+    app_depth, direct = rows[app_index][3], []
+    for row in reversed(rows[:app_index]):
+        if row[3] <= app_depth:
+            break
+        if row[3] == app_depth + 2:
+            direct.append(row)
+    print("modules imported by app (cumulative, last run):")
+    for name, _, cumulative_us, _ in sorted(direct, key=lambda row: -row[2]):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: loaded at startup but should be lazy: {', '.join(sorted(eager))}")
+        failed = True
+    if overhead_ms > args.budget_ms:
+        print(f"FAIL: startup import time {overhead_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
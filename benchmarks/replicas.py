@@ -0,0 +1,200 @@
+"""Multi-process harness for the shared session store.
+
+Starts ``--replicas`` worker processes, each running the app headlessly with
+Streamlit's AppTest against one shared database, response cache and session
+store, and walks ``--sessions`` athletes through profile creation and all
+five modules. Like a round-robin load balancer without sticky sessions, each
+step of a session goes to a different replica than the one before, and with
+``--restart`` every replica is killed and replaced between steps. Each step
+opens the app with only the session's ``?sid=`` and checks that the profile,
+the modules submitted so far and the open module page were restored.
+
+    python benchmarks/replicas.py
+    python benchmarks/replicas.py --store file --replicas 3 --sessions 6 --restart
+
+Exits 1 if any session lost state.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+MODULES = ["performance", "injury", "career", "nutrition", "finance"]
+STORES = ["sqlite", "file"]  # the memory store cannot be shared between processes
+
+
+def _click_submit(at):
+    next(b for b in at.button if "FormSubmitter" in b.id).click().run()
+
+
+def run_step(session_id, step):
+    """One request-sized unit of work for a session; returns (session_id, problems)
+
+    Step 0 creates the profile and opens the first module. Step k submits
+    module k-1, which must still be open after the hop to another replica,
+    then opens module k.
+    """
+    from streamlit.testing.v1 import AppTest
+    import write_behind
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    if session_id:
+        at.query_params["sid"] = session_id
+    at.run()
+    problems = []
+    if at.exception:
+        return session_id, [f"step {step}: {at.exception[0].message}"]
+
+    if step == 0:
+        at.text_input[0].input(f"Replica Athlete {os.getpid()}")
+        at.button[0].click().run()
+        session_id = at.session_state["_session_id"]
+    else:
+        state = at.session_state
+        if not state["current_profile"]:
+            problems.append(f"step {step}: profile not restored")
+        missing = [module for module in MODULES[:step - 1] if not state["athlete_data"].get(module)]
+        if missing:
+            problems.append(f"step {step}: lost module data {missing}")
+        expected = MODULES[step - 1]
+        current = state["current_module"] if "current_module" in state else None
+        if current != expected:
+            problems.append(f"step {step}: open page {current!r}, expected {expected!r}")
+        if problems:
+            return session_id, problems
+        at.text_input[0].input("Replica Athlete")
+        _click_submit(at)
+        at.button(key="back_button").click().run()
+
+    if step < len(MODULES):
+        at.button(key=f"card_btn_{MODULES[step]}").click().run()
+    if at.exception:
+        problems.append(f"step {step}: {at.exception[0].message}")
+    write_behind.get_writer().flush()
+    return session_id, problems
+
+
+def replica(tasks, results):
+    """Worker loop: run steps until told to stop (None)"""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        index, session_id, step = task
+        start = time.perf_counter()
+        try:
+            session_id, problems = run_step(session_id, step)
+        except Exception:
+            problems = [f"step {step}: {traceback.format_exc(limit=3)}"]
+        results.put((index, session_id, problems, time.perf_counter() - start, os.getpid()))
+
+
+class Replicas:
+    def __init__(self, count, context):
+        self.count = count
+        self.context = context
+        self.workers = []
+        self.start()
+
+    def start(self):
+        self.workers = []
+        for _ in range(self.count):
+            # Queues per replica: a killed process can die holding a shared queue's write lock
+            tasks, results = self.context.Queue(), self.context.Queue()
+            process = self.context.Process(target=replica, args=(tasks, results), daemon=True)
+            process.start()
+            self.workers.append((process, tasks, results))
+
+    def send(self, replica_index, task):
+        """Queue a task on a replica; returns the queue its result will arrive on"""
+        _, tasks, results = self.workers[replica_index % self.count]
+        tasks.put(task)
+        return results
+
+    def stop(self, kill=False):
+        for process, tasks, _ in self.workers:
+            if kill:
+                process.kill()  # no atexit, no drain: what a crashed or redeployed replica leaves behind
+            else:
+                tasks.put(None)
+        for process, _, _ in self.workers:
+            process.join(30)
+
+
+def run(store, replica_count, session_count, restart, workdir):
+    os.environ.update({
+        "AMS_SESSION_STORE": store,
+        "AMS_SESSION_DIR": os.path.join(workdir, "sessions"),
+        "AMS_DB_PATH": os.path.join(workdir, "athlete_profiles.db"),
+        "AMS_AI_CACHE_PATH": os.path.join(workdir, "ai_response_cache.db"),
+        "AMS_AI_BACKEND": "fake",
+        "AMS_FAKE_LATENCY": "0",
+    })
+    context = multiprocessing.get_context("spawn")  # replicas share nothing but the environment
+    replicas = Replicas(replica_count, context)
+    session_ids = [None] * session_count
+    failures = []
+    latencies = []
+    pids = [set() for _ in range(session_count)]
+    try:
+        for step in range(len(MODULES) + 1):
+            # Round robin shifted every step, so consecutive steps never share a replica
+            pending = [replicas.send(index + step, (index, session_ids[index], step))
+                       for index in range(session_count)]
+            for results in pending:
+                index, session_id, problems, elapsed, pid = results.get(timeout=300)
+                session_ids[index] = session_id
+                failures.extend(f"session {index}: {problem}" for problem in problems)
+                latencies.append(elapsed)
+                pids[index].add(pid)
+            if restart and step < len(MODULES):
+                replicas.stop(kill=True)
+                replicas.start()
+    finally:
+        replicas.stop()
+    return {
+        "store": store,
+        "sessions": session_count,
+        "steps": len(latencies),
+        "replica_processes_per_session": statistics.mean(len(p) for p in pids),
+        "mean_step_s": statistics.mean(latencies),
+        "failures": failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check session state survives replica hops and restarts")
+    parser.add_argument("--store", choices=STORES, nargs="+", default=STORES)
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--restart", action="store_true", help="kill and replace every replica between steps")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for store in args.store:
+        workdir = tempfile.mkdtemp(prefix=f"ams-replicas-{store}-")
+        try:
+            result = run(store, args.replicas, args.sessions, args.restart, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"{store:7} {result['sessions']} sessions × {len(MODULES) + 1} steps on "
+              f"{args.replicas} replicas{' (restarted every step)' if args.restart else ''}: "
+              f"{result['replica_processes_per_session']:.1f} processes per session, "
+              f"{result['mean_step_s'] * 1000:.0f} ms per step, {len(result['failures'])} failures")
+        for failure in result["failures"][:20]:
+            print(f"  {failure}")
+        failed = failed or bool(result["failures"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
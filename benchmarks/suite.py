@@ -0,0 +1,354 @@
+"""Offline benchmark suite.
+
+Runs against a throwaway database with the fake model (``AMS_AI_BACKEND=fake``)
+and emits one JSON document with throughput and latency percentiles per
+benchmark, so runs from different releases can be compared.
+
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --latency 0.2 --only flows
+    python benchmarks/suite.py --compare bench.json --max-regression 25
+
+Benchmarks:
+    save_profile  app.save_profile into SQLite
+    scoring       scalar injury risk formulas and the vectorized score_roster
+    prompts       prompt construction, with estimated tokens versus raw dict reprs
+    projection    Monte Carlo finance projection (2,000 and 10,000 paths over 20 years)
+    charts        figure construction, cache hits, and JSON payloads before/after downsampling
+    flows         AppTest sessions: create a profile, submit every module, view the dashboard
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ["save_profile", "scoring", "prompts", "projection", "charts", "flows"]
+MODULES = ["performance", "injury", "career", "nutrition", "finance"]
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def percentile(ordered, q):
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples, items_per_sample=1, **extra):
+    """Throughput and latency percentiles (ms) for a list of durations in seconds"""
+    ordered = sorted(samples)
+    total = sum(ordered)
+    result = {
+        "iterations": len(ordered),
+        "total_s": round(total, 4),
+        "ops_per_s": round(len(ordered) * items_per_sample / total, 2) if total else None,
+        "mean_ms": round(total / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def timed_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_save_profile(scale):
+    import app
+    rng = random.Random(1)
+    sports = ["Football", "Basketball", "Tennis", "Swimming", "Athletics"]
+
+    def save():
+        app.save_profile(f"Bench Athlete {rng.randrange(10**6)}", rng.choice(sports), rng.randint(16, 40),
+                         rng.randint(150, 210), rng.randint(50, 110), rng.choice(["Male", "Female"]))
+    return {"save_profile": summarize(timed_calls(save, 200 * scale))}
+
+
+def bench_scoring(scale):
+    import numpy as np
+    import pandas as pd
+    import scoring
+
+    rng = random.Random(2)
+    inputs = [(rng.uniform(1, 10), rng.randint(0, 5), rng.uniform(4, 10), rng.uniform(1, 10))
+              for _ in range(10000)]
+
+    def scalar():
+        for args in inputs:
+            scoring.risk_level(scoring.injury_risk_score(*args))
+
+    generator = np.random.default_rng(3)
+    size = 100_000
+    roster = pd.DataFrame({
+        "profile_id": np.arange(size),
+        "training_intensity": generator.uniform(1, 10, size),
+        "past_injuries": generator.integers(0, 6, size),
+        "sleep_hours": generator.uniform(4, 10, size),
+        "nutrition_score": generator.uniform(1, 10, size),
+    })
+    return {
+        "scoring.scalar": summarize(timed_calls(scalar, 5 * scale), items_per_sample=len(inputs)),
+        "scoring.score_roster": summarize(timed_calls(lambda: scoring.score_roster(roster), 5 * scale),
+                                          items_per_sample=size),
+    }
+
+
+def bench_prompts(scale):
+    import prompts
+
+    athlete_data = {
+        "performance": {"speed": 24.0, "stamina": 80, "strength": 120.0, "reaction_time": 0.45,
+                        "flexibility": 7, "recovery_rate": 6, "technique": 7, "coordination": 8,
+                        "accuracy": 7, "tactical_awareness": 6, "equipment_handling": 8, "focus": 7,
+                        "confidence": 8, "resilience": 7, "motivation": 6, "composure": 8},
+        "injury": {"training_intensity": 7, "past_injuries": 1, "fatigue_level": 5, "sleep_hours": 7.5,
+                   "nutrition_score": 7, "stress_level": 4, "risk_score": 3.25},
+        "career": {"age": 24, "sport": "Football", "experience": 5, "strengths": "Speed, vision"},
+        "nutrition": {"weight": 70.0, "height": 175.0, "age": 24, "activity_level": "Very Active",
+                      "dietary_pref": "Vegetarian", "allergies": "None", "bmi": 22.86},
+        "finance": {"salary": 500000.0, "endorsements": 150000.0, "appearances": 50000.0,
+                    "other_income": 50000.0, "coaching": 80000.0, "equipment": 40000.0,
+                    "physio": 30000.0, "travel": 50000.0, "nutrition": 25000.0, "housing": 120000.0,
+                    "insurance": 25000.0, "transport": 25000.0, "other_expenses": 25000.0,
+                    "total_income": 750000.0, "total_expenses": 420000.0, "savings": 330000.0,
+                    "savings_rate": 44.0},
+    }
+    builders = {module: (lambda module=module: prompts.module_prompt(module, "Bench Athlete",
+                                                                    athlete_data[module]))
+                for module in MODULES}
+    builders["dashboard"] = lambda: prompts.dashboard_prompt(athlete_data)
+    results = {}
+    for name, build in builders.items():
+        samples = timed_calls(build, 1000 * scale)
+        prompts.reset_token_stats()
+        prompts.record_sent(build())
+        stats = prompts.token_stats()[name]
+        results[f"prompts.{name}"] = summarize(samples, tokens=stats["mean_tokens"],
+                                               data_tokens=stats["mean_data_tokens"],
+                                               raw_data_tokens=stats["mean_raw_data_tokens"])
+    return results
+
+
+def bench_projection(scale):
+    import projection
+
+    finance = {"salary": 500000, "endorsements": 150000, "appearances": 50000, "other_income": 50000,
+               "coaching": 80000, "equipment": 40000, "physio": 30000, "travel": 50000,
+               "nutrition": 25000, "housing": 120000, "insurance": 25000, "transport": 25000,
+               "other_expenses": 25000}
+    results = {}
+    for paths in (2000, 10000):
+        run = lambda: projection.project(finance, years=20, paths=paths, seed=0)
+        run()  # warm NumPy
+        results[f"projection.{paths}_paths"] = summarize(timed_calls(run, 10 * scale),
+                                                         items_per_sample=paths)
+    return results
+
+
+def bench_charts(scale):
+    from datetime import datetime, timedelta
+    import plotly.io
+    import app
+    import db
+    import figures
+    import projection
+
+    perf_trends = {
+        key: {"current": value, "previous": value * 0.95, "rolling_mean": value * 0.97, "count": 5}
+        for key, value in {"speed": 24.0, "strength": 120.0, "stamina": 80.0, "reaction_time": 0.45}.items()
+    }
+    performance = {"speed": 24, "stamina": 80, "strength": 120, "reaction_time": 0.45, "flexibility": 7,
+                   "recovery_rate": 6, "technique": 7, "coordination": 8, "accuracy": 7,
+                   "tactical_awareness": 6, "equipment_handling": 8, "focus": 7, "confidence": 8,
+                   "resilience": 7, "motivation": 6, "composure": 8}
+    finance = {"coaching": 80000, "equipment": 40000, "physio": 30000, "travel": 50000,
+               "nutrition": 25000, "housing": 120000, "insurance": 25000, "transport": 25000}
+    projected = projection.project(finance, years=20, seed=0)
+
+    # A long-serving athlete: 10,000 performance assessments
+    rng = random.Random(4)
+    db.init_db()
+    start = datetime(2015, 1, 1)
+    with db.transaction() as conn:
+        profile_id = db.add_profile(conn, "Bench Veteran", "Football", 30, 180, 75, "Male")
+        db.insert_assessments(conn, "performance", [
+            (profile_id, {"speed": rng.uniform(20, 30), "strength": rng.uniform(100, 140),
+                          "stamina": rng.uniform(60, 100), "reaction_time": rng.uniform(0.3, 0.6)},
+             (start + timedelta(hours=8 * i)).strftime(db.TIMESTAMP_FORMAT))
+            for i in range(10000)])
+
+    builders = {
+        "performance_comparison": lambda: app.performance_comparison_chart(perf_trends, performance),
+        "expense_breakdown": lambda: app.expense_chart(finance),
+        "performance_metrics": lambda: app.performance_metrics_chart(performance, "Bench Athlete"),
+        "projection_fan": lambda: app.projection_fan_chart(projected),
+        "performance_history": lambda: app.performance_history_chart(profile_id),
+    }
+    results = {}
+    for name, build in builders.items():
+        build()  # warm Plotly's lazy imports and templates
+        results[f"charts.{name}.build"] = summarize(timed_calls(build, 20 * scale))
+        raw = build()
+        prepared = figures.compact(figures.downsample(build()))
+        # st.plotly_chart serializes the figure like this on every rerun
+        serialize = lambda: plotly.io.to_json(prepared, validate=False)
+        results[f"charts.{name}.serialize"] = summarize(timed_calls(serialize, 20 * scale),
+                                                        payload_bytes=len(serialize()),
+                                                        raw_payload_bytes=figures.payload_bytes(raw))
+        cache = figures.FigureCache()
+        cache.get(name, {"bench": name}, build)
+        results[f"charts.{name}.cached"] = summarize(
+            timed_calls(lambda: cache.get(name, {"bench": name}, build), 200 * scale))
+    return results
+
+
+def _submit(at):
+    next(b for b in at.button if "FormSubmitter" in b.id).click()
+
+
+def bench_flows(scale):
+    from streamlit.testing.v1 import AppTest
+
+    steps = {}
+
+    def run(at, step):
+        start = time.perf_counter()
+        at.run()
+        steps.setdefault(step, []).append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].value}")
+
+    flow_times = []
+    for i in range(3 * scale):
+        flow_start = time.perf_counter()
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+        run(at, "profile_page")
+        at.text_input[0].input(f"Flow Athlete {i}")
+        at.button[0].click()
+        run(at, "create_profile")
+        for module in MODULES:
+            at.button(key=f"card_btn_{module}").click()
+            run(at, f"{module}.open")
+            at.text_input[0].input(f"Flow Athlete {i}")
+            _submit(at)
+            run(at, f"{module}.submit")
+            at.button(key="back_button").click()
+            run(at, "dashboard")
+        run(at, "dashboard")
+        flow_times.append(time.perf_counter() - flow_start)
+
+    results = {f"flows.{step}": summarize(samples) for step, samples in steps.items()}
+    results["flows.rerun"] = summarize([s for samples in steps.values() for s in samples])
+    results["flows.session"] = summarize(flow_times)
+    return results
+
+
+RUNNERS = {
+    "save_profile": bench_save_profile,
+    "scoring": bench_scoring,
+    "prompts": bench_prompts,
+    "projection": bench_projection,
+    "charts": bench_charts,
+    "flows": bench_flows,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Print changes against an earlier run; returns the names that regressed past the limit"""
+    regressed = []
+    log(f"{'benchmark':45} {'p95 ms':>10} {'':9} {'ops/s':>12}")
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        p95_change = (current["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        ops_change = ((current["ops_per_s"] / before["ops_per_s"] - 1) * 100
+                      if before.get("ops_per_s") and current.get("ops_per_s") else 0.0)
+        log(f"{name:45} {current['p95_ms']:10.2f} ({p95_change:+6.1f}%) "
+            f"{current['ops_per_s'] or 0:12.1f} ({ops_change:+6.1f}%)")
+        if max_regression is not None and (p95_change > max_regression or -ops_change > max_regression):
+            regressed.append(name)
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with the fake AI backend")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="fake model delay per streamed word")
+    parser.add_argument("--scale", type=int, default=1, help="multiply iteration counts")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON output to report deltas against")
+    parser.add_argument("--max-regression", type=float,
+                        help="with --compare, exit 1 if any p95 or throughput is worse by more than this %%")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ams-bench-")
+    os.environ.update({
+        "AMS_AI_BACKEND": "fake",
+        "AMS_FAKE_LATENCY": str(args.latency),
+        "AMS_FAKE_CHUNK_DELAY": str(args.chunk_delay),
+        "AMS_DB_PATH": os.path.join(workdir, "athlete_profiles.db"),
+        "AMS_AI_CACHE_PATH": os.path.join(workdir, "ai_response_cache.db"),
+    })
+    sys.path.insert(0, ROOT)
+
+    results = {}
+    for name in args.only:
+        log(f"running {name}...")
+        results.update(RUNNERS[name](args.scale))
+
+    import streamlit
+    document = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "streamlit": streamlit.__version__,
+            "fake_latency_s": args.latency,
+            "fake_chunk_delay_s": args.chunk_delay,
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    payload = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+        log(f"wrote {args.output}")
+    else:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(results, json.load(f), args.max_regression)
+        if regressed:
+            log(f"FAIL: regressed beyond {args.max_regression}%: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
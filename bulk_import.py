@@ -0,0 +1,218 @@
+"""Bulk import of athlete profiles and assessments from CSV or Parquet.
+
+Files are streamed in chunks, validated against the same ranges the forms
+enforce, and inserted with ``executemany`` in one transaction per chunk.
+
+    python bulk_import.py profiles athletes.csv
+    python bulk_import.py assessments injury.parquet --module injury
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import db
+import scoring
+from validation import ASSESSMENT_RULES, PROFILE_RULES, validate_frame
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_REJECTIONS = 1000
+
+
+class ImportReport:
+    """Counts, throughput and per-row rejection reasons for one import"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_rejected = 0
+        self.rejections = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, row_number, reason):
+        self.rows_rejected += 1
+        if len(self.rejections) < MAX_REPORTED_REJECTIONS:
+            self.rejections.append((row_number, reason))
+
+    def summary(self):
+        return (f"{self.kind}: {self.rows_inserted:,} inserted, {self.rows_rejected:,} rejected "
+                f"of {self.rows_read:,} rows in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)")
+
+
+def _file_format(source, file_format=None):
+    if file_format:
+        return file_format
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return "parquet" if str(name).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def read_chunks(source, file_format=None, chunk_size=CHUNK_SIZE):
+    """Yield DataFrame chunks from a CSV or Parquet path or file object"""
+    if _file_format(source, file_format) == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet import requires pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size, skipinitialspace=True)
+
+
+def _none_for_nan(value):
+    return None if pd.isna(value) else value
+
+
+def _derive(module, df):
+    """Fill the fields the module forms compute instead of asking for"""
+    return df.assign(**scoring.derived_fields(module, df))
+
+
+def _local_timezone():
+    return datetime.now().astimezone().tzinfo
+
+
+def _recorded_at(values):
+    """(timestamps normalized to db.TIMESTAMP_FORMAT or None, rejection reasons per row index)
+
+    Accepts ISO 8601 strings (space or "T" separator, optional timezone
+    suffix) and pandas Timestamps. Timezone-aware values are converted to
+    local time, which is what assessments recorded by the app store.
+    """
+    blank = values.isna() | values.astype(str).str.strip().eq("")
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+        if values.dt.tz is not None:
+            parsed = values.dt.tz_convert(_local_timezone()).dt.tz_localize(None)
+    else:
+        text = values.astype(str).str.strip()
+        aware = ~blank & text.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$")
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        if (~blank & ~aware).any():
+            parsed[~blank & ~aware] = pd.to_datetime(text[~blank & ~aware], format="ISO8601", errors="coerce")
+        if aware.any():
+            parsed[aware] = (pd.to_datetime(text[aware], format="ISO8601", errors="coerce", utc=True)
+                             .dt.tz_convert(_local_timezone()).dt.tz_localize(None))
+    bad = ~blank & parsed.isna()
+    normalized = parsed.dt.strftime(db.TIMESTAMP_FORMAT).astype(object).where(~blank & ~bad, None)
+    reasons = values[bad].astype(str).radd("recorded_at is not a timestamp: ")
+    return normalized, reasons
+
+
+def _record_rejections(report, reasons, first_row):
+    # Row numbers are 1-based data rows, matching what a spreadsheet shows below the header
+    for index, reason in reasons.items():
+        report.reject(first_row + index + 1, reason)
+
+
+def import_profiles(source, file_format=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Validate and insert profiles; returns an ImportReport"""
+    report = ImportReport("profiles")
+    start = time.perf_counter()
+    columns = list(PROFILE_RULES)
+    for chunk in read_chunks(source, file_format, chunk_size):
+        first_row = report.rows_read
+        chunk = chunk.reset_index(drop=True)
+        report.rows_read += len(chunk)
+        valid, reasons = validate_frame(chunk, PROFILE_RULES)
+        _record_rejections(report, reasons, first_row)
+        if len(valid):
+            valid = valid.assign(name=valid['name'].astype(str).str.strip(),
+                                 sport=valid['sport'].astype(str).str.strip(),
+                                 age=valid['age'].astype(int))
+            with db.transaction() as conn:
+                db.insert_profiles(conn, valid[columns].itertuples(index=False, name=None))
+            report.rows_inserted += len(valid)
+        report.elapsed = time.perf_counter() - start
+        if progress:
+            progress(report)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def import_assessments(source, module, file_format=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Validate and append assessments for existing profiles; returns an ImportReport
+
+    The file needs a ``profile_id`` column and the module's form fields;
+    ``recorded_at`` is optional, defaults to the import time and is stored in
+    ``db.TIMESTAMP_FORMAT`` whatever ISO 8601 form the file uses.
+    """
+    rules = ASSESSMENT_RULES[module]
+    report = ImportReport(f"{module} assessments")
+    start = time.perf_counter()
+    for chunk in read_chunks(source, file_format, chunk_size):
+        first_row = report.rows_read
+        chunk = chunk.reset_index(drop=True)
+        report.rows_read += len(chunk)
+        valid, reasons = validate_frame(chunk, {'profile_id': {'min': 1, 'integer': True}, **rules})
+        _record_rejections(report, reasons, first_row)
+        if 'recorded_at' in valid.columns and len(valid):
+            recorded_at, bad_timestamps = _recorded_at(valid['recorded_at'])
+            _record_rejections(report, bad_timestamps, first_row)
+            valid = valid.assign(recorded_at=recorded_at).drop(bad_timestamps.index)
+        if len(valid):
+            valid = _derive(module, valid.assign(profile_id=valid['profile_id'].astype(int)))
+            if 'recorded_at' not in valid.columns:
+                valid['recorded_at'] = None
+            with db.transaction() as conn:
+                known = db.existing_profile_ids(conn, valid['profile_id'].unique().tolist())
+                unknown = ~valid['profile_id'].isin(known)
+                _record_rejections(report, valid.loc[unknown, 'profile_id'].map(
+                    lambda pid: f"profile_id {pid} does not exist"), first_row)
+                valid = valid[~unknown]
+                fields = [name for name, _ in db.ASSESSMENT_COLUMNS[module]]
+                entries = [
+                    (profile_id, {name: _none_for_nan(value) for name, value in zip(fields, values)},
+                     _none_for_nan(recorded_at))
+                    for profile_id, recorded_at, *values
+                    in valid[['profile_id', 'recorded_at', *fields]].itertuples(index=False, name=None)
+                ]
+                db.insert_assessments(conn, module, entries)
+            report.rows_inserted += len(entries)
+        report.elapsed = time.perf_counter() - start
+        if progress:
+            progress(report)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import athletes or assessments")
+    parser.add_argument("kind", choices=["profiles", "assessments"])
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--module", choices=list(ASSESSMENT_RULES),
+                        help="assessment module (required for assessments)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="override detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database path")
+    args = parser.parse_args(argv)
+    if args.kind == "assessments" and not args.module:
+        parser.error("--module is required when importing assessments")
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist")
+
+    db.DB_PATH = args.db
+    db.init_db()
+    progress = lambda report: print(f"\r{report.rows_read:,} rows read", end="", flush=True)
+    if args.kind == "profiles":
+        report = import_profiles(args.path, args.format, args.chunk_size, progress)
+    else:
+        report = import_assessments(args.path, args.module, args.format, args.chunk_size, progress)
+    print()
+    print(report.summary())
+    for row_number, reason in report.rejections[:20]:
+        print(f"  row {row_number}: {reason}")
+    if report.rows_rejected > 20:
+        print(f"  ... {report.rows_rejected - 20:,} more rejected rows")
+    return 0 if report.rows_rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
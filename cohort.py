@@ -0,0 +1,252 @@
+"""Cohort percentiles over persisted assessments.
+
+Every assessment is folded into a fixed-bin histogram per (module, metric,
+sport, age band, gender), inside the same transaction that appends it. The
+bins span the metric's validated range, so sketches of any two cells merge by
+adding counts: a cohort too small to be meaningful is widened to sport and
+gender, then sport, then everyone, by summing cells instead of scanning the
+assessment tables. A percentile lookup reads one sport's cells and costs
+O(bins) regardless of how much history is stored.
+"""
+import json
+import os
+
+import db
+from validation import ASSESSMENT_RULES
+
+BINS = 64
+MIN_COHORT_SIZE = int(os.getenv("AMS_COHORT_MIN_SIZE", "30"))
+AGE_BANDS = [(17, "U18"), (22, "18-22"), (27, "23-27"), (32, "28-32"), (None, "33+")]
+ALL = "*"
+
+# Metrics with a bounded range (and the injury risk score, always 0-10)
+TRACKED = {
+    module: {metric: (rule['min'], rule['max']) for metric, rule in rules.items()
+             if 'min' in rule and 'max' in rule}
+    for module, rules in ASSESSMENT_RULES.items()
+}
+TRACKED['injury']['risk_score'] = (0, 10)
+TRACKED = {module: metrics for module, metrics in TRACKED.items() if metrics}
+
+CREATE_SKETCHES = '''CREATE TABLE IF NOT EXISTS cohort_sketches
+                     (module TEXT NOT NULL,
+                      metric TEXT NOT NULL,
+                      sport TEXT NOT NULL,
+                      age_band TEXT NOT NULL,
+                      gender TEXT NOT NULL,
+                      count INTEGER NOT NULL,
+                      bins TEXT NOT NULL,
+                      PRIMARY KEY (module, sport, metric, age_band, gender)) WITHOUT ROWID'''
+
+SELECT_CELL = '''SELECT count, bins FROM cohort_sketches
+                 WHERE module = ? AND sport = ? AND metric = ? AND age_band = ? AND gender = ?'''
+
+SELECT_SPORT = '''SELECT metric, age_band, gender, count, bins FROM cohort_sketches
+                  WHERE module = ? AND sport = ?'''
+
+SELECT_MODULE = '''SELECT metric, count, bins FROM cohort_sketches WHERE module = ?'''
+
+UPSERT_CELL = '''INSERT OR REPLACE INTO cohort_sketches
+                 (module, sport, metric, age_band, gender, count, bins) VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+
+def age_band(age):
+    if age is None:
+        return ALL
+    for upper, label in AGE_BANDS:
+        if upper is None or age <= upper:
+            return label
+
+
+class Sketch:
+    """Fixed-range histogram; sketches of the same metric merge by adding bins"""
+
+    def __init__(self, low, high, bins=None):
+        self.low = low
+        self.high = high
+        self.bins = list(bins) if bins is not None else [0] * BINS
+        self.count = sum(self.bins)
+
+    def _index(self, value):
+        position = (value - self.low) / (self.high - self.low) * BINS
+        return min(BINS - 1, max(0, int(position)))
+
+    def add(self, value, weight=1):
+        self.bins[self._index(value)] += weight
+        self.count += weight
+
+    def merge(self, other):
+        for i, n in enumerate(other.bins):
+            self.bins[i] += n
+        self.count += other.count
+        return self
+
+    def percentile_of(self, value):
+        """Share of samples below value (half of its own bin counts), 0-100"""
+        if not self.count:
+            return None
+        index = self._index(value)
+        below = sum(self.bins[:index])
+        return (below + self.bins[index] / 2) / self.count * 100
+
+    def quantile(self, q):
+        """Value at quantile q (0-1), interpolated inside the bin"""
+        if not self.count:
+            return None
+        target = q * self.count
+        width = (self.high - self.low) / BINS
+        seen = 0
+        for i, n in enumerate(self.bins):
+            if n and seen + n >= target:
+                return self.low + (i + (target - seen) / n) * width
+            seen += n
+        return self.high
+
+
+def _sketch(module, metric, bins=None):
+    low, high = TRACKED[module][metric]
+    return Sketch(low, high, json.loads(bins) if isinstance(bins, str) else bins)
+
+
+def _profiles(conn, profile_ids):
+    """{profile_id: (sport, age band, gender)} in chunks under SQLite's variable limit"""
+    cohorts = {}
+    ids = list(profile_ids)
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        rows = conn.execute(f'''SELECT id, sport, age, gender FROM profiles
+                                WHERE id IN ({", ".join("?" * len(chunk))})''', chunk)
+        for row in rows:
+            cohorts[row['id']] = (row['sport'] or ALL, age_band(row['age']), row['gender'] or ALL)
+    return cohorts
+
+
+def update_sketches(conn, module, entries):
+    """Assessment hook: add new rows to their cohort's sketches, one write per touched cell"""
+    metrics = TRACKED.get(module)
+    if not metrics:
+        return
+    cohorts = _profiles(conn, {profile_id for profile_id, _, _ in entries})
+    cells = {}
+    for profile_id, data, _ in entries:
+        cohort = cohorts.get(profile_id)
+        if cohort is None:
+            continue
+        for metric in metrics:
+            value = data.get(metric)
+            if value is None:
+                continue
+            key = (cohort[0], metric, cohort[1], cohort[2])
+            sketch = cells.get(key)
+            if sketch is None:
+                row = conn.execute(SELECT_CELL, (module, *key)).fetchone()
+                sketch = cells[key] = _sketch(module, metric, row['bins'] if row else None)
+            sketch.add(float(value))
+    for key, sketch in cells.items():
+        conn.execute(UPSERT_CELL, (module, *key, sketch.count, json.dumps(sketch.bins)))
+
+
+def rebuild_sketches(conn, module=None):
+    """Recompute sketches from the full assessment history (e.g. for an existing database)"""
+    for name in [module] if module else list(TRACKED):
+        conn.execute('DELETE FROM cohort_sketches WHERE module = ?', (name,))
+        rows = conn.execute(f'SELECT * FROM {db.assessment_table(name)} ORDER BY id')
+        batch = []
+        for row in rows:
+            batch.append((row['profile_id'], dict(row), row['recorded_at']))
+            if len(batch) >= 5000:
+                update_sketches(conn, name, batch)
+                batch = []
+        if batch:
+            update_sketches(conn, name, batch)
+
+
+def _widen(module, cells, sport, band, gender):
+    """Narrowest cohort with at least MIN_COHORT_SIZE samples: {metric: Sketch}, label"""
+    levels = [
+        (lambda c: c[1] == band and c[2] == gender, f"{sport} · {band} · {gender}"),
+        (lambda c: c[2] == gender, f"{sport} · {gender}"),
+        (lambda c: True, sport),
+    ]
+    merged = {}
+    for matches, label in levels:
+        merged = {}
+        for (metric, cell_band, cell_gender), sketch in cells.items():
+            if matches((metric, cell_band, cell_gender)):
+                merged.setdefault(metric, _sketch(module, metric)).merge(sketch)
+        if merged and min(s.count for s in merged.values()) >= MIN_COHORT_SIZE:
+            return merged, label
+    return merged, None
+
+
+def cohort_percentiles(profile, module, data):
+    """{metric: {'percentile', 'median', 'size', 'cohort'}} for one athlete's values
+
+    ``profile`` is a db.get_profile row. Metrics without enough comparable
+    assessments anywhere are left out.
+    """
+    if module not in TRACKED:
+        return {}
+    data = {metric: value for metric, value in data.items() if metric in TRACKED[module]}
+    if not data:
+        return {}
+    sport = profile.get('sport') or ALL
+    wanted = f" AND metric IN ({', '.join('?' * len(data))})"
+    with db.connection() as conn:
+        rows = conn.execute(SELECT_SPORT + wanted, (module, sport, *data))
+        cells = {(row['metric'], row['age_band'], row['gender']): _sketch(module, row['metric'], row['bins'])
+                 for row in rows}
+        sketches, label = _widen(module, cells, sport, age_band(profile.get('age')),
+                                 profile.get('gender') or ALL)
+        if label is None:
+            sketches, label = cohort_sketches(module, conn=conn), "all athletes"
+    result = {}
+    for metric, value in data.items():
+        sketch = sketches.get(metric)
+        if value is None or sketch is None or sketch.count < MIN_COHORT_SIZE:
+            continue
+        result[metric] = {'percentile': sketch.percentile_of(float(value)), 'median': sketch.quantile(0.5),
+                          'size': sketch.count, 'cohort': label}
+    return result
+
+
+def cohort_sketches(module, sport=None, conn=None):
+    """{metric: Sketch} merged over one sport, or every athlete"""
+    if conn is None:
+        with db.connection() as conn:
+            return cohort_sketches(module, sport, conn)
+    if sport:
+        rows = conn.execute(SELECT_SPORT, (module, sport))
+    else:
+        rows = conn.execute(SELECT_MODULE, (module,))
+    merged = {}
+    for row in rows:
+        merged.setdefault(row['metric'], _sketch(module, row['metric'])).merge(
+            _sketch(module, row['metric'], row['bins']))
+    return merged
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Rebuild cohort percentile sketches from history")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database path")
+    parser.add_argument("--module", choices=list(TRACKED))
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    db.init_db()
+    with db.transaction() as conn:
+        rebuild_sketches(conn, args.module)
+    with db.connection() as conn:
+        for module, cells in conn.execute('''SELECT module, COUNT(*) FROM cohort_sketches
+                                             GROUP BY module'''):
+            print(f"{module}: {cells:,} cohort sketches")
+    return 0
+
+
+db.register_schema(CREATE_SKETCHES)
+db.register_assessment_hook(update_sketches)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,506 @@
+"""SQLite data access layer.
+
+Every profile read and write goes through this module. Connections come from a
+process-wide pool and are opened once in WAL mode, so concurrent coaches no
+longer pay connection setup per write or hit "database is locked" when a
+reader overlaps a writer. SQL lives in module constants so sqlite3's
+per-connection statement cache reuses the prepared statements.
+"""
+import importlib
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = os.getenv("AMS_DB_PATH", "athlete_profiles.db")
+POOL_SIZE = int(os.getenv("AMS_DB_POOL_SIZE", 8))
+BUSY_TIMEOUT_MS = 5000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+CACHE_SIZE_KIB = 16384
+STATEMENT_CACHE_SIZE = 256
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Extra tables and insert hooks registered by modules built on the history tables
+_schema_extensions = []
+_assessment_hooks = []
+# Those modules, loaded by init_db and the assessment writers themselves: an entry point that
+# forgot to import one would write history without its derived tables ever seeing it
+EXTENSION_MODULES = ("trends", "cohort")
+_extensions_loaded = False
+
+CREATE_PROFILES = '''CREATE TABLE IF NOT EXISTS profiles
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      name TEXT,
+                      sport TEXT,
+                      age INTEGER,
+                      height REAL,
+                      weight REAL,
+                      gender TEXT,
+                      join_date TEXT,
+                      last_updated TEXT)'''
+
+INSERT_PROFILE = '''INSERT INTO profiles
+                    (name, sport, age, height, weight, gender, join_date, last_updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+SELECT_PROFILE = '''SELECT id, name, sport, age, height, weight, gender, join_date, last_updated
+                    FROM profiles WHERE id = ?'''
+
+# Roster filters: sport narrows first, then gender/age; keyset pagination walks id
+PROFILE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_profiles_sport ON profiles (sport)',
+    'CREATE INDEX IF NOT EXISTS idx_profiles_sport_gender_age ON profiles (sport, gender, age)',
+    'CREATE INDEX IF NOT EXISTS idx_profiles_gender_age ON profiles (gender, age)',
+    'CREATE INDEX IF NOT EXISTS idx_profiles_age ON profiles (age)',
+]
+
+# External-content FTS5 index over names, kept in sync by triggers
+CREATE_PROFILES_FTS = '''CREATE VIRTUAL TABLE profiles_fts
+                         USING fts5(name, content='profiles', content_rowid='id', prefix='2 3')'''
+
+PROFILES_FTS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS profiles_fts_insert AFTER INSERT ON profiles BEGIN
+         INSERT INTO profiles_fts(rowid, name) VALUES (new.id, new.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS profiles_fts_delete AFTER DELETE ON profiles BEGIN
+         INSERT INTO profiles_fts(profiles_fts, rowid, name) VALUES ('delete', old.id, old.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS profiles_fts_update AFTER UPDATE OF name ON profiles BEGIN
+         INSERT INTO profiles_fts(profiles_fts, rowid, name) VALUES ('delete', old.id, old.name);
+         INSERT INTO profiles_fts(rowid, name) VALUES (new.id, new.name);
+       END''',
+]
+
+ROSTER_PAGE_SIZE = 25
+
+# Generated advisor reports, newest per (profile, module) is the current one
+CREATE_AI_REPORTS = '''CREATE TABLE IF NOT EXISTS ai_reports
+                       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        profile_id INTEGER NOT NULL REFERENCES profiles(id),
+                        module TEXT NOT NULL,
+                        created_at TEXT NOT NULL,
+                        model TEXT,
+                        prompt TEXT,
+                        report TEXT)'''
+
+CREATE_AI_REPORTS_INDEX = '''CREATE INDEX IF NOT EXISTS idx_ai_reports_profile_module
+                             ON ai_reports (profile_id, module, created_at)'''
+
+INSERT_AI_REPORT = '''INSERT INTO ai_reports (profile_id, module, created_at, model, prompt, report)
+                      VALUES (?, ?, ?, ?, ?, ?)'''
+
+# Column layout of each module's assessment history table
+ASSESSMENT_COLUMNS = {
+    'performance': [
+        ('speed', 'REAL'), ('stamina', 'REAL'), ('strength', 'REAL'), ('reaction_time', 'REAL'),
+        ('flexibility', 'REAL'), ('recovery_rate', 'REAL'), ('technique', 'REAL'),
+        ('coordination', 'REAL'), ('accuracy', 'REAL'), ('tactical_awareness', 'REAL'),
+        ('equipment_handling', 'REAL'), ('focus', 'REAL'), ('confidence', 'REAL'),
+        ('resilience', 'REAL'), ('motivation', 'REAL'), ('composure', 'REAL'),
+    ],
+    'injury': [
+        ('training_intensity', 'REAL'), ('past_injuries', 'INTEGER'), ('fatigue_level', 'REAL'),
+        ('sleep_hours', 'REAL'), ('nutrition_score', 'REAL'), ('stress_level', 'REAL'),
+        ('risk_score', 'REAL'),
+    ],
+    'career': [
+        ('age', 'INTEGER'), ('sport', 'TEXT'), ('experience', 'INTEGER'), ('strengths', 'TEXT'),
+    ],
+    'nutrition': [
+        ('weight', 'REAL'), ('height', 'REAL'), ('age', 'INTEGER'), ('activity_level', 'TEXT'),
+        ('dietary_pref', 'TEXT'), ('allergies', 'TEXT'), ('bmi', 'REAL'),
+    ],
+    'finance': [
+        ('salary', 'REAL'), ('endorsements', 'REAL'), ('appearances', 'REAL'),
+        ('other_income', 'REAL'), ('coaching', 'REAL'), ('equipment', 'REAL'), ('physio', 'REAL'),
+        ('travel', 'REAL'), ('nutrition', 'REAL'), ('housing', 'REAL'), ('insurance', 'REAL'),
+        ('transport', 'REAL'), ('other_expenses', 'REAL'), ('total_income', 'REAL'),
+        ('total_expenses', 'REAL'), ('savings', 'REAL'), ('savings_rate', 'REAL'),
+    ],
+}
+
+
+def assessment_table(module):
+    if module not in ASSESSMENT_COLUMNS:
+        raise ValueError(f"Unknown assessment module: {module}")
+    return f"{module}_assessments"
+
+
+def _create_assessment_sql(module):
+    table = assessment_table(module)
+    columns = ",\n".join(f"  {name} {kind}" for name, kind in ASSESSMENT_COLUMNS[module])
+    return [
+        f'''CREATE TABLE IF NOT EXISTS {table}
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             profile_id INTEGER NOT NULL REFERENCES profiles(id),
+             recorded_at TEXT NOT NULL,
+             {columns})''',
+        f'''CREATE INDEX IF NOT EXISTS idx_{table}_profile_recorded
+            ON {table} (profile_id, recorded_at)''',
+    ]
+
+
+def _insert_assessment_sql(module):
+    names = [name for name, _ in ASSESSMENT_COLUMNS[module]]
+    placeholders = ", ".join("?" * (len(names) + 2))
+    return (f"INSERT INTO {assessment_table(module)} "
+            f"(profile_id, recorded_at, {', '.join(names)}) VALUES ({placeholders})")
+
+
+INSERT_ASSESSMENT = {module: _insert_assessment_sql(module) for module in ASSESSMENT_COLUMNS}
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of WAL-mode connections shared by all script threads"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._idle.put(conn)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return _connect(self.path)
+        return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def get_pool():
+    """Process-wide pool for DB_PATH"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+@contextmanager
+def connection():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction():
+    """Write transaction that takes the write lock up front"""
+    with connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            try:
+                conn.execute('COMMIT')
+            except BaseException:
+                # A busy COMMIT leaves the transaction open; never hand it back to the pool that way
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+
+
+def close_pool():
+    """Close idle pooled connections (used on shutdown and in benchmarks)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def register_schema(*statements):
+    """Add DDL that init_db should run after the core tables"""
+    for statement in statements:
+        if statement not in _schema_extensions:
+            _schema_extensions.append(statement)
+
+
+def register_assessment_hook(hook):
+    """Call hook(conn, module, entries) inside every assessment write
+
+    ``entries`` is a list of (profile_id, data, recorded_at) in insert order.
+    """
+    if hook not in _assessment_hooks:
+        _assessment_hooks.append(hook)
+
+
+def load_extensions():
+    """Import EXTENSION_MODULES so their schemas and assessment hooks are registered"""
+    global _extensions_loaded
+    if not _extensions_loaded:
+        for name in EXTENSION_MODULES:
+            importlib.import_module(name)
+        _extensions_loaded = True
+
+
+def _init_profiles_fts(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'profiles_fts'").fetchone()
+    if exists:
+        return
+    try:
+        conn.execute(CREATE_PROFILES_FTS)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; name search falls back to LIKE
+        return
+    for statement in PROFILES_FTS_TRIGGERS:
+        conn.execute(statement)
+    conn.execute("INSERT INTO profiles_fts(profiles_fts) VALUES ('rebuild')")
+
+
+def init_db():
+    load_extensions()
+    with transaction() as conn:
+        conn.execute(CREATE_PROFILES)
+        for statement in PROFILE_INDEXES:
+            conn.execute(statement)
+        _init_profiles_fts(conn)
+        conn.execute(CREATE_AI_REPORTS)
+        conn.execute(CREATE_AI_REPORTS_INDEX)
+        for module in ASSESSMENT_COLUMNS:
+            for statement in _create_assessment_sql(module):
+                conn.execute(statement)
+        for statement in _schema_extensions:
+            conn.execute(statement)
+        # Refresh planner statistics so the roster filters pick the right index. Inside the write
+        # transaction: on its own it would upgrade a read to a write, which fails at once rather
+        # than waiting when another replica has written in between
+        conn.execute('PRAGMA optimize')
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def insert_profile(name, sport, age, height, weight, gender):
+    """Insert a profile and return its id"""
+    with transaction() as conn:
+        return add_profile(conn, name, sport, age, height, weight, gender)
+
+
+def add_profile(conn, name, sport, age, height, weight, gender):
+    """Insert one profile inside a caller's transaction and return its id"""
+    current_time = _now()
+    return conn.execute(INSERT_PROFILE,
+                        (name, sport, age, height, weight, gender, current_time, current_time)).lastrowid
+
+
+def get_profile(profile_id):
+    """Profile row as a dict, or None if it does not exist"""
+    with connection() as conn:
+        row = conn.execute(SELECT_PROFILE, (profile_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _fts_prefix_query(text):
+    """'jo sm' -> '"jo"* "sm"*' so every word matches as a name prefix"""
+    words = [word.replace('"', '""') for word in text.split()]
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'profiles_fts'").fetchone() is not None
+
+
+def search_profiles(sport=None, gender=None, min_age=None, max_age=None, name_prefix=None,
+                    after_id=0, limit=ROSTER_PAGE_SIZE):
+    """One roster page ordered by id, plus the cursor for the next page (None on the last page)"""
+    clauses = ["id > ?"]
+    params = [after_id or 0]
+    if sport:
+        clauses.append("sport = ?")
+        params.append(sport)
+    if gender:
+        clauses.append("gender = ?")
+        params.append(gender)
+    if min_age is not None:
+        clauses.append("age >= ?")
+        params.append(min_age)
+    if max_age is not None:
+        clauses.append("age <= ?")
+        params.append(max_age)
+    with connection() as conn:
+        if name_prefix and name_prefix.strip():
+            if _has_fts(conn):
+                clauses.append("id IN (SELECT rowid FROM profiles_fts WHERE profiles_fts MATCH ?)")
+                params.append(_fts_prefix_query(name_prefix))
+            else:
+                clauses.append("name LIKE ? ESCAPE '\\'")
+                escaped = name_prefix.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(escaped + '%')
+        sql = (f"SELECT id, name, sport, age, height, weight, gender, join_date FROM profiles "
+               f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?")
+        rows = [dict(row) for row in conn.execute(sql, params + [limit + 1])]
+    next_after_id = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], next_after_id
+
+
+def profile_sports():
+    with connection() as conn:
+        return [row[0] for row in conn.execute('SELECT DISTINCT sport FROM profiles ORDER BY sport')]
+
+
+def _assessment_row(module, profile_id, recorded_at, data):
+    return (profile_id, recorded_at, *(data.get(name) for name, _ in ASSESSMENT_COLUMNS[module]))
+
+
+def numeric_columns(module):
+    return [name for name, kind in ASSESSMENT_COLUMNS[module] if kind in ('REAL', 'INTEGER')]
+
+
+def record_assessment(module, profile_id, data, recorded_at=None):
+    """Append one assessment for a profile and return its id"""
+    recorded_at = recorded_at or _now()
+    row = _assessment_row(module, profile_id, recorded_at, data)
+    load_extensions()
+    with transaction() as conn:
+        assessment_id = conn.execute(INSERT_ASSESSMENT[module], row).lastrowid
+        for hook in _assessment_hooks:
+            hook(conn, module, [(profile_id, data, recorded_at)])
+        return assessment_id
+
+
+def insert_profiles(conn, profiles):
+    """executemany insert of (name, sport, age, height, weight, gender) tuples inside a caller's transaction"""
+    current_time = _now()
+    conn.executemany(INSERT_PROFILE, [(*profile, current_time, current_time) for profile in profiles])
+
+
+def insert_assessments(conn, module, entries):
+    """executemany insert of (profile_id, data, recorded_at) entries inside a caller's transaction"""
+    load_extensions()
+    entries = [(profile_id, data, recorded_at or _now()) for profile_id, data, recorded_at in entries]
+    conn.executemany(INSERT_ASSESSMENT[module],
+                     [_assessment_row(module, profile_id, recorded_at, data)
+                      for profile_id, data, recorded_at in entries])
+    for hook in _assessment_hooks:
+        hook(conn, module, entries)
+
+
+def existing_profile_ids(conn, profile_ids):
+    """Subset of profile_ids present in the profiles table"""
+    found = set()
+    ids = list(profile_ids)
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        placeholders = ", ".join("?" * len(batch))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT id FROM profiles WHERE id IN ({placeholders})", batch))
+    return found
+
+
+def assessment_history(module, profile_id, since=None, until=None, limit=None, before_id=None,
+                       columns=None):
+    """Assessments for a profile, newest first, served from the (profile_id, recorded_at) index
+
+    ``before_id`` continues a listing after the assessment with that id (keyset
+    pagination, stable while new assessments arrive). ``columns`` limits the
+    row to those columns instead of every stored field.
+    """
+    table = assessment_table(module)
+    if columns:
+        known = {'id', 'profile_id', 'recorded_at', *(name for name, _ in ASSESSMENT_COLUMNS[module])}
+        unknown = [column for column in columns if column not in known]
+        if unknown:
+            raise ValueError(f"Unknown {module} assessment columns: {', '.join(unknown)}")
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table} WHERE profile_id = ?"
+    params = [profile_id]
+    if since:
+        sql += " AND recorded_at >= ?"
+        params.append(since)
+    if until:
+        sql += " AND recorded_at < ?"
+        params.append(until)
+    if before_id:
+        sql += f" AND (recorded_at, id) < (SELECT recorded_at, id FROM {table} WHERE id = ?)"
+        params.append(before_id)
+    sql += " ORDER BY recorded_at DESC, id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    with connection() as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def latest_assessment(module, profile_id):
+    history = assessment_history(module, profile_id, limit=1)
+    return history[0] if history else None
+
+
+def latest_assessments(module, sport=None):
+    """Newest assessment of every athlete joined to their profile, as (columns, rows)
+
+    One (profile_id, recorded_at) index probe per athlete; rows come back as
+    plain tuples so large rosters load straight into a DataFrame.
+    """
+    table = assessment_table(module)
+    names = ", ".join(f"a.{name}" for name, _ in ASSESSMENT_COLUMNS[module])
+    sql = f'''SELECT p.id AS profile_id, p.name, p.sport, p.gender, p.age, a.recorded_at, {names}
+              FROM profiles p
+              JOIN {table} a ON a.id = (SELECT id FROM {table} WHERE profile_id = p.id
+                                        ORDER BY recorded_at DESC, id DESC LIMIT 1)'''
+    params = []
+    if sport:
+        sql += " WHERE p.sport = ?"
+        params.append(sport)
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(sql, params).fetchall()
+        columns = [description[0] for description in cursor.description]
+    return columns, rows
+
+
+def save_ai_reports(reports):
+    """Store (profile_id, module, model, prompt, report) tuples in one transaction"""
+    created_at = _now()
+    with transaction() as conn:
+        conn.executemany(INSERT_AI_REPORT, [(profile_id, module, created_at, model, prompt, report)
+                                            for profile_id, module, model, prompt, report in reports])
+
+
+def latest_ai_report(profile_id, module):
+    with connection() as conn:
+        row = conn.execute('''SELECT * FROM ai_reports WHERE profile_id = ? AND module = ?
+                              ORDER BY created_at DESC, id DESC LIMIT 1''', (profile_id, module)).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,544 @@
+"""Athlete dossier export to HTML and PDF.
+
+A dossier is the dashboard on paper: the profile header, the performance,
+injury and finance sections with their charts, and the AI analyses already
+generated for the athlete's current data (the response cache, else batch
+reports in ``ai_reports``). Nothing calls the AI backend, so exports work
+offline and never wait on a model.
+
+Charts are drawn with matplotlib as static images: inline SVG in the HTML,
+vector drawings in the PDF. matplotlib is only needed for exports
+(``pip install matplotlib``); without it the HTML leaves the charts out and
+PDF export raises ImportError.
+
+``export_squad`` streams a whole squad: dossiers are built and rendered in
+worker processes, written straight to disk, and yielded as they finish with
+at most two per worker in flight, so memory stays flat however large the
+squad is.
+
+    python dossier.py --out exports --formats html pdf --sport Football --workers 4
+"""
+import argparse
+import html
+import io
+import multiprocessing
+import os
+import re
+import textwrap
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import ai_client
+import db
+import projection
+import prompts
+import scoring
+import response_cache
+from response_cache import ResponseCache
+
+DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+FORMATS = ("html", "pdf")
+MODULES = ("performance", "injury", "career", "nutrition", "finance")
+SECTIONS = ("performance", "injury", "finance")
+SECTION_TITLES = {"performance": "Performance", "injury": "Health & Injury Risk",
+                  "finance": "Financial Health", "overview": "Comprehensive Analysis"}
+PROJECTION_PATHS = 1000
+
+PAGE_SIZE = (8.27, 11.69)  # A4 portrait, inches
+TEXT_WIDTH = 95            # characters per PDF text line
+LINES_PER_PAGE = 58
+CHART_HEIGHT = 0.3         # share of a PDF page
+BLUE = "#3b82f6"
+
+CSS = """
+body { font-family: -apple-system, 'Segoe UI', Roboto, sans-serif; color: #1f2937; max-width: 900px;
+       margin: 2rem auto; padding: 0 1rem; }
+header { border-bottom: 3px solid #3b82f6; margin-bottom: 1.5rem; }
+h1 { margin-bottom: .25rem; } h2 { color: #1d4ed8; margin-top: 2rem; }
+.meta { color: #6b7280; }
+table { border-collapse: collapse; margin: .5rem 0 1rem; }
+td, th { border-bottom: 1px solid #e5e7eb; padding: .25rem .75rem; text-align: left; }
+.chart svg { width: 100%; height: auto; }
+.analysis { background: #f9fafb; border-left: 4px solid #93c5fd; padding: .5rem 1rem; }
+.missing { color: #9ca3af; font-style: italic; }
+@media print { section { page-break-inside: avoid; } }
+"""
+
+
+# Dossier data
+
+def _bmi(profile):
+    height, weight = profile.get("height"), profile.get("weight")
+    if not height or not weight:
+        return None
+    return scoring.calculate_bmi(height, weight)
+
+
+def _stored_text(profile_id, module, prompt, model_name, cache):
+    """Cached response to this exact prompt, else a batch report generated from it"""
+    # peek: an export must not count as a cache hit or refresh LRU recency
+    text = cache.peek(model_name, prompt) if cache is not None else None
+    if not text and profile_id:
+        # ai_reports outlives the cache TTL; only a report for the same data is used
+        report = db.latest_ai_report(profile_id, module)
+        if report and report.get("prompt") == prompt:
+            text = report.get("report")
+    return text or None
+
+
+def stored_analyses(profile_id, name, athlete_data, model_name, cache=None):
+    """{section: text} already generated for this data; sections without one are left out"""
+    analyses = {}
+    for module in SECTIONS:
+        data = athlete_data.get(module)
+        if data:
+            text = _stored_text(profile_id, module, prompts.module_prompt(module, name, data), model_name, cache)
+            if text:
+                analyses[module] = text
+    if all(athlete_data.get(module) for module in MODULES):
+        text = _stored_text(None, "dashboard", prompts.dashboard_prompt(athlete_data), model_name, cache)
+        if text:
+            analyses["overview"] = text
+    return analyses
+
+
+def build_dossier(profile, athlete_data, analyses):
+    """Everything a dossier shows, as plain data (picklable for worker processes)"""
+    injury = athlete_data.get("injury") or {}
+    scores = {}
+    if injury:
+        risk = injury.get("risk_score")
+        if risk is None:
+            risk = scoring.injury_risk_score(injury.get("training_intensity", 0), injury.get("past_injuries", 0),
+                                             injury.get("sleep_hours", 0), injury.get("nutrition_score", 0))
+        scores = {"risk_score": risk, "risk_level": scoring.risk_level(risk),
+                  "recovery_score": scoring.recovery_score(injury.get("sleep_hours", 0),
+                                                           injury.get("nutrition_score", 0))}
+    return {
+        "profile": dict(profile, bmi=_bmi(profile)),
+        "data": {module: dict(athlete_data.get(module) or {}) for module in MODULES},
+        "scores": scores,
+        "analyses": dict(analyses),
+        "generated_at": datetime.now().strftime(db.TIMESTAMP_FORMAT),
+    }
+
+
+def load_dossier(profile_id, model_name=None, cache=None):
+    """Dossier of a stored athlete from their latest assessment per module"""
+    profile = db.get_profile(profile_id)
+    if profile is None:
+        raise ValueError(f"No profile with id {profile_id}")
+    athlete_data = {}
+    for module in MODULES:
+        row = db.latest_assessment(module, profile_id)
+        if row:
+            athlete_data[module] = {name: row[name] for name, _ in db.ASSESSMENT_COLUMNS[module]}
+    analyses = stored_analyses(profile_id, profile["name"], athlete_data,
+                               model_name or ai_client.default_model_name(), cache)
+    return build_dossier(profile, athlete_data, analyses)
+
+
+def squad_profile_ids(sport=None):
+    """Ids of athletes with a stored assessment in every dossier section"""
+    ids = None
+    for module in SECTIONS:
+        columns, rows = db.latest_assessments(module, sport=sport)
+        index = columns.index("profile_id")
+        found = {row[index] for row in rows}
+        ids = found if ids is None else ids & found
+    return sorted(ids or ())
+
+
+# Charts: matplotlib figures created without pyplot, so no GUI backend or global state is
+# involved. Each builder draws on the figure it is given (a PDF page) or a new one.
+
+def _figure(width=7.5, height=3.2):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height))
+    fig.subplots_adjust(left=0.1, right=0.97, top=0.88, bottom=0.28)
+    return fig
+
+
+def performance_figure(data, fig=None):
+    fig = fig or _figure()
+    ax = fig.add_subplot(111)
+    metrics = [metric for metric in prompts.SECTION_FIELDS["performance"] if data.get(metric) is not None]
+    ax.bar(range(len(metrics)), [data[metric] for metric in metrics], color=BLUE)
+    ax.set_xticks(range(len(metrics)))
+    ax.set_xticklabels([metric.replace("_", " ") for metric in metrics], rotation=45, ha="right", fontsize=7)
+    ax.set_title("Performance Metrics", fontsize=10)
+    ax.tick_params(axis="y", labelsize=7)
+    return fig
+
+
+def injury_figure(data, fig=None):
+    fig = fig or _figure()
+    ax = fig.add_subplot(111)
+    factors = [("Intensity", "training_intensity"), ("Fatigue", "fatigue_level"),
+               ("Stress", "stress_level"), ("Nutrition", "nutrition_score"), ("Sleep (h)", "sleep_hours")]
+    factors = [(label, data.get(key)) for label, key in factors if data.get(key) is not None]
+    ax.barh([label for label, _ in factors], [value for _, value in factors], color="#f97316")
+    ax.set_xlim(0, 12)
+    ax.set_title("Injury Risk Factors", fontsize=10)
+    ax.tick_params(labelsize=7)
+    return fig
+
+
+def finance_figure(data, age=None, fig=None):
+    """Expense breakdown next to the net worth projection fan"""
+    fig = fig or _figure()
+    pie, fan = fig.add_subplot(121), fig.add_subplot(122)
+    expenses = [(key.replace("_", " ").title(), data.get(key) or 0)
+                for key in ("coaching", "equipment", "physio", "travel", "nutrition", "housing",
+                            "insurance", "transport", "other_expenses")]
+    expenses = [(label, value) for label, value in expenses if value > 0]
+    if expenses:
+        pie.pie([value for _, value in expenses], labels=[label for label, _ in expenses],
+                textprops={"fontsize": 6}, wedgeprops={"width": 0.45})
+    pie.set_title("Monthly Expenses", fontsize=10)
+
+    result = projection.project(data, age=age, paths=PROJECTION_PATHS, seed=0)
+    ages = result.ages
+    fan.fill_between(ages, result.bands[5], result.bands[95], color=BLUE, alpha=0.15, linewidth=0)
+    fan.fill_between(ages, result.bands[25], result.bands[75], color=BLUE, alpha=0.35, linewidth=0)
+    fan.plot(ages, result.bands[50], color="#1d4ed8", linewidth=1.5)
+    fan.axhline(0, color="#ef4444", linestyle=":", linewidth=1)
+    fan.set_title(f"Projected Net Worth (₹, {result.ruin_probability:.0%} run out)", fontsize=10)
+    fan.tick_params(labelsize=7)
+    fan.yaxis.set_major_formatter(lambda value, _: f"{value / 1e6:,.0f}M")
+    return fig
+
+
+def section_figure(section, dossier, fig=None):
+    data = dossier["data"][section]
+    if section == "performance":
+        return performance_figure(data, fig)
+    if section == "injury":
+        return injury_figure(data, fig)
+    return finance_figure(data, dossier["profile"].get("age"), fig)
+
+
+def _svg(fig):
+    buffer = io.StringIO()
+    fig.savefig(buffer, format="svg")
+    svg = buffer.getvalue()
+    return svg[svg.index("<svg"):]  # drop the XML prolog and doctype for inlining
+
+
+# Section contents shared by both formats
+
+def _format(value):
+    if isinstance(value, float):
+        return f"{value:,.2f}".rstrip("0").rstrip(".") if abs(value) < 1000 else f"{value:,.0f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def header_rows(dossier):
+    profile = dossier["profile"]
+    rows = [("Sport", profile.get("sport")), ("Age", profile.get("age")), ("Gender", profile.get("gender")),
+            ("Height (cm)", profile.get("height")), ("Weight (kg)", profile.get("weight")),
+            ("BMI", profile.get("bmi")), ("Member since", profile.get("join_date"))]
+    return [(label, _format(value)) for label, value in rows if value not in (None, "")]
+
+
+def section_rows(section, dossier):
+    """(label, value) pairs summarising a section"""
+    data = dossier["data"][section]
+    if section == "injury":
+        scores = dossier["scores"]
+        rows = [("Risk score", f"{scores['risk_score']:.1f}/10 ({scores['risk_level']})"),
+                ("Recovery score", f"{scores['recovery_score']:.0f}/100")] if scores else []
+        fields = [field for field in prompts.SECTION_FIELDS["injury"] if field != "risk_score"]
+    elif section == "finance":
+        rows = [("Monthly income", f"₹{data.get('total_income') or 0:,.0f}"),
+                ("Monthly expenses", f"₹{data.get('total_expenses') or 0:,.0f}"),
+                ("Savings rate", f"{data.get('savings_rate') or 0:.1f}%")] if data else []
+        fields = []
+    else:
+        rows = []
+        fields = prompts.SECTION_FIELDS[section]
+    rows += [(field.replace("_", " ").capitalize(), _format(data[field]))
+             for field in fields if data.get(field) is not None]
+    return rows
+
+
+# HTML
+
+_EMPHASIS = re.compile(r"\*\*(.+?)\*\*")
+
+
+def _table(rows):
+    cells = "".join(f"<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>"
+                    for label, value in rows)
+    return f"<table>{cells}</table>"
+
+
+def _analysis_html(text):
+    if not text:
+        return '<p class="missing">No stored AI analysis. Generate one from the module page or batch reports.</p>'
+    blocks = [_EMPHASIS.sub(r"<strong>\1</strong>", html.escape(block)).replace("\n", "<br>")
+              for block in re.split(r"\n\s*\n", text.strip()) if block.strip()]
+    return '<div class="analysis">' + "".join(f"<p>{block}</p>" for block in blocks) + "</div>"
+
+
+def html_chunks(dossier, charts=True):
+    """The HTML document in pieces (one per section), for streaming to a file or response"""
+    profile = dossier["profile"]
+    name = html.escape(profile.get("name") or "Athlete")
+    yield (f"<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+           f"<title>{name} · Athlete Dossier</title><style>{CSS}</style></head><body>")
+    yield (f"<header><h1>{name}</h1><p class=\"meta\">Athlete dossier generated "
+           f"{html.escape(dossier['generated_at'])}</p>{_table(header_rows(dossier))}</header>")
+    if charts:
+        try:
+            import matplotlib  # noqa: F401
+        except ImportError:
+            charts = False
+            yield '<p class="missing">Charts need matplotlib (pip install matplotlib).</p>'
+    for section in SECTIONS:
+        if not dossier["data"][section]:
+            continue
+        parts = [f"<section><h2>{SECTION_TITLES[section]}</h2>", _table(section_rows(section, dossier))]
+        if charts:
+            parts.append(f'<div class="chart">{_svg(section_figure(section, dossier))}</div>')
+        parts.append(_analysis_html(dossier["analyses"].get(section)))
+        parts.append("</section>")
+        yield "".join(parts)
+    if "overview" in dossier["analyses"]:
+        yield (f"<section><h2>{SECTION_TITLES['overview']}</h2>"
+               f"{_analysis_html(dossier['analyses']['overview'])}</section>")
+    yield "</body></html>"
+
+
+def render_html(dossier, charts=True):
+    return "".join(html_chunks(dossier, charts))
+
+
+# PDF
+
+def _text_lines(text, width=TEXT_WIDTH):
+    """Wrapped lines, keeping the response's own line breaks (lists, headings)"""
+    lines = []
+    for line in _EMPHASIS.sub(r"\1", text).strip().splitlines():
+        lines.extend(textwrap.wrap(line, width, subsequent_indent="  " if line.lstrip()[:1] in "-*•" else "")
+                     or [""])
+    return lines
+
+
+class _PdfWriter:
+    """Lays out headings, tables, charts and wrapped text top to bottom across A4 pages"""
+
+    LINE = 1 / LINES_PER_PAGE
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.fig = None
+        self.y = 0
+
+    def _new_page(self):
+        from matplotlib.figure import Figure
+        self.finish()
+        self.fig = Figure(figsize=PAGE_SIZE)
+        self.y = 0.95
+
+    def _room(self, height):
+        if self.fig is None or self.y - height < 0.04:
+            self._new_page()
+
+    def keep_together(self, height):
+        """Start a new page unless the next height (page fraction) fits on this one"""
+        self._room(height)
+
+    def heading(self, text, size=14):
+        if self.fig is not None and self.y < 0.95:
+            self.y -= self.LINE
+        self._room(3 * self.LINE)
+        self.fig.text(0.07, self.y, text, fontsize=size, weight="bold", color="#1d4ed8", va="top")
+        self.y -= 2 * self.LINE
+
+    def line(self, text, size=8.5, color="#1f2937"):
+        self._room(self.LINE)
+        self.fig.text(0.07, self.y, text, fontsize=size, color=color, va="top", family="DejaVu Sans")
+        self.y -= self.LINE
+
+    def rows(self, rows):
+        for label, value in rows:
+            self._room(self.LINE)
+            self.fig.text(0.07, self.y, label, fontsize=8.5, weight="bold", va="top")
+            self.fig.text(0.32, self.y, value, fontsize=8.5, va="top")
+            self.y -= self.LINE
+        self.y -= self.LINE / 2
+
+    def chart(self, draw, height=None):
+        """draw(fig) adds axes to the page; they are placed in a band height tall"""
+        height = height or CHART_HEIGHT
+        self._room(height)
+        before = list(self.fig.axes)
+        draw(self.fig)
+        new_axes = [ax for ax in self.fig.axes if ax not in before]
+        width = 0.86 / len(new_axes)
+        for i, ax in enumerate(new_axes):
+            # Leave room for tick labels under the axes
+            ax.set_position([0.1 + i * width, self.y - height + 0.07, width - 0.08, height - 0.1])
+        self.y -= height
+
+    def text(self, text):
+        for line in _text_lines(text):
+            self.line(line)
+
+    def finish(self):
+        if self.fig is not None:
+            self.pages.savefig(self.fig)
+            self.fig = None
+
+
+def render_pdf(dossier):
+    """PDF bytes; raises ImportError without matplotlib"""
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buffer = io.BytesIO()
+    with PdfPages(buffer, metadata={"Title": f"{dossier['profile'].get('name')} · Athlete Dossier"}) as pages:
+        writer = _PdfWriter(pages)
+        writer.heading(dossier["profile"].get("name") or "Athlete", size=20)
+        writer.line(f"Athlete dossier generated {dossier['generated_at']}", color="#6b7280")
+        writer.y -= writer.LINE
+        writer.rows(header_rows(dossier))
+        for section in SECTIONS:
+            if not dossier["data"][section]:
+                continue
+            rows = section_rows(section, dossier)
+            # Heading, table and chart stay on one page
+            writer.keep_together((len(rows) + 4) * writer.LINE + CHART_HEIGHT)
+            writer.heading(SECTION_TITLES[section])
+            writer.rows(rows)
+            writer.chart(lambda fig, section=section: section_figure(section, dossier, fig))
+            analysis = dossier["analyses"].get(section)
+            if analysis:
+                writer.text(analysis)
+            else:
+                writer.line("No stored AI analysis.", color="#9ca3af")
+        if "overview" in dossier["analyses"]:
+            writer.heading(SECTION_TITLES["overview"])
+            writer.text(dossier["analyses"]["overview"])
+        writer.finish()
+    return buffer.getvalue()
+
+
+# Files and squad export
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text or "athlete").strip("-").lower() or "athlete"
+
+
+def write_dossier(dossier, out_dir, formats=FORMATS):
+    """Write the dossier in each format; returns the file paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{dossier['profile'].get('id', 0)}-{_slug(dossier['profile'].get('name'))}")
+    paths = []
+    for fmt in formats:
+        path = f"{base}.{fmt}"
+        if fmt == "html":
+            with open(path, "w", encoding="utf-8") as f:
+                for chunk in html_chunks(dossier):
+                    f.write(chunk)
+        elif fmt == "pdf":
+            with open(path, "wb") as f:
+                f.write(render_pdf(dossier))
+        else:
+            raise ValueError(f"Unknown dossier format: {fmt}")
+        paths.append(path)
+    return paths
+
+
+_worker_cache = None
+
+
+def _init_worker(db_path, cache_path):
+    global _worker_cache
+    db.DB_PATH = db_path
+    _worker_cache = ResponseCache(cache_path)
+
+
+def _export_one(profile_id, out_dir, formats, model_name):
+    dossier = load_dossier(profile_id, model_name, _worker_cache)
+    return write_dossier(dossier, out_dir, formats)
+
+
+def export_squad(profile_ids, out_dir, formats=FORMATS, workers=DEFAULT_WORKERS, model_name=None):
+    """Yield (profile_id, paths, error) as each athlete's dossier is written
+
+    Each worker process renders and writes its own dossiers; only file paths
+    come back, and new athletes are submitted as others finish, so at most
+    ``2 * workers`` dossiers exist at once.
+    """
+    model_name = model_name or ai_client.default_model_name()
+    profile_ids = iter(profile_ids)
+    if workers <= 1:
+        _init_worker(db.DB_PATH, response_cache.CACHE_PATH)
+        for profile_id in profile_ids:
+            try:
+                yield profile_id, _export_one(profile_id, out_dir, formats, model_name), None
+            except Exception as e:
+                yield profile_id, [], e
+        return
+
+    # spawn rather than fork: the caller may be a threaded Streamlit or writer process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(db.DB_PATH, response_cache.CACHE_PATH)) as pool:
+        running = {}
+
+        def submit_more():
+            while len(running) < 2 * workers:
+                profile_id = next(profile_ids, None)
+                if profile_id is None:
+                    return
+                running[pool.submit(_export_one, profile_id, out_dir, formats, model_name)] = profile_id
+
+        submit_more()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                profile_id = running.pop(future)
+                error = future.exception()
+                yield profile_id, ([] if error else future.result()), error
+            submit_more()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export athlete dossiers to HTML and PDF")
+    parser.add_argument("--out", default="dossiers", help="output directory")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--sport", help="only athletes of this sport")
+    parser.add_argument("--profiles", nargs="+", type=int, help="only these profile ids")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument("--backend", choices=list(ai_client.BACKENDS),
+                        help="whose cached responses to include; defaults to AMS_AI_BACKEND")
+    parser.add_argument("--db", default=db.DB_PATH, help="SQLite database path")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    db.init_db()
+    profile_ids = args.profiles or squad_profile_ids(args.sport)
+    start = time.perf_counter()
+    written = failed = 0
+    for profile_id, paths, error in export_squad(profile_ids, args.out, args.formats, args.workers,
+                                                 ai_client.default_model_name(args.backend)):
+        if error:
+            failed += 1
+            print(f"  profile {profile_id}: {error}")
+        else:
+            written += 1
+        print(f"\r{written + failed}/{len(profile_ids)}", end="", flush=True)
+    elapsed = time.perf_counter() - start
+    print()
+    print(f"{written:,} dossiers written to {args.out}, {failed:,} failed in {elapsed:.1f}s "
+          f"({written / elapsed if elapsed else 0:.2f}/s)")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+"""Offline stand-in for ``genai.GenerativeModel``.
+
+Select it with ``AMS_AI_BACKEND=fake`` to run the app, demos or benchmarks
+without a Gemini key or network access. Responses are deterministic for a
+given prompt and are emitted word by word so streaming can be exercised.
+"""
+import hashlib
+import os
+import time
+
+FAKE_LATENCY = float(os.getenv("AMS_FAKE_LATENCY", "0.05"))
+FAKE_CHUNK_DELAY = float(os.getenv("AMS_FAKE_CHUNK_DELAY", "0.01"))
+
+
+class FakeChunk:
+    """Mimics the ``.text`` attribute of Gemini response chunks"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Drop-in replacement for ``genai.GenerativeModel`` with tunable latency"""
+
+    def __init__(self, model_name="fake-model", latency=None, chunk_delay=None, words=40):
+        self.model_name = model_name
+        self.latency = FAKE_LATENCY if latency is None else latency
+        self.chunk_delay = FAKE_CHUNK_DELAY if chunk_delay is None else chunk_delay
+        self.words = words
+        self.calls = 0
+
+    def _words(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        summary = " ".join(prompt.split())[:80]
+        words = [f"[fake:{digest[:8]}]", "Analysis", "of:", *summary.split()]
+        filler = ["Maintain", "consistent", "training,", "prioritise", "recovery", "and", "review", "progress", "weekly."]
+        while len(words) < self.words:
+            words.extend(filler)
+        return words[:self.words]
+
+    def _stream(self, words):
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeChunk(word if i == 0 else " " + word)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        words = self._words(prompt)
+        if stream:
+            return self._stream(words)
+        time.sleep(self.latency + self.chunk_delay * max(len(words) - 1, 0))
+        return FakeChunk(" ".join(words))
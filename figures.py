@@ -0,0 +1,187 @@
+"""Bounded, cached Plotly figures.
+
+Building a Plotly Express figure costs tens of milliseconds, and on every
+rerun ``st.plotly_chart`` serializes whatever it is given. ``cached_figure``
+therefore builds each figure once per distinct input across all sessions
+(keyed by the inputs' fingerprint, LRU-bounded at ``CACHE_SIZE`` entries) and
+prepares it on the way in:
+
+- ``downsample`` reduces line traces longer than ``MAX_POINTS`` with
+  Largest-Triangle-Three-Buckets, which keeps the peaks and troughs a plain
+  stride would drop, so a chart over years of history costs the same as one
+  over a month;
+- ``compact`` rounds numeric data to ``SIGNIFICANT_DIGITS`` significant
+  digits and timestamps to whole seconds, which is all a chart can show and
+  roughly halves the JSON for computed values.
+
+Cached figures are shared between sessions and must not be mutated after
+they are returned. The entry count and the serialized size of the last
+figure built are published as the ``figure_cache.entries`` and
+``figure_cache.payload_bytes`` gauges.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+from analysis_jobs import athlete_fingerprint
+
+MAX_POINTS = int(os.getenv("AMS_CHART_MAX_POINTS", "400"))
+HISTORY_ROWS = int(os.getenv("AMS_CHART_HISTORY_ROWS", "5000"))  # newest assessments a history chart reads
+CACHE_SIZE = int(os.getenv("AMS_FIGURE_CACHE_SIZE", "256"))
+SIGNIFICANT_DIGITS = 4
+
+LINE_TRACES = {"scatter", "scattergl"}
+# Per-point arrays that must stay aligned with x/y when points are dropped
+POINT_ARRAYS = ("x", "y", "customdata", "text", "hovertext")
+NUMERIC_ARRAYS = ("x", "y", "values")
+
+
+def _numeric_axis(values):
+    """x values as floats for the triangle areas: numbers, datetimes, or positions"""
+    import numpy as np
+    array = np.asarray(values)
+    if array.dtype.kind in "iuf":
+        return array.astype(float)
+    if array.dtype.kind == "M":
+        return array.astype("datetime64[ns]").astype("int64").astype(float)
+    try:
+        return np.asarray(values, dtype="datetime64[ns]").astype("int64").astype(float)
+    except (TypeError, ValueError):
+        return np.arange(len(array), dtype=float)
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps (first and last always)"""
+    import numpy as np
+    x = _numeric_axis(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets over the interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point, after the final bucket)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(fig, max_points=MAX_POINTS):
+    """Reduce every line trace longer than max_points with LTTB, in place; returns fig"""
+    import numpy as np
+    for trace in fig.data:
+        if trace.type not in LINE_TRACES or trace.y is None or len(trace.y) <= max_points:
+            continue
+        x = trace.x if trace.x is not None else np.arange(len(trace.y))
+        keep = lttb_indices(x, trace.y, max_points)
+        updates = {}
+        for key in POINT_ARRAYS:
+            values = x if key == "x" else getattr(trace, key)
+            if values is not None and not isinstance(values, str) and len(values) == len(trace.y):
+                updates[key] = np.asarray(values)[keep]
+        trace.update(updates)
+    return fig
+
+
+def _round(values, digits):
+    rounded = []
+    for v in values:
+        if isinstance(v, float) and math.isfinite(v):
+            v = float(f"{v:.{digits}g}")
+            # 39400000 rather than 39400000.0
+            v = int(v) if v.is_integer() else v
+        rounded.append(v)
+    return rounded
+
+
+def compact(fig, digits=SIGNIFICANT_DIGITS):
+    """Round float data to the given significant digits and datetimes to seconds, in place"""
+    import numpy as np
+    for trace in fig.data:
+        for key in NUMERIC_ARRAYS:
+            values = getattr(trace, key, None)
+            if values is None or isinstance(values, str):
+                continue
+            array = np.asarray(values)
+            if array.dtype.kind == "M":
+                # Second resolution: '2024-03-01T09:30:00' instead of nanosecond strings
+                trace[key] = np.datetime_as_string(array, unit="s").tolist()
+            elif array.dtype.kind == "f":
+                trace[key] = _round(array.tolist(), digits)
+            elif array.dtype.kind == "O":
+                trace[key] = _round(list(values), digits)
+    return fig
+
+
+def payload_bytes(fig):
+    """Size of the JSON st.plotly_chart sends for this figure"""
+    import plotly.io
+    return len(plotly.io.to_json(fig, validate=False))
+
+
+class FigureCache:
+    """LRU of prepared figures keyed by (chart name, input fingerprint)"""
+
+    def __init__(self, size=CACHE_SIZE, max_points=MAX_POINTS, digits=SIGNIFICANT_DIGITS):
+        self.size = size
+        self.max_points = max_points
+        self.digits = digits
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, inputs, build):
+        key = (name, athlete_fingerprint(inputs))
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+        # Built outside the lock: two sessions racing on a new key both build, one wins
+        fig = compact(downsample(build(), self.max_points), self.digits)
+        metrics.set_gauge("figure_cache.payload_bytes", payload_bytes(fig))
+        with self._lock:
+            self._figures[key] = fig
+            while len(self._figures) > self.size:
+                self._figures.popitem(last=False)
+            metrics.set_gauge("figure_cache.entries", len(self._figures))
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._figures), "hits": self.hits, "misses": self.misses}
+
+
+_cache = FigureCache()
+
+
+def cached_figure(name, inputs, build):
+    """The prepared figure for these inputs, calling build() only on a miss"""
+    return _cache.get(name, inputs, build)
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,138 @@
+"""Process-wide latency histograms for request stages.
+
+Module submit handlers time each stage (validation, DB write, score
+computation, chart build, LLM call) with a ``StageTimer``; the samples land in
+shared histograms that the Admin page reads. Gauges hold the current level of
+things like queue depths.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bucket bounds in milliseconds; the last bucket catches everything slower
+BUCKET_BOUNDS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+RESERVOIR_SIZE = 1000
+
+_lock = threading.Lock()
+_histograms = {}
+_gauges = {}
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram plus a bounded sample window for percentiles"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        for i, bound in enumerate(BUCKET_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.samples.append(ms)
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max,
+            "buckets": list(self.buckets),
+        }
+
+
+def observe(name, seconds):
+    """Record one latency sample for the named stage"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot():
+    """Copy of every histogram, keyed by stage name"""
+    with _lock:
+        return {name: histogram.snapshot() for name, histogram in sorted(_histograms.items())}
+
+
+def set_gauge(name, value):
+    """Record the current value of a level such as a queue depth"""
+    with _lock:
+        gauge = _gauges.setdefault(name, {"value": 0, "max": 0})
+        gauge["value"] = value
+        gauge["max"] = max(gauge["max"], value)
+
+
+def gauges():
+    """Current and peak value of every gauge, keyed by name"""
+    with _lock:
+        return {name: dict(gauge) for name, gauge in sorted(_gauges.items())}
+
+
+def bucket_labels():
+    labels = [f"≤{bound} ms" for bound in BUCKET_BOUNDS_MS]
+    labels.append(f">{BUCKET_BOUNDS_MS[-1]} ms")
+    return labels
+
+
+def reset(prefix=None):
+    """Drop every histogram, or only those whose name starts with prefix"""
+    with _lock:
+        for name in [name for name in _histograms if prefix is None or name.startswith(prefix)]:
+            del _histograms[name]
+        for name in [name for name in _gauges if prefix is None or name.startswith(prefix)]:
+            # Gauges describe live state; only their peaks start over
+            _gauges[name]["max"] = _gauges[name]["value"]
+
+
+class StageTimer:
+    """Times the stages of one submission and feeds the shared histograms"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.timings = []
+        self._last = time.perf_counter()
+
+    def _record(self, name, elapsed):
+        self.timings.append((name, elapsed))
+        observe(f"{self.prefix}.{name}", elapsed)
+
+    def lap(self, name):
+        """Close the stage that started at the previous lap (or creation)"""
+        now = time.perf_counter()
+        self._record(name, now - self._last)
+        self._last = now
+
+    def summary(self):
+        """One-line breakdown such as 'validation 0.1 ms · llm 812.4 ms'"""
+        return " · ".join(f"{name} {elapsed * 1000:.1f} ms" for name, elapsed in self.timings)
@@ -0,0 +1,176 @@
+"""Opt-in render profiler for app reruns.
+
+Enable with ``AMS_PROFILE=1``. Decorated functions and ``section`` blocks are
+timed into the shared histograms (as ``profiler.<name>``) and into a per-rerun
+breakdown; the slowest ``AMS_PROFILE_SLOWEST`` reruns (default 5, 0 turns it
+off) keep a cProfile report. When disabled, ``profiled`` returns the function
+unchanged and ``section``/``rerun`` return a shared no-op context manager.
+"""
+import functools
+import heapq
+import io
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import metrics
+
+ENABLED = os.getenv("AMS_PROFILE", "").lower() not in ("", "0", "false", "no")
+SLOWEST_RERUNS = int(os.getenv("AMS_PROFILE_SLOWEST", "5"))
+RECENT_RERUNS = 50
+PROFILE_LINES = 30
+PREFIX = "profiler."
+# st.rerun() and st.stop() end a script run by raising these
+OUTCOMES = {"RerunException": "rerun", "StopException": "stop"}
+
+_NULL = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_RERUNS)
+_slowest = []  # min-heap of (elapsed, sequence, RerunProfile)
+_sequence = itertools.count()
+
+
+class _Section:
+    """Times one block and adds it to the running rerun's breakdown"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        run = getattr(_local, "run", None)
+        self.entry = None
+        if run is not None:
+            self.entry = [self.name, run.depth, 0.0]
+            run.breakdown.append(self.entry)
+            run.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.entry is not None:
+            self.entry[2] = elapsed
+            _local.run.depth -= 1
+        metrics.observe(f"{PREFIX}{self.name}", elapsed)
+        return False
+
+
+def section(name):
+    """Context manager timing a block, e.g. chart construction"""
+    return _Section(name) if ENABLED else _NULL
+
+
+def profiled(name=None):
+    """Decorator timing every call of a function under ``name``"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Section(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class RerunProfile:
+    """Timing breakdown (and optional cProfile report) of one script rerun"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.elapsed = 0.0
+        self.breakdown = []  # [name, depth, seconds] in call order
+        self.depth = 0
+        self.outcome = "completed"
+        self.report = None
+
+    def summary(self):
+        return [(name, depth, seconds * 1000) for name, depth, seconds in self.breakdown]
+
+
+class _Rerun:
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.run = _local.run = RerunProfile()
+        self.profile = None
+        if SLOWEST_RERUNS > 0:
+            import cProfile
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another rerun on a different thread is already profiling (Python 3.12+)
+                self.profile = None
+        self.start = time.perf_counter()
+        return self.run
+
+    def __exit__(self, exc_type, exc, tb):
+        run = self.run
+        run.elapsed = time.perf_counter() - self.start
+        if self.profile is not None:
+            self.profile.disable()
+        if exc_type is not None:
+            run.outcome = OUTCOMES.get(exc_type.__name__, f"error: {exc_type.__name__}")
+        _local.run = None
+        metrics.observe(f"{PREFIX}rerun", run.elapsed)
+        _finish(run, self.profile)
+        if self.store is not None:
+            self.store["profiler_last_rerun"] = run
+        return False
+
+
+def _finish(run, profile):
+    with _lock:
+        _recent.append(run)
+        if profile is None:
+            return
+        entry = (run.elapsed, next(_sequence), run)
+        if len(_slowest) < SLOWEST_RERUNS:
+            heapq.heappush(_slowest, entry)
+        elif run.elapsed > _slowest[0][0]:
+            heapq.heapreplace(_slowest, entry)
+        else:
+            return
+    # Only reruns that made the slowest-N list pay for formatting the report
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    run.report = out.getvalue()
+
+
+def rerun(store=None):
+    """Wrap one script run; ``store`` (e.g. st.session_state) receives the RerunProfile"""
+    return _Rerun(store) if ENABLED else _NULL
+
+
+def recent_reruns():
+    """Most recent reruns across all sessions, oldest first"""
+    with _lock:
+        return list(_recent)
+
+
+def slowest_reruns():
+    """Slowest profiled reruns, slowest first"""
+    with _lock:
+        return [run for _, _, run in sorted(_slowest, reverse=True)]
+
+
+def function_stats():
+    """p50/p95/p99 per profiled function from the shared histograms"""
+    return {name[len(PREFIX):]: stats for name, stats in metrics.snapshot().items()
+            if name.startswith(PREFIX)}
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _slowest.clear()
+    metrics.reset(PREFIX)
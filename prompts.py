@@ -0,0 +1,210 @@
+"""Prompt builders for the AI advisors.
+
+The module pages, the dashboard and the batch report job all build prompts
+here so the same athlete data always produces the same prompt (and therefore
+the same response cache key).
+
+Athlete data is serialized compactly (``key=value`` pairs, rounded numbers,
+no zero or empty fields) instead of as Python dict reprs. Fields that can be
+derived from others are dropped, and each section is capped at
+``SECTION_TOKEN_BUDGET`` estimated tokens, keeping fields in priority order.
+Builders return a ``Prompt``: the text, plus what ``record_sent`` needs to
+account for it. ``token_stats`` reports the estimated tokens per prompt kind
+actually sent to the model (cache hits excluded) next to what the raw dict
+reprs would have cost.
+"""
+import math
+import os
+import re
+import threading
+
+SECTION_TOKEN_BUDGET = int(os.getenv("AMS_PROMPT_SECTION_TOKENS", "100"))
+
+# Fields per section in priority order; anything not listed is left out.
+# Dropped as derivable: finance savings (income - expenses), nutrition bmi
+# (weight / height²). The remaining totals stand in for the line items when
+# the budget runs out.
+SECTION_FIELDS = {
+    'performance': ['speed', 'stamina', 'strength', 'reaction_time', 'recovery_rate', 'technique',
+                    'flexibility', 'coordination', 'accuracy', 'tactical_awareness',
+                    'equipment_handling', 'focus', 'confidence', 'resilience', 'motivation',
+                    'composure'],
+    'injury': ['risk_score', 'training_intensity', 'past_injuries', 'fatigue_level', 'sleep_hours',
+               'nutrition_score', 'stress_level'],
+    'career': ['sport', 'age', 'experience', 'strengths'],
+    'nutrition': ['weight', 'height', 'age', 'activity_level', 'dietary_pref', 'allergies'],
+    'finance': ['total_income', 'total_expenses', 'savings_rate', 'salary', 'endorsements',
+                'appearances', 'other_income', 'coaching', 'equipment', 'physio', 'travel',
+                'nutrition', 'housing', 'insurance', 'transport', 'other_expenses'],
+}
+
+# Shorter keys the model reads just as well
+FIELD_LABELS = {
+    'reaction_time': 'reaction_s', 'tactical_awareness': 'tactics', 'equipment_handling': 'equipment',
+    'training_intensity': 'intensity', 'past_injuries': 'injuries', 'fatigue_level': 'fatigue',
+    'sleep_hours': 'sleep_h', 'nutrition_score': 'nutrition', 'stress_level': 'stress',
+    'risk_score': 'risk', 'experience': 'years', 'activity_level': 'activity',
+    'dietary_pref': 'diet', 'weight': 'weight_kg', 'height': 'height_cm',
+    'total_income': 'income', 'total_expenses': 'expenses', 'savings_rate': 'savings_pct',
+    'other_income': 'other_in', 'other_expenses': 'other_out',
+}
+
+SECTION_TITLES = {
+    'performance': 'Performance', 'injury': 'Injury', 'career': 'Career',
+    'nutrition': 'Nutrition', 'finance': 'Finance (monthly ₹)',
+}
+
+# Sections where a zero means "no such item" and is left out
+ZERO_OMITTED = {'finance'}
+
+# Repeated in more than one section of the dashboard prompt; kept once
+DASHBOARD_DUPLICATES = {'nutrition': ('age',)}
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def count_tokens(text):
+    """Estimated token count: one per punctuation mark, one per four word characters"""
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN.findall(text))
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.3g}" if abs(value) < 100 else str(round(value))
+    return " ".join(str(value).split())
+
+
+def compact_section(section, data, budget=SECTION_TOKEN_BUDGET, skip=()):
+    """'key=value, …' for the section's fields, in priority order, within budget tokens"""
+    parts = []
+    used = 0
+    for field in SECTION_FIELDS[section]:
+        value = data.get(field)
+        if field in skip or value is None or value == "" or (value == 0 and section in ZERO_OMITTED):
+            continue
+        part = f"{FIELD_LABELS.get(field, field)}={_format_value(value)}"
+        cost = count_tokens(part) + 1
+        if used + cost > budget:
+            if isinstance(value, str):
+                # Free text (strengths, allergies) is trimmed to the remaining budget
+                words = part.split(" ")
+                while len(words) > 1 and count_tokens(" ".join(words)) + 2 > budget - used:
+                    words.pop()
+                if len(words) > 1:
+                    parts.append(" ".join(words) + "…")
+            break
+        parts.append(part)
+        used += cost
+    return ", ".join(parts)
+
+
+class Prompt(str):
+    """Prompt text that remembers its kind and (data, compact body) sections"""
+
+    def __new__(cls, text, kind="other", sections=()):
+        prompt = super().__new__(cls, text)
+        prompt.kind = kind
+        prompt.sections = sections
+        return prompt
+
+
+def record_sent(prompt):
+    """Track estimated tokens of a prompt about to be sent to the model"""
+    kind = getattr(prompt, "kind", "other")
+    sections = getattr(prompt, "sections", ())
+    with _stats_lock:
+        entry = _stats.setdefault(kind, {"prompts": 0, "tokens": 0, "data_tokens": 0,
+                                         "raw_data_tokens": 0})
+        entry["prompts"] += 1
+        entry["tokens"] += count_tokens(prompt)
+        entry["data_tokens"] += sum(count_tokens(body) for _, body in sections)
+        entry["raw_data_tokens"] += sum(count_tokens(repr(data)) for data, _ in sections)
+
+
+def token_stats():
+    """Mean estimated tokens per sent prompt kind, and of the serialized athlete data before/after"""
+    with _stats_lock:
+        return {kind: {"prompts": entry["prompts"],
+                       "mean_tokens": entry["tokens"] / entry["prompts"],
+                       "mean_data_tokens": entry["data_tokens"] / entry["prompts"],
+                       "mean_raw_data_tokens": entry["raw_data_tokens"] / entry["prompts"]}
+                for kind, entry in sorted(_stats.items())}
+
+
+def reset_token_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def performance_prompt(name, data):
+    body = compact_section('performance', data)
+    prompt = (f"Analyze the performance of athlete {name}.\n"
+              f"{body}\n"
+              "Give strengths, weaknesses and training priorities.")
+    return Prompt(prompt, 'performance', [(data, body)])
+
+
+def injury_prompt(name, data):
+    body = compact_section('injury', data)
+    prompt = (f"Injury risk analysis for {name} (scales 1-10).\n"
+              f"{body}\n"
+              "Explain the main risk drivers and prevention steps.")
+    return Prompt(prompt, 'injury', [(data, body)])
+
+
+def career_prompt(name, data):
+    body = compact_section('career', data)
+    prompt = f"Career plan for athlete {name}.\n{body}"
+    return Prompt(prompt, 'career', [(data, body)])
+
+
+def nutrition_prompt(name, data):
+    body = compact_section('nutrition', data)
+    prompt = (f"Personalized meal plan for {name}.\n"
+              f"{body}\n"
+              "Include: 1. daily macronutrients 2. 3-day sample meal plan 3. hydration "
+              "4. pre/post-workout nutrition.")
+    return Prompt(prompt, 'nutrition', [(data, body)])
+
+
+def finance_prompt(name, data):
+    body = compact_section('finance', data)
+    prompt = (f"Financial management plan for professional athlete {name}.\n"
+              f"{SECTION_TITLES['finance']}: {body}\n"
+              "Cover: 1. athlete-specific expenses (training, equipment, coaching) 2. sponsorship "
+              "and endorsements 3. savings and investment 4. competition vs off-season budgets "
+              "5. retirement. Be concrete and actionable.")
+    return Prompt(prompt, 'finance', [(data, body)])
+
+
+def dashboard_prompt(athlete_data):
+    lines = ["Analyze this athlete's complete profile."]
+    sections = []
+    for section in SECTION_FIELDS:
+        data = athlete_data.get(section) or {}
+        body = compact_section(section, data, skip=DASHBOARD_DUPLICATES.get(section, ()))
+        sections.append((data, body))
+        if body:
+            lines.append(f"{SECTION_TITLES[section]}: {body}")
+    lines.append("Provide: 1. three key strengths 2. three areas for improvement 3. training "
+                 "adjustments 4. nutrition and recovery 5. financial optimization.")
+    return Prompt("\n".join(lines), 'dashboard', sections)
+
+
+MODULE_PROMPTS = {
+    'performance': performance_prompt,
+    'injury': injury_prompt,
+    'career': career_prompt,
+    'nutrition': nutrition_prompt,
+    'finance': finance_prompt,
+}
+
+
+def module_prompt(module, name, data):
+    return MODULE_PROMPTS[module](name, data)
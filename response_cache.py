@@ -0,0 +1,115 @@
+"""Persistent cache for Gemini responses.
+
+Entries are keyed by a SHA-256 of the model name plus the prompt and stored in
+a small SQLite file next to ``athlete_profiles.db``. Entries older than the TTL
+are treated as misses, and the least recently used rows are evicted once the
+cache grows past ``max_entries``.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv("AMS_AI_CACHE_PATH", "ai_response_cache.db")
+CACHE_TTL_SECONDS = int(os.getenv("AMS_AI_CACHE_TTL", 24 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.getenv("AMS_AI_CACHE_MAX_ENTRIES", 1000))
+
+
+def cache_key(model_name, prompt):
+    """Content address for a (model, prompt) pair"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite backed response cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Every hit commits its last_access update: WAL without a sync per commit keeps that cheap
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS responses
+                              (key TEXT PRIMARY KEY,
+                               model TEXT,
+                               response TEXT,
+                               created_at REAL,
+                               last_access REAL)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+        self._conn.commit()
+
+    def get(self, model_name, prompt):
+        """Return the cached response or None on a miss"""
+        key = cache_key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT response, created_at FROM responses WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def peek(self, model_name, prompt):
+        """Like get, but leaves the hit/miss counters, recency and expired rows untouched"""
+        key = cache_key(model_name, prompt)
+        with self._lock:
+            row = self._conn.execute('SELECT response, created_at FROM responses WHERE key = ?',
+                                     (key,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def set(self, model_name, prompt, response):
+        """Store a response and evict the least recently used overflow"""
+        key = cache_key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''INSERT OR REPLACE INTO responses
+                                  (key, model, response, created_at, last_access)
+                                  VALUES (?, ?, ?, ?, ?)''',
+                               (key, model_name, response, now, now))
+            overflow = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute('''DELETE FROM responses WHERE key IN
+                                      (SELECT key FROM responses ORDER BY last_access LIMIT ?)''',
+                                   (overflow,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,133 @@
+"""Injury risk, recovery, BMI and finance scoring.
+
+The injury, BMI and savings formulas work unchanged on scalars, NumPy arrays
+and pandas Series, so the forms, the dashboard, the team risk board and the
+bulk importer share one definition. ``score_roster`` scores a whole roster
+DataFrame in a single vectorized pass. ``derived_fields`` computes what the
+module forms compute rather than ask for, for writers other than the forms
+(the HTTP API with a dict, ``bulk_import`` with a DataFrame chunk).
+NumPy and pandas are only imported by the vectorized helpers, so the scalar
+formulas stay cheap to import on the app's startup path.
+"""
+RISK_INPUTS = ['training_intensity', 'past_injuries', 'sleep_hours', 'nutrition_score']
+HIGH_RISK_THRESHOLD = 6
+MEDIUM_RISK_THRESHOLD = 3
+
+INCOME_FIELDS = ['salary', 'endorsements', 'appearances', 'other_income']
+EXPENSE_FIELDS = ['coaching', 'equipment', 'physio', 'travel', 'nutrition', 'housing', 'insurance',
+                  'transport', 'other_expenses']
+
+
+def injury_risk_score(training_intensity, past_injuries, sleep_hours, nutrition_score):
+    """Weighted injury risk; higher is riskier"""
+    return ((training_intensity * 0.4) + (past_injuries * 0.3)
+            - (sleep_hours * 0.2) - (nutrition_score * 0.1))
+
+
+def recovery_score(sleep_hours, nutrition_score):
+    """Recovery out of 100 from sleep (8h target) and nutrition (out of 10)"""
+    return sleep_hours / 8 * 40 + nutrition_score / 10 * 60
+
+
+def risk_level(risk_score):
+    if risk_score > HIGH_RISK_THRESHOLD:
+        return 'High'
+    if risk_score > MEDIUM_RISK_THRESHOLD:
+        return 'Medium'
+    return 'Low'
+
+
+def risk_levels(risk_scores):
+    """Vectorized risk_level for an array or Series of scores"""
+    import numpy as np
+    scores = np.asarray(risk_scores, dtype=float)
+    return np.select([scores > HIGH_RISK_THRESHOLD, scores > MEDIUM_RISK_THRESHOLD],
+                     ['High', 'Medium'], default='Low')
+
+
+def score_roster(roster):
+    """Score every athlete in one pass and rank them from highest to lowest risk
+
+    ``roster`` needs the four risk inputs as columns; missing values count as 0,
+    matching the dashboard's ``.get(..., 0)`` behaviour.
+    """
+    import numpy as np
+    import pandas as pd
+
+    inputs = {column: roster[column].fillna(0).to_numpy(dtype=float) for column in RISK_INPUTS}
+    risk = injury_risk_score(**inputs)
+    recovery = recovery_score(inputs['sleep_hours'], inputs['nutrition_score'])
+
+    scored = roster.copy()
+    scored['risk_score'] = risk
+    scored['recovery_score'] = recovery
+    scored['risk_level'] = pd.Categorical(risk_levels(risk), categories=['High', 'Medium', 'Low'],
+                                          ordered=True)
+    order = np.argsort(-risk, kind='stable')
+    return scored.iloc[order].reset_index(drop=True)
+
+
+def injury_scores(injury_data):
+    """(injury risk score, recovery score) for an injury assessment dict; missing inputs count as 0"""
+    risk = injury_risk_score(
+        injury_data.get('training_intensity', 0),
+        injury_data.get('past_injuries', 0),
+        injury_data.get('sleep_hours', 0),
+        injury_data.get('nutrition_score', 0)
+    )
+    recovery = recovery_score(injury_data.get('sleep_hours', 0), injury_data.get('nutrition_score', 0))
+    return risk, recovery
+
+
+def bmi(height_cm, weight_kg):
+    """Unrounded BMI"""
+    return weight_kg / ((height_cm / 100) ** 2)
+
+
+def calculate_bmi(height_cm, weight_kg):
+    """BMI rounded to one decimal, or "--" when height or weight is missing"""
+    if height_cm <= 0 or weight_kg <= 0:
+        return "--"
+    return round(bmi(height_cm, weight_kg), 1)
+
+
+def savings_rate(total_income, total_expenses):
+    """Savings as a percentage of income, 0 without income"""
+    if hasattr(total_income, 'where'):
+        # pandas Series: mask the rows without income instead of branching
+        return ((total_income - total_expenses) / total_income * 100).where(total_income > 0, 0)
+    return (total_income - total_expenses) / total_income * 100 if total_income > 0 else 0
+
+
+def finance_totals(finance_data):
+    """(total income, total expenses, savings rate %) from the monthly finance figures"""
+    total_income = sum(finance_data.get(k, 0) for k in INCOME_FIELDS)
+    total_expenses = sum(finance_data.get(k, 0) for k in EXPENSE_FIELDS)
+    return total_income, total_expenses, savings_rate(total_income, total_expenses)
+
+
+def financial_health(savings_rate):
+    if savings_rate > 30:
+        return 'Excellent'
+    if savings_rate > 15:
+        return 'Good'
+    return 'Needs Improvement'
+
+
+def derived_fields(module, data):
+    """The stored fields a module form computes from its inputs (empty for modules without any)
+
+    ``data`` is one assessment dict or a DataFrame of them; for a DataFrame the
+    values are Series.
+    """
+    if module == 'injury':
+        return {'risk_score': injury_risk_score(data['training_intensity'], data['past_injuries'],
+                                                data['sleep_hours'], data['nutrition_score'])}
+    if module == 'nutrition':
+        # Unrounded, as the nutrition form stores it
+        return {'bmi': bmi(data['height'], data['weight'])}
+    if module == 'finance':
+        total_income, total_expenses, savings_rate = finance_totals(data)
+        return {'total_income': total_income, 'total_expenses': total_expenses,
+                'savings': total_income - total_expenses, 'savings_rate': savings_rate}
+    return {}
@@ -0,0 +1,239 @@
+"""Session state that outlives one Streamlit server process.
+
+The cross-page keys in ``PERSISTED_KEYS`` (the athlete being worked on, its
+module data and the open module page) are serialized to JSON and saved to a
+store under a random session id carried in the page URL (``?sid=``). A
+browser that reconnects to another replica, or to the same one after a
+restart, loads its state back on the first run, so replicas need no sticky
+sessions.
+
+Stores implement ``load(session_id)``, ``save(session_id, payload)``,
+``delete(session_id)`` and ``purge()``; pick one with ``AMS_SESSION_STORE``:
+
+- ``memory``: per-process dict; survives page reloads, not restarts
+- ``sqlite``: the ``session_state`` table in the shared profiles database
+- ``file``: one JSON file per session under ``AMS_SESSION_DIR``, replaced atomically
+
+Add another with ``register_store``. Sessions idle longer than
+``AMS_SESSION_TTL`` seconds load as empty and are removed by ``purge``.
+
+    python session_store.py purge
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+import db
+
+STORE = os.getenv("AMS_SESSION_STORE", "memory")
+SESSION_DIR = os.getenv("AMS_SESSION_DIR", "sessions")
+SESSION_TTL_SECONDS = int(os.getenv("AMS_SESSION_TTL", 7 * 24 * 60 * 60))
+FORMAT_VERSION = 1
+
+PERSISTED_KEYS = ('athlete_data', 'current_profile', 'current_module')
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+CREATE_SESSIONS = '''CREATE TABLE IF NOT EXISTS session_state
+                     (session_id TEXT PRIMARY KEY,
+                      payload TEXT NOT NULL,
+                      updated_at REAL NOT NULL)'''
+
+CREATE_SESSIONS_INDEX = '''CREATE INDEX IF NOT EXISTS idx_session_state_updated_at
+                           ON session_state (updated_at)'''
+
+
+def new_session_id():
+    return secrets.token_hex(16)
+
+
+def valid_session_id(session_id):
+    """Ids come from URLs: only our own 32-hex-digit format is accepted (also keeps file paths safe)"""
+    return isinstance(session_id, str) and bool(_SESSION_ID.match(session_id))
+
+
+def _default(value):
+    # NumPy scalars (scores computed with pandas) and dates are the only non-JSON values in athlete_data
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot store {type(value).__name__} in session state")
+
+
+def serialize(state):
+    """JSON payload for the persisted keys present in state (a dict or st.session_state)"""
+    values = {key: state[key] for key in PERSISTED_KEYS if key in state}
+    return json.dumps({"version": FORMAT_VERSION, "state": values}, default=_default, sort_keys=True,
+                      separators=(",", ":"))
+
+
+def deserialize(payload):
+    """The persisted keys from a payload; {} for an unknown format version"""
+    document = json.loads(payload)
+    if document.get("version") != FORMAT_VERSION:
+        return {}
+    return {key: value for key, value in document["state"].items() if key in PERSISTED_KEYS}
+
+
+def _expired(updated_at, ttl):
+    return bool(ttl) and time.time() - updated_at > ttl
+
+
+class MemoryStore:
+    """Per-process store; payloads are kept serialized so sessions never share objects"""
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is None or _expired(entry[1], self.ttl):
+            return None
+        return entry[0]
+
+    def save(self, session_id, payload):
+        with self._lock:
+            self._sessions[session_id] = (payload, time.time())
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge(self):
+        with self._lock:
+            expired = [sid for sid, (_, updated_at) in self._sessions.items() if _expired(updated_at, self.ttl)]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+
+class SQLiteStore:
+    """Rows in the profiles database, so every replica pointed at it shares sessions"""
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        db.init_db()
+
+    def load(self, session_id):
+        with db.connection() as conn:
+            row = conn.execute('SELECT payload, updated_at FROM session_state WHERE session_id = ?',
+                               (session_id,)).fetchone()
+        if row is None or _expired(row['updated_at'], self.ttl):
+            return None
+        return row['payload']
+
+    def save(self, session_id, payload):
+        with db.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO session_state (session_id, payload, updated_at) VALUES (?, ?, ?)',
+                         (session_id, payload, time.time()))
+
+    def delete(self, session_id):
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM session_state WHERE session_id = ?', (session_id,))
+
+    def purge(self):
+        if not self.ttl:
+            return 0
+        with db.transaction() as conn:
+            return conn.execute('DELETE FROM session_state WHERE updated_at < ?',
+                                (time.time() - self.ttl,)).rowcount
+
+
+class FileStore:
+    """One JSON file per session; writes go to a temp file and are renamed into place"""
+
+    def __init__(self, directory=SESSION_DIR, ttl=SESSION_TTL_SECONDS):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id):
+        path = self._path(session_id)
+        try:
+            if _expired(os.path.getmtime(path), self.ttl):
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id, payload):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".session-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            # Atomic on POSIX and Windows: readers see the old file or the new one, never a torn write
+            os.replace(temp_path, self._path(session_id))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def purge(self):
+        removed = 0
+        for path in glob.glob(os.path.join(glob.escape(self.directory), "*.json")):
+            try:
+                if _expired(os.path.getmtime(path), self.ttl):
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+STORES = {
+    "memory": MemoryStore,
+    "sqlite": SQLiteStore,
+    "file": FileStore,
+}
+
+
+def register_store(name, factory):
+    """Make ``AMS_SESSION_STORE=name`` build its store with ``factory()``"""
+    STORES[name] = factory
+
+
+def create_store(name=None):
+    name = name or STORE
+    if name not in STORES:
+        raise ValueError(f"Unknown session store '{name}'; expected one of {', '.join(STORES)}")
+    return STORES[name]()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain saved session state")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument("--store", choices=list(STORES), default=STORE)
+    args = parser.parse_args(argv)
+
+    removed = create_store(args.store).purge()
+    print(f"{removed:,} expired sessions removed")
+    return 0
+
+
+db.register_schema(CREATE_SESSIONS, CREATE_SESSIONS_INDEX)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
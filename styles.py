@@ -0,0 +1,42 @@
+"""Application stylesheet.
+
+All custom CSS lives in styles.css and is injected as a single ``<style>``
+element at the top of every rerun. The element is built once per process and
+is identical on every rerun, so Streamlit's forward-message cache sends its
+body to a browser session once and afterwards only a hash reference (see
+``minCachedMessageSize`` in .streamlit/config.toml).
+"""
+import os
+import re
+
+import streamlit as st
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles.css")
+ACCENTS = ("blue", "green", "amber", "red")
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return re.sub(r":\s+", ":", css).replace(";}", "}").strip()
+
+
+@st.cache_resource
+def stylesheet():
+    """The minified stylesheet wrapped in a <style> tag, read once per process"""
+    with open(STYLESHEET_PATH, encoding="utf-8") as f:
+        return f"<style>{minify_css(f.read())}</style>"
+
+
+def inject():
+    st.markdown(stylesheet(), unsafe_allow_html=True)
+
+
+def metric_card(accent):
+    """Container drawn as a white metric card with a coloured left border"""
+    if accent not in ACCENTS:
+        raise ValueError(f"accent must be one of {', '.join(ACCENTS)}")
+    container = st.container()
+    container.markdown(f'<span class="metric-card accent-{accent}"></span>', unsafe_allow_html=True)
+    return container
@@ -0,0 +1,150 @@
+"""Trend engine over persisted assessment history.
+
+Per (profile, module, metric) aggregates are updated inside the same
+transaction that appends an assessment, so reading an athlete's deltas,
+percent change and rolling mean is a single primary-key lookup no matter how
+long their history is. Inserts stay O(window): the only history read is the
+one row that falls out of the rolling window.
+"""
+import db
+
+ROLLING_WINDOW = 5
+
+CREATE_AGGREGATES = '''CREATE TABLE IF NOT EXISTS assessment_aggregates
+                       (profile_id INTEGER NOT NULL,
+                        module TEXT NOT NULL,
+                        metric TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        total REAL NOT NULL,
+                        last_value REAL,
+                        previous_value REAL,
+                        window_total REAL NOT NULL,
+                        window_count INTEGER NOT NULL,
+                        last_recorded_at TEXT,
+                        PRIMARY KEY (profile_id, module, metric)) WITHOUT ROWID'''
+
+SELECT_AGGREGATES = '''SELECT metric, count, total, last_value, previous_value,
+                              window_total, window_count, last_recorded_at
+                       FROM assessment_aggregates WHERE profile_id = ? AND module = ?'''
+
+UPSERT_AGGREGATE = '''INSERT OR REPLACE INTO assessment_aggregates
+                      (profile_id, module, metric, count, total, last_value, previous_value,
+                       window_total, window_count, last_recorded_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+def _empty(metric):
+    return {'metric': metric, 'count': 0, 'total': 0.0, 'last_value': None, 'previous_value': None,
+            'window_total': 0.0, 'window_count': 0, 'last_recorded_at': None}
+
+
+def _read(conn, profile_id, module):
+    return {row['metric']: dict(row) for row in conn.execute(SELECT_AGGREGATES, (profile_id, module))}
+
+
+def _write(conn, profile_id, module, agg):
+    conn.execute(UPSERT_AGGREGATE, (profile_id, module, agg['metric'], agg['count'], agg['total'],
+                                    agg['last_value'], agg['previous_value'], agg['window_total'],
+                                    agg['window_count'], agg['last_recorded_at']))
+
+
+def _apply(agg, value, recorded_at):
+    agg['count'] += 1
+    agg['total'] += value
+    agg['previous_value'] = agg['last_value']
+    agg['last_value'] = value
+    agg['window_total'] += value
+    agg['window_count'] += 1
+    agg['last_recorded_at'] = recorded_at
+
+
+def update_aggregates(conn, module, entries):
+    """Assessment hook: fold newly inserted rows into each athlete's aggregates"""
+    by_profile = {}
+    for profile_id, data, recorded_at in entries:
+        by_profile.setdefault(profile_id, []).append((data, recorded_at))
+    for profile_id, rows in by_profile.items():
+        in_order = all(a[1] <= b[1] for a, b in zip(rows, rows[1:]))
+        if len(rows) > ROLLING_WINDOW or not in_order:
+            # Bulk loads: one rebuild is cheaper than replaying the window per row
+            rebuild_aggregates(conn, module, profile_id)
+            continue
+        for index, (data, recorded_at) in enumerate(rows):
+            # Rows later in the same batch are already in the table and sit ahead of this one
+            if not _update_one(conn, module, profile_id, data, recorded_at, len(rows) - 1 - index):
+                break
+
+
+def _update_one(conn, module, profile_id, data, recorded_at, newer_rows=0):
+    """Fold one row in; returns False if the athlete had to be rebuilt instead"""
+    existing = _read(conn, profile_id, module)
+    if any(agg['last_recorded_at'] and recorded_at < agg['last_recorded_at'] for agg in existing.values()):
+        # Backdated rows change the ordering; rebuild this athlete only
+        rebuild_aggregates(conn, module, profile_id)
+        return False
+
+    # The row pushed out of the rolling window by this insert
+    dropped = conn.execute(f'''SELECT * FROM {db.assessment_table(module)} WHERE profile_id = ?
+                               ORDER BY recorded_at DESC, id DESC LIMIT 1 OFFSET ?''',
+                           (profile_id, ROLLING_WINDOW + newer_rows)).fetchone()
+
+    for metric in db.numeric_columns(module):
+        value = data.get(metric)
+        if value is None and metric not in existing:
+            continue
+        agg = existing.get(metric) or _empty(metric)
+        if dropped is not None and dropped[metric] is not None and agg['window_count']:
+            agg['window_total'] -= dropped[metric]
+            agg['window_count'] -= 1
+        if value is not None:
+            _apply(agg, float(value), recorded_at)
+        _write(conn, profile_id, module, agg)
+    return True
+
+
+def rebuild_aggregates(conn, module, profile_id):
+    """Recompute one athlete's aggregates from the full history"""
+    conn.execute('DELETE FROM assessment_aggregates WHERE profile_id = ? AND module = ?',
+                 (profile_id, module))
+    metrics = db.numeric_columns(module)
+    rows = conn.execute(f'''SELECT * FROM {db.assessment_table(module)} WHERE profile_id = ?
+                            ORDER BY recorded_at, id''', (profile_id,)).fetchall()
+    window_start = max(0, len(rows) - ROLLING_WINDOW)
+    aggregates = {}
+    for index, row in enumerate(rows):
+        for metric in metrics:
+            if row[metric] is None:
+                continue
+            agg = aggregates.setdefault(metric, _empty(metric))
+            _apply(agg, float(row[metric]), row['recorded_at'])
+            if index < window_start:
+                agg['window_total'] -= row[metric]
+                agg['window_count'] -= 1
+    for agg in aggregates.values():
+        _write(conn, profile_id, module, agg)
+
+
+def get_trends(profile_id, module):
+    """Latest value, delta, percent change and means for each metric"""
+    with db.connection() as conn:
+        aggregates = _read(conn, profile_id, module)
+    trends = {}
+    for metric, agg in aggregates.items():
+        current = agg['last_value']
+        previous = agg['previous_value']
+        delta = current - previous if previous is not None else None
+        trends[metric] = {
+            'current': current,
+            'previous': previous,
+            'delta': delta,
+            'pct_change': delta / previous * 100 if delta is not None and previous else None,
+            'rolling_mean': agg['window_total'] / agg['window_count'] if agg['window_count'] else None,
+            'mean': agg['total'] / agg['count'] if agg['count'] else None,
+            'count': agg['count'],
+            'last_recorded_at': agg['last_recorded_at'],
+        }
+    return trends
+
+
+db.register_schema(CREATE_AGGREGATES)
+db.register_assessment_hook(update_aggregates)
@@ -0,0 +1,165 @@
+"""Input rules shared by the forms, the bulk importer and the HTTP API.
+
+Ranges mirror the widgets in app.py so a row accepted by ``bulk_import`` or
+``api`` is one a coach could have entered by hand. The rules are plain data so
+the profile form can use them without importing pandas; ``validate_frame``
+checks a DataFrame chunk at once, ``validate_record`` a single JSON object.
+"""
+import math
+
+GENDERS = ["Male", "Female"]
+
+PROFILE_RULES = {
+    'name': {'required': True},
+    'sport': {'required': True},
+    'age': {'min': 12, 'max': 60, 'integer': True},
+    'height': {'min': 140, 'max': 220},
+    'weight': {'min': 40, 'max': 150},
+    'gender': {'choices': GENDERS},
+}
+
+_SCALE = {'min': 1, 'max': 10}
+
+ASSESSMENT_RULES = {
+    'performance': {
+        'speed': {'min': 5, 'max': 40},
+        'stamina': {'min': 10, 'max': 180},
+        'strength': {'min': 0, 'max': 200},
+        'reaction_time': {'min': 0.1, 'max': 2.0},
+        **{name: _SCALE for name in [
+            'flexibility', 'recovery_rate', 'technique', 'coordination', 'accuracy',
+            'tactical_awareness', 'equipment_handling', 'focus', 'confidence', 'resilience',
+            'motivation', 'composure']},
+    },
+    'injury': {
+        'training_intensity': _SCALE,
+        'past_injuries': {'min': 0, 'max': 20, 'integer': True},
+        'fatigue_level': _SCALE,
+        'sleep_hours': {'min': 0, 'max': 12},
+        'nutrition_score': _SCALE,
+        'stress_level': _SCALE,
+    },
+    'career': {
+        'age': {'min': 15, 'max': 45, 'integer': True},
+        'sport': {'required': True},
+        'experience': {'min': 0, 'max': 30, 'integer': True},
+        'strengths': {},
+    },
+    'nutrition': {
+        'weight': {'min': 40, 'max': 150},
+        'height': {'min': 140, 'max': 220},
+        'age': {'min': 15, 'max': 50, 'integer': True},
+        'activity_level': {'choices': ["Sedentary", "Lightly Active", "Moderately Active",
+                                       "Very Active", "Extremely Active"]},
+        'dietary_pref': {'choices': ["No Restrictions", "Vegetarian", "Vegan", "Gluten-Free",
+                                     "Dairy-Free"]},
+        'allergies': {},
+    },
+    'finance': {
+        name: {'min': 0} for name in [
+            'salary', 'endorsements', 'appearances', 'other_income', 'coaching', 'equipment',
+            'physio', 'travel', 'nutrition', 'housing', 'insurance', 'transport', 'other_expenses']
+    },
+}
+
+
+def _is_blank(series):
+    return series.isna() | series.astype(str).str.strip().eq("")
+
+
+def validate_frame(df, rules):
+    """Split a chunk into (valid rows, rejection reasons per invalid row index)
+
+    Numeric columns are coerced in the returned frame; every broken rule for a
+    row is reported, separated by "; ".
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = df.copy()
+    reasons = pd.Series("", index=df.index, dtype=object)
+
+    def reject(mask, message):
+        if not mask.any():
+            return
+        reasons.loc[mask] = reasons.loc[mask] + np.where(reasons.loc[mask] == "", "", "; ") + message.loc[mask]
+
+    for column, rule in rules.items():
+        if column not in df.columns:
+            if rule.get('required') or 'min' in rule or 'choices' in rule:
+                reject(pd.Series(True, index=df.index), pd.Series(f"missing column '{column}'", index=df.index))
+            else:
+                df[column] = None
+            continue
+        values = df[column]
+        if 'min' in rule or 'max' in rule:
+            numbers = pd.to_numeric(values, errors='coerce')
+            not_number = numbers.isna()
+            reject(not_number, values.astype(str).radd(f"{column} is not a number: "))
+            bad = pd.Series(False, index=df.index)
+            if 'min' in rule:
+                bad |= numbers < rule['min']
+            if 'max' in rule:
+                bad |= numbers > rule['max']
+            bounds = f"{rule.get('min', '-inf')}–{rule.get('max', 'inf')}"
+            reject(bad & ~not_number, numbers.astype(str).radd(f"{column} ").add(f" outside {bounds}"))
+            if rule.get('integer'):
+                reject(~not_number & (numbers % 1 != 0), pd.Series(f"{column} must be a whole number", index=df.index))
+            df[column] = numbers
+        elif 'choices' in rule:
+            reject(~values.isin(rule['choices']),
+                   values.astype(str).radd(f"{column} must be one of {', '.join(rule['choices'])}, got "))
+        elif rule.get('required'):
+            reject(_is_blank(values), pd.Series(f"{column} is required", index=df.index))
+
+    invalid = reasons != ""
+    return df[~invalid], reasons[invalid]
+
+
+def _number(value):
+    """value as a float, or None when it is not a finite number (booleans are not numbers)"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def validate_record(record, rules):
+    """Check one dict against rules; returns (coerced values, list of reasons)
+
+    Applies the same rules and messages as ``validate_frame`` without pandas.
+    Fields without a rule are dropped; whole-number fields come back as ints.
+    """
+    values = {}
+    reasons = []
+    for field, rule in rules.items():
+        value = record.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if rule.get('required') or 'min' in rule or 'choices' in rule:
+                reasons.append(f"{field} is required")
+            else:
+                values[field] = None
+            continue
+        if 'min' in rule or 'max' in rule:
+            number = _number(value)
+            if number is None:
+                reasons.append(f"{field} is not a number: {value}")
+                continue
+            if number < rule.get('min', -math.inf) or number > rule.get('max', math.inf):
+                bounds = f"{rule.get('min', '-inf')}–{rule.get('max', 'inf')}"
+                reasons.append(f"{field} {number:g} outside {bounds}")
+            if rule.get('integer'):
+                if number % 1:
+                    reasons.append(f"{field} must be a whole number")
+                number = int(number)
+            values[field] = number
+        elif 'choices' in rule:
+            if value not in rule['choices']:
+                reasons.append(f"{field} must be one of {', '.join(rule['choices'])}, got {value}")
+            values[field] = value
+        else:
+            values[field] = str(value).strip()
+    return values, reasons
@@ -0,0 +1,423 @@
+"""Write-behind queue for profile and assessment writes.
+
+Script threads append each write to a journal file and hand it to a single
+writer thread, which commits everything queued in one transaction (up to
+``BATCH_SIZE`` writes; writes arriving during a commit form the next batch). A submit therefore costs a file append instead of waiting for
+SQLite's write lock; callers that need the result (a new profile id) or must
+read their own write wait on the returned ``PendingWrite``.
+
+Crash safety: the journal is flushed (and fsynced unless
+``AMS_WRITE_BEHIND_FSYNC=0``) before a write is acknowledged, and each batch
+records the last journal sequence it applied in ``write_behind_journals``
+inside the same transaction. On startup, journals left by processes that
+died are replayed from that point, so every acknowledged write lands exactly
+once. A batch that hits a busy or locked database is retried with backoff
+until it commits; only writes that can never succeed (constraint violations,
+bad payloads) are failed and skipped. Any other error leaves the queue
+unhealthy (see ``stats``) while the writer keeps retrying what is left of the
+batch, and ``submit`` raises once the writer thread is gone. ``close``
+(registered with atexit) drains the queue on shutdown.
+
+Queue depth is published as the ``write_behind.depth`` gauge; commit latency
+and enqueue-to-commit lag as the ``write_behind.commit`` and
+``write_behind.lag`` histograms.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import db
+import metrics
+
+ENABLED = os.getenv("AMS_WRITE_BEHIND", "1").lower() not in ("0", "false", "no")
+FSYNC = os.getenv("AMS_WRITE_BEHIND_FSYNC", "1").lower() not in ("0", "false", "no")
+BATCH_SIZE = 200
+BATCH_DELAY_SECONDS = 0.0  # extra wait for stragglers before committing a batch
+WAIT_TIMEOUT_SECONDS = 10.0
+RETRY_DELAY_SECONDS = 0.05
+MAX_RETRY_DELAY_SECONDS = 2.0
+
+# Errors that would fail again on every retry: the write is reported failed and skipped
+PERMANENT_ERRORS = (sqlite3.IntegrityError, ValueError)
+
+CREATE_JOURNALS = '''CREATE TABLE IF NOT EXISTS write_behind_journals
+                     (journal TEXT PRIMARY KEY,
+                      last_seq INTEGER NOT NULL)'''
+
+UPSERT_JOURNAL = '''INSERT OR REPLACE INTO write_behind_journals (journal, last_seq) VALUES (?, ?)'''
+
+try:
+    import fcntl
+except ImportError:  # Windows: one journal per database, no cross-process recovery
+    fcntl = None
+
+
+def journal_base():
+    return os.getenv("AMS_WRITE_BEHIND_JOURNAL", f"{db.DB_PATH}.journal")
+
+
+def _try_lock(f):
+    """Exclusive advisory lock; True when we hold it (always without fcntl)"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _is_busy(error):
+    """A transient lock conflict with another connection or process"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def _same_file(f, path):
+    """Whether path still names the open file f (recover() removes journals it replayed)"""
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+class PendingWrite:
+    """Handle for one queued write; result() waits for its commit"""
+
+    def __init__(self, seq, op, payload):
+        self.seq = seq
+        self.op = op
+        self.payload = payload
+        self.enqueued_at = time.perf_counter()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def _finish(self, result=None, error=None):
+        self._result = result
+        self._error = error
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=WAIT_TIMEOUT_SECONDS):
+        return self._done.wait(timeout)
+
+    def error(self):
+        return self._error
+
+    def result(self, timeout=WAIT_TIMEOUT_SECONDS):
+        """The new row id; raises the write's error, or TimeoutError if it has not committed"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.op} write not committed within {timeout:.0f}s")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _apply(conn, op, payload):
+    if op == "profile":
+        return db.add_profile(conn, *payload["profile"])
+    if op == "assessment":
+        db.insert_assessments(conn, payload["module"],
+                              [(payload["profile_id"], payload["data"], payload["recorded_at"])])
+        return None
+    raise ValueError(f"Unknown write-behind operation: {op}")
+
+
+def _apply_batch(conn, writes):
+    """Apply writes in order; consecutive assessments of one module share an executemany"""
+    results = []
+    i = 0
+    while i < len(writes):
+        write = writes[i]
+        if write.op != "assessment":
+            results.append(_apply(conn, write.op, write.payload))
+            i += 1
+            continue
+        module = write.payload["module"]
+        j = i
+        while j < len(writes) and writes[j].op == "assessment" and writes[j].payload["module"] == module:
+            j += 1
+        db.insert_assessments(conn, module, [(w.payload["profile_id"], w.payload["data"],
+                                              w.payload["recorded_at"]) for w in writes[i:j]])
+        results.extend([None] * (j - i))
+        i = j
+    return results
+
+
+class WriteBehindQueue:
+    """Journal-backed queue drained by one writer thread"""
+
+    def __init__(self, journal_path=None, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY_SECONDS,
+                 fsync=FSYNC):
+        base = journal_path or journal_base()
+        self.journal_path = f"{base}.{os.getpid()}" if fcntl is not None else base
+        self.journal_name = os.path.basename(self.journal_path)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.fsync = fsync
+        self.failures = []
+        self.retries = 0
+        self.last_error = None
+        self.healthy = True
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._committed = 0
+        self._closed = False
+        recover(base)
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM write_behind_journals WHERE journal = ?', (self.journal_name,))
+        # Locked before it appears under its own name, so recover() in another process never takes it
+        pending_path = f"{self.journal_path}.new"
+        self._journal = open(pending_path, "w", encoding="utf-8")
+        _try_lock(self._journal)
+        os.replace(pending_path, self.journal_path)
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, op, payload):
+        """Journal the write and queue it; returns a PendingWrite"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write-behind queue is closed")
+            if not self._thread.is_alive():
+                raise RuntimeError(f"write-behind writer stopped: {self.last_error!r}")
+            self._seq += 1
+            write = PendingWrite(self._seq, op, payload)
+            self._journal.write(json.dumps({"seq": write.seq, "op": op, "payload": payload}) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._queue.put(write)
+        metrics.set_gauge("write_behind.depth", self._queue.qsize())
+        return write
+
+    def save_profile(self, name, sport, age, height, weight, gender):
+        return self.submit("profile", {"profile": [name, sport, age, height, weight, gender]})
+
+    def record_assessment(self, module, profile_id, data, recorded_at=None):
+        recorded_at = recorded_at or datetime.now().strftime(db.TIMESTAMP_FORMAT)
+        return self.submit("assessment", {"module": module, "profile_id": profile_id,
+                                          "data": data, "recorded_at": recorded_at})
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                write = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if write is None:
+                self._queue.put(None)  # let the loop see the stop marker after this batch
+                break
+            batch.append(write)
+        return batch
+
+    def _retrying(self, fn):
+        """fn(conn) in one write transaction, retried with backoff while the database is busy"""
+        delay = RETRY_DELAY_SECONDS
+        while True:
+            try:
+                with db.transaction() as conn:
+                    return fn(conn)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e):
+                    raise
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+
+    def _commit(self, batch):
+        """Commit a batch, removing writes from it as they land"""
+        start = time.perf_counter()
+
+        def apply_all(conn):
+            results = _apply_batch(conn, batch)
+            conn.execute(UPSERT_JOURNAL, (self.journal_name, batch[-1].seq))
+            return results
+
+        try:
+            results = self._retrying(apply_all)
+        except Exception:
+            results = None
+        if results is not None:
+            self._resolve(batch, results, start)
+            del batch[:]
+            return
+        # One bad write must not sink the rest: retry them one transaction each
+        while batch:
+            write = batch[0]
+            start = time.perf_counter()
+
+            def apply_one(conn):
+                result = _apply(conn, write.op, write.payload)
+                conn.execute(UPSERT_JOURNAL, (self.journal_name, write.seq))
+                return result
+
+            try:
+                result = self._retrying(apply_one)
+            except PERMANENT_ERRORS as e:
+                self._retrying(lambda conn: conn.execute(UPSERT_JOURNAL, (self.journal_name, write.seq)))
+                self.failures.append((write.seq, write.op, str(e)))
+                result = e
+            self._resolve([write], [result], start)
+            del batch[0]
+
+    def _resolve(self, writes, results, start):
+        """Hand committed (or permanently failed) writes their outcome"""
+        self.healthy = True
+        committed = time.perf_counter()
+        metrics.observe("write_behind.commit", committed - start)
+        for write, result in zip(writes, results):
+            metrics.observe("write_behind.lag", committed - write.enqueued_at)
+            if isinstance(result, Exception):
+                write._finish(error=result)
+            else:
+                write._finish(result=result)
+        with self._lock:
+            self._committed = writes[-1].seq
+            if self._committed == self._seq:
+                # Everything journaled is in the database; start the journal over
+                self._journal.seek(0)
+                self._journal.truncate()
+        metrics.set_gauge("write_behind.depth", self._queue.qsize())
+
+    def _run(self):
+        batch = []
+        delay = RETRY_DELAY_SECONDS
+        while True:
+            try:
+                if not batch:
+                    batch = self._next_batch()
+                    if batch is None:
+                        return
+                self._commit(batch)
+                delay = RETRY_DELAY_SECONDS
+            except Exception as e:
+                # The writes stay journaled and queued here; keep retrying rather than drop them
+                self.last_error = e
+                self.healthy = False
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+
+    def flush(self, timeout=WAIT_TIMEOUT_SECONDS):
+        """Wait until everything submitted so far is committed; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            target = self._seq
+        while self._committed < target:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout=30.0):
+        """Stop accepting writes, drain the queue and remove the journal"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return  # keep the journal; the next start replays what is left
+        self._journal.close()
+        os.remove(self.journal_path)
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM write_behind_journals WHERE journal = ?', (self.journal_name,))
+
+    def stats(self):
+        return {"depth": self.depth(), "submitted": self._seq, "committed": self._committed,
+                "failed": len(self.failures), "retries": self.retries,
+                "healthy": self.healthy and self._thread.is_alive(),
+                "last_error": repr(self.last_error) if self.last_error else None,
+                "journal": self.journal_path}
+
+
+def recover(base=None):
+    """Replay journals left by processes that stopped before draining; returns writes applied"""
+    base = base or journal_base()
+    applied = 0
+    paths = [path for path in glob.glob(glob.escape(base) + ".*") if path[len(base) + 1:].isdigit()]
+    for path in sorted(paths + [base]):
+        if not os.path.isfile(path):
+            continue
+        try:
+            f = open(path, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            continue  # another process recovered it first
+        with f:
+            if not _try_lock(f) or not _same_file(f, path):
+                continue  # a live process owns it, or it was recovered while we waited
+            name = os.path.basename(path)
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # torn final line: that write was never acknowledged
+            with db.transaction() as conn:
+                row = conn.execute('SELECT last_seq FROM write_behind_journals WHERE journal = ?',
+                                   (name,)).fetchone()
+                last_seq = row[0] if row else 0
+                for entry in entries:
+                    if entry["seq"] > last_seq:
+                        _apply(conn, entry["op"], entry["payload"])
+                        applied += 1
+                conn.execute('DELETE FROM write_behind_journals WHERE journal = ?', (name,))
+            os.remove(path)
+    return applied
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The process-wide queue, started on first use and drained at exit"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            db.init_db()
+            _writer = WriteBehindQueue()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def flush_if_started(timeout=WAIT_TIMEOUT_SECONDS):
+    """Flush the process-wide queue if one was started; never starts one (e.g. on shutdown)"""
+    with _writer_lock:
+        writer = _writer
+    if writer is None:
+        return True
+    return writer.flush(timeout)
+
+
+def writer_health():
+    """(healthy, last error) of the process-wide queue; healthy when none has started"""
+    writer = _writer
+    if writer is None:
+        return True, None
+    stats = writer.stats()
+    return stats["healthy"], stats["last_error"]
+
+
+db.register_schema(CREATE_JOURNALS)